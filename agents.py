@@ -1,17 +1,26 @@
-from crewai import Agent, Task, Crew
-from langchain_ollama import OllamaLLM
+from crewai import Agent, Task
 from models import *
+from executor import DAGExecutor, TaskNode
+from llm import ContentOllamaLLM
+from llm_cache import llm_cache_bypass
+from metrics import agent_context
+from semantic_cache import get_semantic_cache
+from structured_output import generate_structured, output_schema
+from tokens import chunk_by_token_budget, estimate_tokens
+from config import execution_config
 import json
 import uuid
 from datetime import datetime
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T", bound=BaseModel)
 
 class ContentCreationAgents:
     """Classe que gerencia todos os agentes especializados do sistema"""
     
     def __init__(self, ollama_base_url: str = "http://localhost:11434", model_name: str = "mistral"):
-        # inicializa o LLM local via Ollama
-        self.llm = OllamaLLM(
+        # inicializa o LLM local via Ollama (com cache de completions)
+        self.llm = ContentOllamaLLM(
             base_url=ollama_base_url,
             model=model_name,
             temperature=0.7
@@ -100,6 +109,38 @@ class ContentCreationAgents:
             llm=self.llm,
             verbose=True
         )
+        
+        # agente -> tipo, para rotular as métricas de geração
+        self.agent_types: Dict[int, AgentType] = {
+            id(self.manager_agent): AgentType.MANAGER,
+            id(self.copywriter_agent): AgentType.COPYWRITER,
+            id(self.editor_agent): AgentType.EDITOR,
+            id(self.publico_agent): AgentType.PUBLICO,
+            id(self.imagens_agent): AgentType.IMAGENS,
+            id(self.producao_agent): AgentType.PRODUCAO,
+            id(self.conteudo_agent): AgentType.CONTEUDO
+        }
+    
+    def build_prompt(self, task: Task) -> str:
+        """Monta o prompt da tarefa com a persona do agente (papel, objetivo e histórico)"""
+        agent = task.agent
+        return f"""Você é: {agent.role}
+Objetivo: {agent.goal}
+{agent.backstory}
+
+Tarefa:
+{task.description}
+
+Resultado esperado: {task.expected_output}"""
+    
+    def run_structured(self, task: Task, output_model: Type[T]) -> T:
+        """
+        Executa a tarefa com saída restrita ao JSON schema do modelo de saída.
+        Chama o LLM direto (os agentes não usam ferramentas, então o loop ReAct do
+        CrewAI só adicionava texto livre fora do JSON) e devolve o objeto já validado.
+        """
+        with agent_context(self.agent_types.get(id(task.agent))):
+            return generate_structured(task.agent.llm, self.build_prompt(task), output_model)
 
     def create_copywriter_task(self, brief: ContentBrief) -> Task:
         """Cria tarefa para o copywriter"""
@@ -171,6 +212,33 @@ class ContentCreationAgents:
             expected_output="JSON com resposta, follow-up opcional e flag de escalação"
         )
     
+    def create_publico_batch_task(self, comments: List[Tuple[str, Optional[Platform]]], brand_persona: str) -> Task:
+        """Cria tarefa para responder vários comentários em uma única chamada"""
+        numbered = "\n".join(
+            f'[{index}] ({platform.value if platform else "geral"}) "{comment}"'
+            for index, (comment, platform) in enumerate(comments)
+        )
+        return Task(
+            description=f"""
+            Responda a cada um dos comentários/DMs abaixo, de forma independente:
+            {numbered}
+            
+            Persona da marca: {brand_persona}
+            
+            Regras:
+            1. Nunca prometer serviços específicos
+            2. Ser educado e prestativo
+            3. Encaminhar reclamações para suporte quando necessário
+            4. Manter tom jovem e descontraído
+            5. Adequar a resposta à plataforma indicada entre parênteses
+            
+            Gere exatamente uma resposta por comentário, com o mesmo index, e follow-up se necessário.
+            Formato JSON seguindo PublicoBatchOutput schema.
+            """,
+            agent=self.publico_agent,
+            expected_output=f"JSON com {len(comments)} respostas, uma por index"
+        )
+    
     def create_imagens_task(self, script: str, platform: Platform) -> Task:
         """Cria tarefa para geração de prompts de imagem"""
         return Task(
@@ -239,64 +307,108 @@ class ContentCreationAgents:
 class ContentCreationCrew:
     """Crew principal que orquestra todos os agentes"""
     
-    def __init__(self, agents: ContentCreationAgents):
+    def __init__(self, agents: ContentCreationAgents, max_parallel_agents: Optional[int] = None):
         self.agents = agents
+        self.max_parallel_agents = max_parallel_agents or execution_config.max_parallel_agents
     
-    def process_brief(self, brief: ContentBrief) -> ContentPackage:
-        """Processa um brief completo usando todos os agentes necessários"""
-        
-        task_id = str(uuid.uuid4())
-        
-        # cria as tarefas principais
-        tasks = []
-        
-        # tarefa do copywriter (sempre necessária)
-        copywriter_task = self.agents.create_copywriter_task(brief)
-        tasks.append(copywriter_task)
+    def _run_task(self, task: Task, output_model: Type[T]) -> T:
+        """Executa uma única tarefa e retorna a saída validada"""
+        return self.agents.run_structured(task, output_model)
+    
+    def build_task_graph(self, brief: ContentBrief) -> List[TaskNode]:
+        """
+        Monta o grafo de dependências dos agentes para um brief:
+        copywriter e conteudo rodam juntos; editor, imagens e produção
+        (por plataforma) partem assim que o script do copywriter existe
+        """
+        agents = self.agents
         
-        # tarefa de ideias criativas (sempre executada)
-        conteudo_task = self.agents.create_conteudo_task(brief)
-        tasks.append(conteudo_task)
+        nodes = [
+            # tarefa do copywriter (sempre necessária)
+            TaskNode(
+                "copywriter",
+                lambda deps: self._run_task(agents.create_copywriter_task(brief), CopywriterOutput)
+            ),
+            # tarefa de ideias criativas (sempre executada, independe do script)
+            TaskNode(
+                "conteudo",
+                lambda deps: self._run_task(agents.create_conteudo_task(brief), ConteudoOutput)
+            ),
+            # refinamento do script do copywriter
+            TaskNode(
+                "editor",
+                lambda deps: self._run_task(
+                    agents.create_editor_task(deps["copywriter"].model_dump_json()), EditorOutput
+                ),
+                depends_on=["copywriter"]
+            )
+        ]
         
         # tarefas para cada plataforma
         for platform in brief.platforms:
-            # prompts de imagem por plataforma
-            imagens_task = self.agents.create_imagens_task("", platform)  # será preenchido após copywriter
-            tasks.append(imagens_task)
-            
-            # sugestões de produção por plataforma  
-            producao_task = self.agents.create_producao_task("", platform)  # será preenchido após copywriter
-            tasks.append(producao_task)
+            nodes.append(TaskNode(
+                f"imagens:{platform.value}",
+                lambda deps, platform=platform: self._run_task(
+                    agents.create_imagens_task(deps["copywriter"].script_short, platform), ImagensOutput
+                ),
+                depends_on=["copywriter"]
+            ))
+            nodes.append(TaskNode(
+                f"producao:{platform.value}",
+                lambda deps, platform=platform: self._run_task(
+                    agents.create_producao_task(deps["copywriter"].script_short, platform), ProducaoOutput
+                ),
+                depends_on=["copywriter"]
+            ))
         
-        # cria o crew com as tarefas
-        crew = Crew(
-            agents=[
-                self.agents.copywriter_agent,
-                self.agents.editor_agent,
-                self.agents.imagens_agent,
-                self.agents.producao_agent,
-                self.agents.conteudo_agent
-            ],
-            tasks=tasks,
-            verbose=True
-        )
+        return nodes
+    
+    @staticmethod
+    def _platform_results(results: Dict[str, Any], agent: str, platforms: List[Platform]) -> Dict[str, Any]:
+        """Saídas dos nós "<agente>:<plataforma>" que terminaram, por plataforma"""
+        return {
+            platform.value: results[f"{agent}:{platform.value}"]
+            for platform in platforms if f"{agent}:{platform.value}" in results
+        }
+    
+    def process_brief(self, brief: ContentBrief, task_id: Optional[str] = None,
+                      on_event: Optional[Callable[[str, str, Dict[str, Any]], None]] = None) -> ContentPackage:
+        """
+        Processa um brief completo executando os agentes em paralelo conforme dependências.
+        on_event(estado, agente, detalhes) é chamado quando cada agente inicia/termina/falha.
+        """
+        
+        task_id = task_id or str(uuid.uuid4())
         
-        # executa o crew
         try:
-            results = crew.kickoff()
+            executor = DAGExecutor(max_workers=self.max_parallel_agents, on_event=on_event)
             
-            # processa os resultados e monta o pacote final
+            # regenerate=True ignora o cache de completions para este brief
+            with llm_cache_bypass(brief.regenerate):
+                results = executor.run(self.build_task_graph(brief))
+            
+            # imagens/produção de todas as plataformas; a principal também vai nos campos simples
+            primary = brief.platforms[0].value if brief.platforms else None
+            images = self._platform_results(results.results, "imagens", brief.platforms)
+            production = self._platform_results(results.results, "producao", brief.platforms)
+            
+            # monta o pacote final com as saídas já validadas de cada agente
             package = ContentPackage(
                 brief=brief,
+                copywriter_result=results.results.get("copywriter"),
+                editor_result=results.results.get("editor"),
+                images_result=images.get(primary),
+                production_result=production.get(primary),
+                images_by_platform=images,
+                production_by_platform=production,
+                content_ideas=results.results.get("conteudo"),
                 task_id=task_id,
                 created_at=datetime.now().isoformat(),
-                status="completed"
+                status="completed" if results.succeeded else "error: " + "; ".join(
+                    f"{name}: {error}" for name, error in results.errors.items()
+                )
             )
             
-            # aqui você processaria os results e preencheria os campos específicos
-            # por simplicidade, deixando como None por enquanto
-            # em implementação real, faria parsing dos JSONs retornados
-            
             return package
             
         except Exception as e:
@@ -308,29 +420,130 @@ class ContentCreationCrew:
                 status=f"error: {str(e)}"
             )
     
-    def respond_to_public(self, comment: str, brand_persona: str) -> PublicoOutput:
-        """Responde a comentário/DM do público"""
+    def respond_to_public(self, comment: str, brand_persona: str, platform: Optional[Platform] = None,
+                          regenerate: bool = False) -> PublicoOutput:
+        """Responde a comentário/DM do público (com cache semântico de respostas)"""
         
-        task = self.agents.create_publico_task(comment, brand_persona)
+        cache = get_semantic_cache()
+        embedding = None
+        if cache is not None and not regenerate:
+            try:
+                cached, embedding = cache.lookup(comment, platform, brand_persona)
+                if cached is not None:
+                    return cached
+            except Exception:
+                # cache indisponível (ex.: embeddings fora do ar) não impede a resposta
+                embedding = None
         
-        crew = Crew(
-            agents=[self.agents.publico_agent],
-            tasks=[task],
-            verbose=True
-        )
+        task = self.agents.create_publico_task(comment, brand_persona)
         
         try:
-            result = crew.kickoff()
-            # aqui faria parsing do JSON retornado
-            # por simplicidade, retornando estrutura básica
-            return PublicoOutput(
-                response="Obrigado pelo seu comentário! Vamos analisar sua sugestão.",
-                follow_up=None,
-                escalate_to_support=False
-            )
+            with llm_cache_bypass(regenerate):
+                response = self.agents.run_structured(task, PublicoOutput)
         except Exception as e:
+            # respostas de falha não entram no cache
             return PublicoOutput(
                 response="Desculpe, tivemos um problema técnico. Tente novamente em alguns minutos.",
                 follow_up="Se o problema persistir, entre em contato com nosso suporte.",
                 escalate_to_support=True
-            )
\ No newline at end of file
+            )
+        
+        if cache is not None:
+            try:
+                cache.store(comment, platform, brand_persona, response, embedding=embedding)
+            except Exception:
+                pass
+        
+        return response
+    
+    def _answer_batch(self, batch: List[int], comments: List[Tuple[str, Optional[Platform], bool]],
+                      brand_persona: str) -> Dict[int, Tuple[Optional[PublicoOutput], Optional[str]]]:
+        """
+        Responde um lote em uma chamada ao LLM. Comentários sem resposta válida no lote
+        (ou o lote inteiro, se a chamada falhar) são refeitos um a um, então o erro de
+        um item não derruba os demais. Nunca levanta exceção.
+        """
+        answers: Dict[int, Tuple[Optional[PublicoOutput], Optional[str]]] = {}
+        regenerate = any(comments[index][2] for index in batch)
+        
+        try:
+            task = self.agents.create_publico_batch_task(
+                [(comments[index][0], comments[index][1]) for index in batch], brand_persona
+            )
+            with llm_cache_bypass(regenerate):
+                output = self.agents.run_structured(task, PublicoBatchOutput)
+            for item in output.responses:
+                if 0 <= item.index < len(batch) and batch[item.index] not in answers:
+                    answers[batch[item.index]] = (PublicoOutput(**item.model_dump(exclude={"index"})), None)
+        except Exception:
+            # o lote falhou como um todo: segue para as respostas individuais
+            pass
+        
+        for index in batch:
+            if index in answers:
+                continue
+            comment, platform, item_regenerate = comments[index]
+            try:
+                with llm_cache_bypass(item_regenerate):
+                    answers[index] = (self.agents.run_structured(
+                        self.agents.create_publico_task(comment, brand_persona), PublicoOutput
+                    ), None)
+            except Exception as e:
+                answers[index] = (None, str(e))
+        
+        return answers
+    
+    def respond_to_public_batch(self, comments: List[Tuple[str, Optional[Platform], bool]],
+                                brand_persona: str) -> List[Tuple[Optional[PublicoOutput], Optional[str]]]:
+        """
+        Responde vários comentários (texto, plataforma, regenerate) em poucas chamadas ao LLM.
+        Os comentários sem resposta no cache semântico são agrupados em lotes que cabem
+        no orçamento de tokens e os lotes rodam em paralelo.
+        Retorna (resposta, erro) por comentário, na mesma ordem da entrada.
+        """
+        results: List[Optional[Tuple[Optional[PublicoOutput], Optional[str]]]] = [None] * len(comments)
+        embeddings: Dict[int, Any] = {}
+        pending: List[int] = []
+        
+        cache = get_semantic_cache()
+        for index, (comment, platform, regenerate) in enumerate(comments):
+            if cache is not None and not regenerate:
+                try:
+                    cached, embeddings[index] = cache.lookup(comment, platform, brand_persona)
+                    if cached is not None:
+                        results[index] = (cached, None)
+                        continue
+                except Exception:
+                    pass
+            pending.append(index)
+        
+        # custo fixo do prompt (persona, regras e schema) + comentário + resposta esperada
+        overhead = estimate_tokens(
+            self.agents.build_prompt(self.agents.create_publico_batch_task([], brand_persona))
+        ) + estimate_tokens(json.dumps(output_schema(PublicoBatchOutput)))
+        batches = chunk_by_token_budget(
+            pending,
+            lambda index: estimate_tokens(comments[index][0]) + execution_config.public_batch_output_tokens,
+            max(execution_config.public_batch_token_budget - overhead, 1),
+            execution_config.public_batch_max_items
+        )
+        
+        nodes = [
+            TaskNode(f"lote:{number}", lambda deps, batch=batch: self._answer_batch(batch, comments, brand_persona))
+            for number, batch in enumerate(batches)
+        ]
+        executed = DAGExecutor(max_workers=self.max_parallel_agents).run(nodes)
+        
+        for number, batch in enumerate(batches):
+            answers = executed.results.get(f"lote:{number}", {})
+            for index in batch:
+                results[index] = answers.get(index, (None, executed.errors.get(f"lote:{number}", "sem resposta")))
+                output = results[index][0]
+                if output is not None and cache is not None:
+                    try:
+                        cache.store(comments[index][0], comments[index][1], brand_persona, output,
+                                    embedding=embeddings.get(index))
+                    except Exception:
+                        pass
+        
+        return results
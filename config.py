@@ -1,10 +1,13 @@
 import os
+import logging
 from dotenv import load_dotenv
-from langchain_ollama import OllamaLLM
-from langchain.callbacks.manager import CallbackManager
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 import httpx
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+# langchain só é importado quando um LLM/embedding é criado (cold start da API)
+if TYPE_CHECKING:
+    from langchain_ollama import OllamaLLM
+    from langchain.embeddings import OllamaEmbeddings
 
 # carrega variáveis de ambiente
 load_dotenv()
@@ -14,16 +17,47 @@ class OllamaConfig:
     
     def __init__(self):
         self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        
+        # vários servidores Ollama (separados por vírgula); o primeiro vira base_url
+        self.base_urls = [
+            url.strip() for url in os.getenv("OLLAMA_BASE_URLS", self.base_url).split(",") if url.strip()
+        ] or [self.base_url]
+        self.base_url = self.base_urls[0]
+        
+        # roteamento entre backends: least_outstanding | latency
+        self.routing_strategy = os.getenv("OLLAMA_ROUTING", "least_outstanding")
+        self.health_interval = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+        self.failure_threshold = int(os.getenv("OLLAMA_FAILURE_THRESHOLD", "3"))
         self.model_name = os.getenv("OLLAMA_MODEL", "mistral")
+        # modelo leve só para embeddings (não disputa o slot do modelo de geração);
+        # dimensão esperada opcional (0 = aceita a que o modelo retornar)
+        self.embedding_model = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+        self.embedding_dimension = int(os.getenv("OLLAMA_EMBEDDING_DIMENSION", "0"))
         self.temperature = float(os.getenv("OLLAMA_TEMPERATURE", "0.7"))
         self.max_tokens = int(os.getenv("OLLAMA_MAX_TOKENS", "2000"))
         self.timeout = int(os.getenv("OLLAMA_TIMEOUT", "120"))
         
+        # tempo que o modelo fica carregado no Ollama após cada chamada ("30m", segundos ou -1 = sempre)
+        keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.keep_alive = int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+        
+        # pré-carregamento dos modelos na startup e verificação periódica (recarrega se descarregado)
+        self.warmup_enabled = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+        self.warmup_interval = float(os.getenv("OLLAMA_WARMUP_INTERVAL", "60"))
+        
+        # pool de conexões HTTP compartilhado (ver ollama_client)
+        self.connect_timeout = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+        self.max_connections = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+        self.max_keepalive_connections = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "10"))
+        # embeddings de documentos enviados em paralelo (limitado também pelo pool acima)
+        self.embedding_concurrency = int(os.getenv("OLLAMA_EMBEDDING_CONCURRENCY", "4"))
+        
         # configurações de callback para streaming (opcional)
         self.enable_streaming = os.getenv("OLLAMA_STREAMING", "false").lower() == "true"
         
-    def create_llm(self, streaming: bool = None) -> OllamaLLM:
+    def create_llm(self, streaming: bool = None) -> "OllamaLLM":
         """Cria instância do LLM Ollama configurado"""
+        from llm import ContentOllamaLLM
         
         # usa configuração padrão se não especificado
         if streaming is None:
@@ -32,9 +66,11 @@ class OllamaConfig:
         # configura callbacks se streaming habilitado
         callback_manager = None
         if streaming:
+            from langchain.callbacks.manager import CallbackManager
+            from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
             callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
         
-        return OllamaLLM(
+        return ContentOllamaLLM(
             base_url=self.base_url,
             model=self.model_name,
             temperature=self.temperature,
@@ -44,42 +80,54 @@ class OllamaConfig:
             timeout=self.timeout
         )
     
-    async def check_ollama_health(self) -> dict:
-        """Verifica se o Ollama está rodando e acessível"""
+    def create_embeddings(self, model: Optional[str] = None) -> "OllamaEmbeddings":
+        """Cria instância de embeddings via Ollama (modelo de embedding, ou o informado)"""
+        from llm import ContentOllamaEmbeddings
+        
+        return ContentOllamaEmbeddings(
+            base_url=self.base_url,
+            model=model or self.embedding_model,
+            concurrency=self.embedding_concurrency
+        )
+    
+    async def check_ollama_health(self, base_url: Optional[str] = None) -> dict:
+        """Verifica se o Ollama (o principal ou o backend informado) está rodando e acessível"""
+        from ollama_client import get_ollama_client
+        
+        base_url = base_url or self.base_url
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
+            response = await get_ollama_client().tags(base_url)
+            
+            if response.status_code == 200:
+                models = response.json().get("models", [])
+                model_names = [model.get("name", "") for model in models]
+                
+                return {
+                    "status": "healthy",
+                    "url": base_url,
+                    "available_models": model_names,
+                    "configured_model": self.model_name,
+                    "model_available": any(self.model_name in name for name in model_names)
+                }
+            else:
+                return {
+                    "status": "error",
+                    "message": f"HTTP {response.status_code}",
+                    "url": base_url
+                }
                 
-                if response.status_code == 200:
-                    models = response.json().get("models", [])
-                    model_names = [model.get("name", "") for model in models]
-                    
-                    return {
-                        "status": "healthy",
-                        "url": self.base_url,
-                        "available_models": model_names,
-                        "configured_model": self.model_name,
-                        "model_available": any(self.model_name in name for name in model_names)
-                    }
-                else:
-                    return {
-                        "status": "error",
-                        "message": f"HTTP {response.status_code}",
-                        "url": self.base_url
-                    }
-                    
         except httpx.ConnectError:
             return {
                 "status": "connection_error",
                 "message": "Não foi possível conectar ao Ollama",
-                "url": self.base_url,
+                "url": base_url,
                 "suggestion": "Verifique se o Ollama está rodando com: ollama serve"
             }
         except Exception as e:
             return {
                 "status": "error",
                 "message": str(e),
-                "url": self.base_url
+                "url": base_url
             }
     
     def get_model_info(self) -> dict:
@@ -87,9 +135,13 @@ class OllamaConfig:
         return {
             "model_name": self.model_name,
             "base_url": self.base_url,
+            "base_urls": self.base_urls,
+            "routing_strategy": self.routing_strategy,
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "timeout": self.timeout,
+            "max_connections": self.max_connections,
+            "keep_alive": self.keep_alive,
             "streaming": self.enable_streaming
         }
 
@@ -100,8 +152,28 @@ class LangChainConfig:
         self.verbose = os.getenv("LANGCHAIN_VERBOSE", "false").lower() == "true"
         self.debug = os.getenv("LANGCHAIN_DEBUG", "false").lower() == "true"
         
-        # configurações de cache (se necessário)
-        self.enable_cache = os.getenv("LANGCHAIN_CACHE", "false").lower() == "true"
+        # cache de completions do LLM (memória + disco opcional)
+        self.enable_cache = os.getenv("LANGCHAIN_CACHE", "true").lower() == "true"
+        self.cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+        self.cache_max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+        self.cache_ttl = int(os.getenv("LLM_CACHE_TTL", "86400"))
+        self.cache_disk_path = os.getenv("LLM_CACHE_DISK_PATH", "")
+        self.cache_disk_max_bytes = int(float(os.getenv("LLM_CACHE_DISK_MAX_MB", "512")) * 1024 * 1024)
+        
+        # cache semântico de respostas ao público
+        self.semantic_cache_enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+        self.semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.semantic_cache_max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+        self.semantic_cache_ttl = int(os.getenv("SEMANTIC_CACHE_TTL", "604800"))
+        
+        # cache de embeddings (consultas e documentos da memória): LRU + arquivo de vetores opcional
+        self.embedding_cache_enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.embedding_cache_max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "")
+        self.embedding_cache_disk_max_bytes = int(float(os.getenv("EMBEDDING_CACHE_DISK_MAX_MB", "256")) * 1024 * 1024)
+        
+        # saídas estruturadas: pedidos de correção ao modelo quando o JSON não valida
+        self.structured_output_retries = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "2"))
         
         # configurações de rate limiting
         self.max_requests_per_minute = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "60"))
@@ -115,11 +187,118 @@ class LangChainConfig:
             "rate_limit": self.max_requests_per_minute
         }
 
+class ExecutionConfig:
+    """Configurações de execução dos agentes"""
+    
+    def __init__(self):
+        # número máximo de agentes executando em paralelo por brief
+        self.max_parallel_agents = int(os.getenv("MAX_PARALLEL_AGENTS", "4"))
+        
+        # fila de jobs: workers processando briefs e capacidade máxima (0 = sem limite)
+        self.job_queue_workers = int(os.getenv("JOB_QUEUE_WORKERS", "1"))
+        self.job_queue_max_size = int(os.getenv("JOB_QUEUE_MAX_SIZE", "1000"))
+        
+        # respostas em lote ao público: orçamento de tokens por prompt (entrada + saída
+        # estimada), comentários por lote, tokens reservados por resposta e limite por requisição
+        self.public_batch_token_budget = int(os.getenv("PUBLIC_BATCH_TOKEN_BUDGET", "3000"))
+        self.public_batch_max_items = int(os.getenv("PUBLIC_BATCH_MAX_ITEMS", "20"))
+        self.public_batch_output_tokens = int(os.getenv("PUBLIC_BATCH_OUTPUT_TOKENS", "100"))
+        self.public_batch_max_comments = int(os.getenv("PUBLIC_BATCH_MAX_COMMENTS", "1000"))
+        
+        # porta do endpoint de métricas do processo worker (0 = desabilitado)
+        self.worker_metrics_port = int(os.getenv("WORKER_METRICS_PORT", "9101"))
+        
+    def get_execution_config(self) -> dict:
+        """Retorna configurações de execução"""
+        return {
+            "max_parallel_agents": self.max_parallel_agents,
+            "job_queue_workers": self.job_queue_workers,
+            "job_queue_max_size": self.job_queue_max_size,
+            "public_batch_token_budget": self.public_batch_token_budget,
+            "public_batch_max_items": self.public_batch_max_items
+        }
+
+class StorageConfig:
+    """Configurações de armazenamento das tasks e da fila"""
+    
+    def __init__(self):
+        # backend do task store: memory (processo único) ou redis (compartilhado)
+        self.backend = os.getenv("TASK_STORE_BACKEND", "memory")
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.key_prefix = os.getenv("TASK_STORE_PREFIX", "multi_agentes")
+        
+        # tempo sem heartbeat até um job em processamento voltar para a fila
+        self.lease_seconds = int(os.getenv("TASK_LEASE_SECONDS", "60"))
+        
+        # por quanto tempo o histórico de eventos (SSE) de uma task fica no Redis
+        self.events_ttl = int(os.getenv("TASK_EVENTS_TTL", "86400"))
+        
+        # retenção dos resultados (0 = para sempre); no backend memory, a task expira inteira
+        self.result_ttl = int(os.getenv("TASK_RESULT_TTL", "604800"))
+        # backend memory: resultados em memória até o limite, o excedente vai para o disco
+        self.result_memory_bytes = int(float(os.getenv("TASK_RESULT_MEMORY_MB", "64")) * 1024 * 1024)
+        # cada processo cria o próprio arquivo ao lado deste caminho e o apaga ao sair
+        self.result_spill_path = os.getenv("TASK_RESULT_SPILL_PATH", "./cache/task_results.sqlite3")
+
+class RAGConfig:
+    """Configurações da montagem de contexto RAG (memória)"""
+    
+    def __init__(self):
+        # orçamento de tokens do contexto; por agente via RAG_AGENT_BUDGETS="copywriter=1200,editor=400"
+        self.token_budget = int(os.getenv("RAG_TOKEN_BUDGET", "800"))
+        self.agent_budgets = {}
+        for item in os.getenv("RAG_AGENT_BUDGETS", "").split(","):
+            if "=" in item:
+                agent, budget = item.split("=", 1)
+                self.agent_budgets[agent.strip()] = int(budget)
+        
+        # candidatos buscados por seção e seleção MMR (relevância x diversidade)
+        self.fetch_k = int(os.getenv("RAG_FETCH_K", "20"))
+        self.mmr_lambda = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+        # similaridade de cosseno a partir da qual um chunk é considerado duplicado
+        self.duplicate_threshold = float(os.getenv("RAG_DUPLICATE_THRESHOLD", "0.95"))
+        
+        # busca nas collections em paralelo, com prazo total (segundos); o que não chegar a tempo fica de fora
+        self.retrieval_timeout = float(os.getenv("RAG_RETRIEVAL_TIMEOUT", "2.0"))
+        self.retrieval_workers = int(os.getenv("RAG_RETRIEVAL_WORKERS", "8"))
+        # contextos RAG montados em cache por fingerprint do brief (0 = desabilitado)
+        self.context_cache_size = int(os.getenv("RAG_CONTEXT_CACHE_SIZE", "256"))
+        # coleções pequenas servidas por um índice NumPy em memória ("" = todas pelo Chroma)
+        self.inmemory_collections = [
+            name.strip()
+            for name in os.getenv("RAG_INMEMORY_COLLECTIONS", "brand_knowledge,trends_insights").split(",")
+            if name.strip()
+        ]
+        
+        # ingestão em lote na memória: documentos por escrita no Chroma
+        self.ingest_batch_size = int(os.getenv("MEMORY_INGEST_BATCH_SIZE", "64"))
+        
+        # re-embedding em background quando o modelo de embedding muda
+        self.migration_enabled = os.getenv("MEMORY_MIGRATION_ENABLED", "true").lower() == "true"
+        self.migration_batch_size = int(os.getenv("MEMORY_MIGRATION_BATCH_SIZE", "64"))
+        self.migration_concurrency = int(os.getenv("MEMORY_MIGRATION_CONCURRENCY", "4"))
+        
+        # manutenção do content_history: retenção (dias, 0 = sem), compactação de quase-duplicados
+        # e limite de documentos lidos/removidos por segundo
+        self.maintenance_enabled = os.getenv("MEMORY_MAINTENANCE_ENABLED", "true").lower() == "true"
+        self.maintenance_interval = float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", "3600"))
+        self.retention_days = float(os.getenv("MEMORY_RETENTION_DAYS", "90"))
+        self.error_retention_days = float(os.getenv("MEMORY_ERROR_RETENTION_DAYS", "7"))
+        self.compaction_threshold = float(os.getenv("MEMORY_COMPACTION_THRESHOLD", "0.98"))
+        self.maintenance_io_budget = int(os.getenv("MEMORY_MAINTENANCE_IO_BUDGET", "500"))
+    
+    def budget_for(self, agent: Optional[str] = None) -> int:
+        """Orçamento de tokens do contexto para um agente"""
+        return self.agent_budgets.get(agent, self.token_budget) if agent else self.token_budget
+
 # instâncias globais (singleton pattern)
 ollama_config = OllamaConfig()
 langchain_config = LangChainConfig()
+execution_config = ExecutionConfig()
+storage_config = StorageConfig()
+rag_config = RAGConfig()
 
-def get_configured_llm(streaming: bool = False) -> OllamaLLM:
+def get_configured_llm(streaming: bool = False) -> "OllamaLLM":
     """Função helper para obter LLM configurado"""
     return ollama_config.create_llm(streaming=streaming)
 
@@ -176,10 +355,15 @@ def get_system_prompts() -> dict:
     }
 
 # configurações de logging
-import logging
+_logging_configured = False
 
 def setup_logging():
-    """Configura logging para o sistema"""
+    """Configura logging para o sistema (chamado pelos entrypoints; idempotente)"""
+    global _logging_configured
+    if _logging_configured:
+        return logger
+    _logging_configured = True
+    
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     
     logging.basicConfig(
@@ -196,7 +380,7 @@ def setup_logging():
         logging.getLogger("langchain").setLevel(logging.DEBUG)
         logging.getLogger("crewai").setLevel(logging.DEBUG)
     
-    return logging.getLogger(__name__)
+    return logger
 
-# inicializa logging
-logger = setup_logging()
\ No newline at end of file
+# logger compartilhado; handlers/nível são configurados por setup_logging() no entrypoint
+logger = logging.getLogger(__name__)
\ No newline at end of file
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import re
+import struct
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import langchain_config, logger
+
+# registro do arquivo de vetores: sha256 da chave (32 bytes) + dimensão (uint32) + float32 * dimensão
+_RECORD_HEADER = struct.Struct("<32sI")
+_FLOAT_SIZE = 4
+
+def normalize_embedding_text(text: str) -> str:
+    """Normalização para a chave: unicode NFC e espaços colapsados (maiúsculas importam para o modelo)"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def make_embedding_key(model: str, text: str) -> bytes:
+    """Chave do cache: hash do modelo + texto normalizado (já com a instrução de query/passage)"""
+    payload = f"{model}\0{normalize_embedding_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+class VectorFile:
+    """
+    Arquivo append-only com os vetores em float32 (sem JSON), indexado em memória
+    só pelo offset de cada chave. Passando de max_bytes, é reescrito com os mais recentes.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # chave -> (offset do vetor, dimensão), em ordem de gravação
+        self._index: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.compactions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._file = open(path, "a+b")
+        self._load_index()
+
+    def _load_index(self):
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        self._file.seek(0)
+        offset = 0
+
+        while offset + _RECORD_HEADER.size <= size:
+            key, dim = _RECORD_HEADER.unpack(self._file.read(_RECORD_HEADER.size))
+            end = offset + _RECORD_HEADER.size + dim * _FLOAT_SIZE
+            if end > size:
+                break
+            self._index[key] = (offset + _RECORD_HEADER.size, dim)
+            self._index.move_to_end(key)
+            self._file.seek(end)
+            offset = end
+
+        if offset < size:
+            # registro incompleto (processo interrompido no meio da escrita)
+            logger.warning(f"⚠️ Cache de embeddings: descartando {size - offset} bytes finais de {self.path}")
+            self._file.truncate(offset)
+
+    @property
+    def size(self) -> int:
+        self._file.seek(0, os.SEEK_END)
+        return self._file.tell()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, dim = entry
+            self._file.seek(offset)
+            return np.frombuffer(self._file.read(dim * _FLOAT_SIZE), dtype=np.float32)
+
+    def set(self, key: bytes, vector: np.ndarray):
+        with self._lock:
+            if key in self._index:
+                return
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(_RECORD_HEADER.pack(key, len(vector)))
+            self._file.write(vector.astype(np.float32).tobytes())
+            self._file.flush()
+            self._index[key] = (offset + _RECORD_HEADER.size, len(vector))
+
+            if self.size > self.max_bytes:
+                self._compact()
+
+    def _compact(self):
+        """Reescreve o arquivo mantendo os vetores mais recentes (até 3/4 de max_bytes)"""
+        keep: List[tuple] = []
+        total = 0
+        for key, (offset, dim) in reversed(self._index.items()):
+            record_size = _RECORD_HEADER.size + dim * _FLOAT_SIZE
+            if total + record_size > self.max_bytes * 3 // 4:
+                break
+            self._file.seek(offset)
+            keep.append((key, self._file.read(dim * _FLOAT_SIZE), dim))
+            total += record_size
+
+        temp_path = f"{self.path}.tmp"
+        index: "OrderedDict[bytes, tuple]" = OrderedDict()
+        with open(temp_path, "wb") as temp:
+            for key, data, dim in reversed(keep):
+                temp.write(_RECORD_HEADER.pack(key, dim))
+                index[key] = (temp.tell(), dim)
+                temp.write(data)
+
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a+b")
+        self._index = index
+        self.compactions += 1
+
+    def clear(self):
+        with self._lock:
+            self._file.truncate(0)
+            self._index.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": len(self._index),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "compactions": self.compactions
+            }
+
+class EmbeddingCache:
+    """
+    Cache de embeddings por hash de modelo + texto normalizado: LRU em memória
+    mais o arquivo de vetores em disco. Hits do disco são promovidos para a memória.
+    """
+
+    def __init__(self, max_entries: int = 10000, disk_path: Optional[str] = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = VectorFile(disk_path, disk_max_bytes) if disk_path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = make_embedding_key(model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+
+        if self.disk:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self._store_memory(key, vector)
+                return vector.tolist()
+
+        self.misses += 1
+        return None
+
+    def set(self, model: str, text: str, embedding: List[float]) -> List[float]:
+        """Armazena o embedding e o retorna em float32 (igual ao que um hit devolveria)"""
+        key = make_embedding_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._store_memory(key, vector)
+        if self.disk:
+            self.disk.set(key, vector)
+        return vector.tolist()
+
+    def _store_memory(self, key: bytes, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        """Estatísticas de uso do cache"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk": self.disk.stats() if self.disk else None
+        }
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Retorna o cache global de embeddings, ou None se desabilitado (EMBEDDING_CACHE_ENABLED=false)"""
+    global _embedding_cache
+    if not langchain_config.embedding_cache_enabled:
+        return None
+    with _cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                max_entries=langchain_config.embedding_cache_max_entries,
+                disk_path=langchain_config.embedding_cache_path or None,
+                disk_max_bytes=langchain_config.embedding_cache_disk_max_bytes
+            )
+            logger.info("🧠 Cache de embeddings inicializado")
+    return _embedding_cache
+
+def embedding_cache_stats() -> Optional[Dict]:
+    """Estatísticas do cache de embeddings sem criá-lo (None se ainda não foi usado ou está desabilitado)"""
+    cache = _embedding_cache
+    return cache.stats() if cache is not None else None
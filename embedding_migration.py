@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from config import logger
+from memory import COLLECTIONS, ContentMemoryManager
+
+class EmbeddingMigration:
+    """
+    Re-embeda em background as coleções indexadas com outro modelo de embedding.
+    Os documentos do índice antigo são copiados em lotes paralelos para o índice novo
+    (embeddings com o modelo atual); o antigo continua servindo até a cópia terminar,
+    e escritas feitas no meio do caminho já vão para os dois (ver ContentMemoryManager._bulk_upsert).
+    """
+
+    def __init__(self, manager: ContentMemoryManager, batch_size: int = 64, concurrency: int = 4):
+        self.manager = manager
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # coleção -> progresso
+        self.progress: Dict[str, Dict[str, object]] = {}
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="embedding-migration", daemon=True)
+            self._thread.start()
+            logger.info(f"🔁 Migração de embeddings iniciada: {', '.join(self.manager.pending_migrations)}")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        for name in list(self.manager.pending_migrations):
+            if self._stop.is_set():
+                return
+            try:
+                self._migrate(name)
+            except Exception as e:
+                self.errors += 1
+                self.progress.setdefault(name, {})["status"] = f"error: {e}"
+                logger.error(f"❌ Erro na migração de embeddings de '{name}': {e}")
+
+    def _migrate(self, name: str):
+        target = self.manager.pending_migrations.get(name)
+        if target is None:
+            return
+        source = getattr(self.manager, COLLECTIONS[name])
+        progress = self.progress[name] = {"status": "running", "total": 0, "copied": 0, "started_at": time.time()}
+
+        # a cópia roda duas vezes: a segunda pega o que outros processos gravaram só no índice antigo
+        for _ in range(2):
+            pending = self._missing_ids(source, target)
+            if not pending:
+                break
+            progress["total"] += len(pending)
+            batches = (pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size))
+
+            # submete só `concurrency` lotes por vez: stop() não espera a fila inteira de lotes
+            pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding-migration")
+            in_flight = set()
+            try:
+                for batch in batches:
+                    if len(in_flight) >= self.concurrency:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        progress["copied"] += sum(future.result() for future in done)
+                    if self._stop.is_set():
+                        progress["status"] = "stopped"
+                        return
+                    in_flight.add(pool.submit(self._copy_batch, name, source, target, batch))
+                progress["copied"] += sum(future.result() for future in in_flight)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+            if self._stop.is_set():
+                progress["status"] = "stopped"
+                return
+
+        if self.manager.complete_migration(name, target):
+            progress["status"] = "completed"
+        else:
+            progress["status"] = "cancelled"
+        progress["seconds"] = round(time.time() - progress["started_at"], 1)
+
+    @staticmethod
+    def _missing_ids(source, target) -> List[str]:
+        existing = set(target._collection.get(include=[])["ids"])
+        return [doc_id for doc_id in source._collection.get(include=[])["ids"] if doc_id not in existing]
+
+    def _copy_batch(self, name: str, source, target, ids: List[str]) -> int:
+        if self._stop.is_set():
+            return 0
+        data = source._collection.get(ids=ids, include=["documents", "metadatas"])
+        embeddings = target.embeddings.embed_documents(data["documents"], concurrency=1)
+
+        with self.manager._write_lock:
+            # coleção limpa ou migração concluída por outro caminho
+            if self.manager.pending_migrations.get(name) is not target:
+                return 0
+            # não sobrescreve o que uma escrita nova já gravou no índice novo
+            existing = set(target._collection.get(ids=data["ids"], include=[])["ids"])
+            rows = [
+                (doc_id, embedding, metadata, document)
+                for doc_id, embedding, metadata, document in zip(
+                    data["ids"], embeddings, data["metadatas"], data["documents"]
+                )
+                if doc_id not in existing
+            ]
+            if rows:
+                doc_ids, row_embeddings, metadatas, documents = map(list, zip(*rows))
+                target._collection.upsert(
+                    ids=doc_ids, embeddings=row_embeddings, metadatas=metadatas, documents=documents
+                )
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "collections": {name: dict(progress) for name, progress in self.progress.items()}
+        }
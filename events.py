@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+# status que encerram o stream de eventos de uma task
+TERMINAL_STATUSES = ("completed", "error")
+
+def is_terminal_status(status: Optional[str]) -> bool:
+    return bool(status) and status.startswith(TERMINAL_STATUSES)
+
+def status_category(status: str) -> str:
+    """Categoria do status para contagem e filtro: 'error: ...' -> error"""
+    for terminal in TERMINAL_STATUSES:
+        if status.startswith(terminal):
+            return terminal
+    return status
+
+def status_event(status: str) -> Dict:
+    """Evento de transição de status da task"""
+    return {"type": "status", "status": status, "timestamp": datetime.now().isoformat()}
+
+def agent_event(state: str, agent: str, details: Optional[Dict] = None) -> Dict:
+    """Evento de progresso de um agente (started | completed | failed)"""
+    return {"type": "agent", "agent": agent, "state": state, "timestamp": datetime.now().isoformat(), **(details or {})}
+
+class TaskEventBus:
+    """
+    Pub/sub em processo dos eventos de tasks para os streams SSE.
+    Publicação pode vir de qualquer thread (workers da fila, relay do Redis);
+    cada assinante recebe os eventos na sua própria asyncio.Queue.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, task_id: str, event: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # loop já encerrado; o assinante será removido ao sair do contexto
+                pass
+
+    @contextmanager
+    def subscribe(self, task_id: str):
+        """Assina os eventos de uma task (usar dentro do event loop)"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(task_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[task_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+_event_bus = TaskEventBus()
+
+def get_event_bus() -> TaskEventBus:
+    """Retorna o barramento de eventos do processo"""
+    return _event_bus
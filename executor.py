@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import contextvars
+from typing import Any, Callable, Dict, List, Optional
+import time
+
+class TaskNode:
+    """Nó do grafo de execução: uma unidade de trabalho e suas dependências"""
+
+    def __init__(self, name: str, run: Callable[[Dict[str, Any]], Any], depends_on: Optional[List[str]] = None):
+        self.name = name
+        # recebe um dict {nome_dependencia: resultado} e retorna o resultado do nó
+        self.run = run
+        self.depends_on = list(depends_on or [])
+
+class DAGResult:
+    """Resultado da execução de um grafo de tarefas"""
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.durations: Dict[str, float] = {}
+        self.wall_time: float = 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> dict:
+        """Resumo de tempos: soma das latências vs tempo real (caminho crítico)"""
+        return {
+            "nodes": len(self.durations),
+            "errors": len(self.errors),
+            "sum_of_latencies": round(sum(self.durations.values()), 3),
+            "wall_time": round(self.wall_time, 3)
+        }
+
+class DAGExecutor:
+    """
+    Executa nós de um DAG respeitando dependências, com concorrência limitada.
+    Um nó só inicia quando todas as dependências terminaram com sucesso;
+    se alguma dependência falha, o nó é marcado como erro sem ser executado.
+    """
+
+    def __init__(self, max_workers: int = 4, on_event: Optional[Callable[[str, str, Dict[str, Any]], None]] = None):
+        if max_workers < 1:
+            raise ValueError("max_workers deve ser >= 1")
+        self.max_workers = max_workers
+        # callback (estado, nó, detalhes) chamado em started/completed/failed
+        self.on_event = on_event
+
+    def _emit(self, state: str, name: str, **details):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(state, name, details)
+        except Exception:
+            # falha ao notificar progresso não interrompe a execução
+            pass
+
+    def _validate(self, nodes: List[TaskNode]) -> Dict[str, TaskNode]:
+        """Valida nomes únicos, dependências existentes e ausência de ciclos"""
+        by_name: Dict[str, TaskNode] = {}
+        for node in nodes:
+            if node.name in by_name:
+                raise ValueError(f"Nó duplicado no grafo: {node.name}")
+            by_name[node.name] = node
+
+        for node in nodes:
+            for dep in node.depends_on:
+                if dep not in by_name:
+                    raise ValueError(f"Nó '{node.name}' depende de nó inexistente '{dep}'")
+
+        # ordenação topológica (Kahn) apenas para detectar ciclos
+        pending = {node.name: len(node.depends_on) for node in nodes}
+        ready = [name for name, count in pending.items() if count == 0]
+        visited = 0
+        while ready:
+            current = ready.pop()
+            visited += 1
+            for node in nodes:
+                if current in node.depends_on:
+                    pending[node.name] -= 1
+                    if pending[node.name] == 0:
+                        ready.append(node.name)
+
+        if visited != len(nodes):
+            raise ValueError("O grafo de tarefas contém ciclo")
+
+        return by_name
+
+    def run(self, nodes: List[TaskNode]) -> DAGResult:
+        """Executa o grafo e retorna resultados, erros e tempos por nó"""
+        by_name = self._validate(nodes)
+        result = DAGResult()
+
+        done = set()
+        started = set()
+        running = {}
+        start_time = time.perf_counter()
+
+        def execute(node: TaskNode, inputs: Dict[str, Any]):
+            node_start = time.perf_counter()
+            try:
+                return node.run(inputs)
+            finally:
+                result.durations[node.name] = time.perf_counter() - node_start
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent") as pool:
+            while len(done) < len(by_name):
+                # agenda todos os nós cujas dependências já terminaram
+                for name, node in by_name.items():
+                    if name in started or not all(dep in done for dep in node.depends_on):
+                        continue
+
+                    started.add(name)
+                    failed_deps = [dep for dep in node.depends_on if dep in result.errors]
+                    if failed_deps:
+                        result.errors[name] = f"dependência falhou: {', '.join(failed_deps)}"
+                        done.add(name)
+                        self._emit("failed", name, error=result.errors[name])
+                        continue
+
+                    inputs = {dep: result.results[dep] for dep in node.depends_on}
+                    # propaga o contexto (ex.: bypass de cache) para a thread do nó
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, execute, node, inputs)] = name
+                    self._emit("started", name)
+
+                if not running:
+                    # nós marcados como erro liberam dependentes na próxima volta
+                    continue
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        result.results[name] = future.result()
+                        self._emit("completed", name, duration=round(result.durations.get(name, 0.0), 3))
+                    except Exception as e:
+                        result.errors[name] = str(e)
+                        self._emit("failed", name, error=str(e), duration=round(result.durations.get(name, 0.0), 3))
+                    done.add(name)
+
+        result.wall_time = time.perf_counter() - start_time
+        return result
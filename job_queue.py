@@ -0,0 +1,149 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+from models import ContentBrief
+from task_store import TaskStore
+from config import logger
+
+class QueueFullError(Exception):
+    """Fila de jobs atingiu a capacidade máxima"""
+
+class JobQueue:
+    """
+    Fila FIFO de briefs apoiada no task store, processada por um número fixo de threads.
+    O handler (síncrono e bloqueante) roda fora do event loop, então o enfileiramento
+    e as consultas de posição/profundidade são imediatos. Com workers=0 o processo
+    apenas enfileira (ex.: API com workers separados consumindo do Redis).
+    """
+
+    def __init__(self, handler: Callable[[str, ContentBrief], None], store: TaskStore, workers: int = 1, max_size: int = 0):
+        if workers < 0:
+            raise ValueError("workers deve ser >= 0")
+        self.handler = handler
+        self.store = store
+        self.workers = workers
+        # 0 = sem limite
+        self.max_size = max_size
+
+        self._running = set()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+        # contadores simples para observabilidade (deste processo)
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+
+    def start(self):
+        """Inicia as threads de processamento e de manutenção dos leases"""
+        if self._threads or not self.workers:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        thread = threading.Thread(target=self._lease_loop, name="job-lease", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Sinaliza parada e aguarda os workers terminarem o job corrente"""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_forever(self):
+        """Bloqueia processando jobs até KeyboardInterrupt (uso em processo worker)"""
+        self.start()
+        try:
+            while not self._stopping.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def submit(self, job_id: str, brief: ContentBrief) -> int:
+        """Enfileira um job e retorna sua posição na fila (1 = próximo)"""
+        if self.max_size and self.store.queue_depth() >= self.max_size:
+            raise QueueFullError(f"Fila cheia ({self.max_size} jobs)")
+        position = self.store.enqueue(job_id, brief)
+        self._submitted += 1
+        return position
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Posição do job na fila (1 = próximo), ou None se não estiver aguardando"""
+        return self.store.queue_position(job_id)
+
+    @property
+    def depth(self) -> int:
+        """Quantidade de jobs aguardando processamento"""
+        return self.store.queue_depth()
+
+    @property
+    def in_flight(self) -> int:
+        """Quantidade de jobs em processamento neste processo"""
+        return len(self._running)
+
+    def stats(self) -> dict:
+        """Estatísticas da fila"""
+        return {
+            "backend": self.store.backend,
+            "workers": self.workers,
+            "max_size": self.max_size,
+            "depth": self.depth,
+            "in_flight": self.in_flight,
+            "submitted": self._submitted,
+            "processed": self._processed,
+            "failed": self._failed
+        }
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.store.dequeue(timeout=1.0)
+            except Exception as e:
+                logger.error(f"❌ Erro ao ler fila de jobs: {e}")
+                self._stopping.wait(1.0)
+                continue
+
+            if job is None:
+                continue
+
+            job_id, brief = job
+            with self._lock:
+                self._running.add(job_id)
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                self.handler(job_id, brief)
+            except Exception as e:
+                failed = True
+                logger.error(f"❌ Erro no job {job_id}: {e}")
+            finally:
+                self.store.ack(job_id)
+                with self._lock:
+                    self._running.discard(job_id)
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._processed += 1
+                logger.info(f"⏱️ Job {job_id} finalizado em {time.perf_counter() - start:.1f}s")
+
+    def _lease_loop(self):
+        # renova leases dos jobs locais e recupera jobs de workers que morreram
+        interval = max(1.0, getattr(self.store, "lease_seconds", 30) / 3)
+        while not self._stopping.wait(interval):
+            try:
+                with self._lock:
+                    running = list(self._running)
+                self.store.heartbeat(running)
+                self.store.requeue_expired()
+            except Exception as e:
+                logger.error(f"❌ Erro na manutenção da fila: {e}")
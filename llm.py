@@ -0,0 +1,145 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+
+from langchain.embeddings import OllamaEmbeddings
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk, LLMResult
+from langchain_ollama import OllamaLLM
+
+from embedding_cache import get_embedding_cache
+from llm_cache import get_completion_cache, make_cache_key
+from ollama_client import get_ollama_client
+
+class ContentOllamaLLM(OllamaLLM):
+    """
+    OllamaLLM usado pelos agentes, com cache de completions.
+    A chave é modelo + prompt completo + temperature/num_predict (e stop),
+    então reenviar o mesmo brief não paga de novo as mesmas chamadas.
+    Aceita format=<JSON schema> por chamada (saídas estruturadas, ver structured_output);
+    essas completions só entram no cache depois de validadas (cache_completion).
+    As chamadas passam pelo cliente HTTP compartilhado (ver ollama_client).
+    """
+
+    # o OllamaLLM da langchain-ollama 0.1 ignora a URL e usa o host padrão do pacote ollama
+    base_url: Optional[str] = None
+
+    def _create_generate_stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Iterator[Union[Mapping[str, Any], str]]:
+        if self.stop is not None and stop is not None:
+            raise ValueError("`stop` found in both the input and default params.")
+        elif self.stop is not None:
+            stop = self.stop
+
+        params = self._default_params
+        for key in self._default_params:
+            if key in kwargs:
+                params[key] = kwargs[key]
+        params["options"]["stop"] = stop
+
+        payload: Dict[str, Any] = {
+            "model": params["model"],
+            "prompt": prompt,
+            # opções não definidas ficam com o padrão do modelo no Ollama
+            "options": {key: value for key, value in params["options"].items() if value is not None},
+            "format": params["format"]
+        }
+        if params["keep_alive"] is not None:
+            payload["keep_alive"] = params["keep_alive"]
+
+        yield from get_ollama_client().generate_stream(payload, base_url=self.base_url)
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        # parâmetros sobrescritos por chamada mudam a saída; nesse caso não usa cache
+        # (exceto format, o JSON schema das saídas estruturadas, que entra na chave)
+        cache = get_completion_cache() if set(kwargs) <= {"format"} else None
+        
+        generations = []
+        for prompt in prompts:
+            key = None
+            if cache is not None:
+                key = self._cache_key(prompt, stop, kwargs.get("format"))
+                cached = cache.get(key)
+                if cached is not None:
+                    generations.append([GenerationChunk(text=cached)])
+                    continue
+            
+            final_chunk = self._stream_with_aggregation(
+                prompt,
+                stop=stop,
+                run_manager=run_manager,
+                verbose=self.verbose,
+                **kwargs,
+            )
+            # saída estruturada pode não validar no schema: quem valida grava (cache_completion)
+            if cache is not None and not kwargs.get("format"):
+                cache.set(key, final_chunk.text)
+            generations.append([final_chunk])
+        
+        return LLMResult(generations=generations)
+
+    def _cache_key(self, prompt: str, stop: Optional[List[str]], format: Optional[Any]) -> str:
+        return make_cache_key(
+            self.model, prompt, self.temperature, self.num_predict, stop or self.stop, format=format
+        )
+
+    def cache_completion(self, prompt: str, text: str, format: Optional[Any] = None):
+        """Grava no cache uma completion já validada, como resposta ao prompt original"""
+        cache = get_completion_cache()
+        if cache is not None:
+            cache.set(self._cache_key(prompt, None, format), text)
+
+class ContentOllamaEmbeddings(OllamaEmbeddings):
+    """
+    OllamaEmbeddings que usa o cliente HTTP compartilhado em vez de um requests.post por texto.
+    Os textos de um embed_documents são enviados em paralelo (espalhados entre os backends)
+    e textos já vistos (mesmo modelo e texto normalizado) vêm do cache de embeddings.
+    """
+
+    # requisições de embedding simultâneas por chamada de embed_documents
+    concurrency: int = 4
+
+    def embed_documents(self, texts: List[str], concurrency: Optional[int] = None) -> List[List[float]]:
+        """Embeddings de vários textos, com até `concurrency` requisições em paralelo (mantém a ordem)"""
+        return self._embed_concurrently([f"{self.embed_instruction}{text}" for text in texts], concurrency)
+
+    def embed_queries(self, texts: List[str], concurrency: Optional[int] = None) -> List[List[float]]:
+        """Como embed_query, para várias consultas de uma vez"""
+        return self._embed_concurrently([f"{self.query_instruction}{text}" for text in texts], concurrency)
+
+    def _embed_concurrently(self, prompts: List[str], concurrency: Optional[int]) -> List[List[float]]:
+        workers = min(concurrency or self.concurrency, len(prompts))
+        if workers <= 1:
+            return [self._process_emb_response(prompt) for prompt in prompts]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+            # propaga o contexto (ex.: prazo das chamadas ao Ollama) para cada thread
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._process_emb_response, prompt)
+                for prompt in prompts
+            ]
+            return [future.result() for future in futures]
+
+    def _process_emb_response(self, input: str) -> List[float]:
+        cache = get_embedding_cache()
+        if cache is not None:
+            cached = cache.get(self.model, input)
+            if cached is not None:
+                return cached
+        
+        options = {key: value for key, value in self._default_params["options"].items() if value is not None}
+        try:
+            embedding = get_ollama_client().embed(self.model, input, options=options, base_url=self.base_url)
+        except Exception as e:
+            raise ValueError(f"Error raised by inference endpoint: {e}")
+        
+        return cache.set(self.model, input, embedding) if cache is not None else embedding
@@ -0,0 +1,240 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+
+from config import langchain_config, logger
+
+# permite ignorar o cache numa requisição específica (regeneração deliberada);
+# é um contextvar para valer só para a chamada corrente e suas threads de agentes
+_bypass_cache = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True):
+    """Context manager que desliga a leitura do cache de completions"""
+    token = _bypass_cache.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass_cache.reset(token)
+
+def is_cache_bypassed() -> bool:
+    return _bypass_cache.get()
+
+def make_cache_key(model: str, prompt: str, temperature: Optional[float], num_predict: Optional[int],
+                   stop: Optional[List[str]] = None, format: Optional[Any] = None) -> str:
+    """Chave do cache: modelo, prompt completo, parâmetros de amostragem e formato (JSON schema)"""
+    parts = [model, prompt, temperature, num_predict, list(stop or [])]
+    if format:
+        parts.append(format)
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCacheTier:
+    """Camada em disco (SQLite) do cache, com valores comprimidos e limite de tamanho"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON completions (accessed_at)")
+        self._conn.commit()
+        # bytes gravados, mantido a cada escrita; o SUM só roda quando passa do limite
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    def get(self, key: str, ttl: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, size, created_at = row
+            if ttl and time.time() - created_at > ttl:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                self._bytes -= size
+                return None
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return zlib.decompress(value).decode("utf-8")
+
+    def set(self, key: str, text: str) -> int:
+        """Grava o valor e retorna quantas entradas foram removidas por tamanho"""
+        value = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+            self._bytes += len(value) - (previous[0] if previous else 0)
+            evicted = self._evict() if self._bytes > self.max_bytes else 0
+            self._conn.commit()
+            return evicted
+
+    def _evict(self) -> int:
+        # outro processo pode gravar no mesmo arquivo: acerta o total antes de despejar
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM completions ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (row[0],))
+            total -= row[1]
+            evicted += 1
+        self._bytes = total
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+        return {"path": self.path, "entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+class CompletionCache:
+    """
+    Cache de completions do LLM: LRU em memória com TTL e limite de entradas/bytes,
+    mais uma camada opcional em disco. Hits do disco são promovidos para a memória.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 0,
+                 disk_path: Optional[str] = None, disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # 0 = sem expiração
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.disk = DiskCacheTier(disk_path, disk_max_bytes) if disk_path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Busca uma completion; retorna None em miss (ou se o cache estiver ignorado)"""
+        if is_cache_bypassed():
+            self.bypassed += 1
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                text, created_at = entry
+                if self.ttl and time.time() - created_at > self.ttl:
+                    self._remove(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return text
+
+        if self.disk:
+            text = self.disk.get(key, self.ttl)
+            if text is not None:
+                self.disk_hits += 1
+                self._store_memory(key, text)
+                return text
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, text: str):
+        """Armazena uma completion (também quando o cache foi ignorado na leitura)"""
+        self._store_memory(key, text)
+        if self.disk:
+            self.evictions += self.disk.set(key, text)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk:
+            self.disk.clear()
+
+    def _store_memory(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (text, time.time())
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        text, _ = self._entries.pop(key)
+        self._bytes -= len(text.encode("utf-8"))
+
+    def stats(self) -> dict:
+        """Estatísticas de uso do cache"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk": self.disk.stats() if self.disk else None
+        }
+
+_completion_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Retorna o cache global de completions, ou None se desabilitado (LANGCHAIN_CACHE=false)"""
+    global _completion_cache
+    if not langchain_config.enable_cache:
+        return None
+    with _cache_lock:
+        if _completion_cache is None:
+            _completion_cache = CompletionCache(
+                max_entries=langchain_config.cache_max_entries,
+                max_bytes=langchain_config.cache_max_bytes,
+                ttl=langchain_config.cache_ttl,
+                disk_path=langchain_config.cache_disk_path or None,
+                disk_max_bytes=langchain_config.cache_disk_max_bytes
+            )
+            logger.info("🧠 Cache de completions do LLM inicializado")
+    return _completion_cache
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+import httpx
+
+from config import ollama_config, logger
+
+def normalize_model_name(name: str) -> str:
+    """'mistral' e 'mistral:latest' são o mesmo modelo"""
+    return name[:-len(":latest")] if name.endswith(":latest") else name
+
+class Backend:
+    """Estado de um servidor Ollama do pool"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        # None = ainda não verificado (aceita qualquer modelo até o primeiro health check)
+        self.models: Optional[Set[str]] = None
+        self.outstanding = 0
+        self.latency = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def serves(self, model: str) -> bool:
+        return self.models is None or normalize_model_name(model) in self.models
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": sorted(self.models) if self.models is not None else None,
+            "outstanding": self.outstanding,
+            "latency": round(self.latency, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "last_error": self.last_error
+        }
+
+class OllamaLoadBalancer:
+    """
+    Distribui as chamadas entre vários servidores Ollama.
+    Escolhe, entre os backends saudáveis que servem o modelo, o de menos requisições
+    em andamento (least_outstanding) ou o de menor (em andamento + 1) x latência média
+    (latency). Backends saem do pool após falhas seguidas de transporte/5xx ou
+    health check com erro, e voltam quando o health check periódico passa.
+    """
+
+    STRATEGIES = ("least_outstanding", "latency")
+
+    def __init__(self, urls: List[str], strategy: str = "least_outstanding", health_interval: float = 10.0,
+                 failure_threshold: int = 3, latency_alpha: float = 0.2):
+        if not urls:
+            raise ValueError("Nenhum backend Ollama configurado")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Estratégia de roteamento inválida: {strategy}")
+        self.backends = [Backend(url) for url in dict.fromkeys(url.rstrip("/") for url in urls)]
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.latency_alpha = latency_alpha
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __contains__(self, url: Optional[str]) -> bool:
+        return url is not None and any(backend.url == url.rstrip("/") for backend in self.backends)
+
+    def _score(self, backend: Backend) -> tuple:
+        if self.strategy == "latency":
+            # backend sem medição ainda entra com a menor latência conhecida (é testado logo)
+            return ((backend.outstanding + 1) * (backend.latency or 0.001), backend.outstanding)
+        return (backend.outstanding, backend.latency)
+
+    def choose(self, model: str, exclude: Optional[Set[str]] = None) -> Backend:
+        """Escolhe o backend para uma chamada ao modelo"""
+        exclude = exclude or set()
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude]
+            if not candidates:
+                raise RuntimeError("Nenhum backend Ollama disponível")
+            pool = (
+                [b for b in candidates if b.healthy and b.serves(model)]
+                or [b for b in candidates if b.healthy]
+                # todos fora do ar: tenta mesmo assim (pode ter voltado antes do health check)
+                or candidates
+            )
+            return min(pool, key=self._score)
+
+    @staticmethod
+    def is_backend_failure(error: Exception) -> bool:
+        """Falhas que indicam problema no servidor (e não na requisição)"""
+        status_code = getattr(error, "status_code", None)
+        return isinstance(error, httpx.TransportError) or (status_code is not None and status_code >= 500)
+
+    @contextmanager
+    def lease(self, model: str, exclude: Optional[Set[str]] = None):
+        """Reserva um backend durante uma chamada e registra latência/falha ao final"""
+        backend = self.choose(model, exclude)
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+        start = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            yield backend
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                backend.outstanding -= 1
+                if error is not None and self.is_backend_failure(error):
+                    backend.errors += 1
+                    backend.failures += 1
+                    backend.last_error = str(error)
+                    if backend.healthy and backend.failures >= self.failure_threshold:
+                        backend.healthy = False
+                        logger.warning(f"⚠️ Backend Ollama removido do pool após {backend.failures} falhas: {backend.url}")
+                elif error is None:
+                    backend.failures = 0
+                    backend.latency = elapsed if not backend.latency else (
+                        self.latency_alpha * elapsed + (1 - self.latency_alpha) * backend.latency
+                    )
+
+    async def check_all(self):
+        """Health check de todos os backends (mesma lógica do check_ollama_health)"""
+        results = await asyncio.gather(
+            *(ollama_config.check_ollama_health(backend.url) for backend in self.backends)
+        )
+        with self._lock:
+            for backend, health in zip(self.backends, results):
+                backend.last_check = time.time()
+                healthy = health.get("status") == "healthy"
+                if healthy:
+                    backend.models = {normalize_model_name(name) for name in health.get("available_models", [])}
+                    backend.failures = 0
+                    if not backend.healthy:
+                        logger.info(f"✅ Backend Ollama de volta ao pool: {backend.url}")
+                elif backend.healthy:
+                    backend.last_error = health.get("message")
+                    logger.warning(f"⚠️ Backend Ollama removido do pool (health check): {backend.url}")
+                backend.healthy = healthy
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while not self._stop.is_set():
+                try:
+                    loop.run_until_complete(self.check_all())
+                except Exception as e:
+                    logger.error(f"❌ Erro no health check dos backends Ollama: {e}")
+                self._stop.wait(self.health_interval)
+        finally:
+            loop.close()
+
+    def start(self):
+        """Inicia o health check periódico em background"""
+        if self._thread is not None or self.health_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            return sum(1 for backend in self.backends if backend.healthy)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "healthy": sum(1 for backend in self.backends if backend.healthy),
+                "backends": [backend.to_dict() for backend in self.backends]
+            }
+
+_load_balancer: Optional[OllamaLoadBalancer] = None
+_balancer_lock = threading.Lock()
+
+def get_load_balancer() -> OllamaLoadBalancer:
+    """Retorna o balanceador dos backends Ollama do processo"""
+    global _load_balancer
+    with _balancer_lock:
+        if _load_balancer is None:
+            _load_balancer = OllamaLoadBalancer(
+                ollama_config.base_urls,
+                strategy=ollama_config.routing_strategy,
+                health_interval=ollama_config.health_interval,
+                failure_threshold=ollama_config.failure_threshold
+            )
+    return _load_balancer
@@ -1,19 +1,46 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import uvicorn
 import os
 from dotenv import load_dotenv
 import asyncio
-from typing import Dict, List
+import json
+from typing import Any, Dict, List, Optional
 import uuid
+import threading
 from datetime import datetime
 
 from models import *
-from agents import ContentCreationAgents, ContentCreationCrew
+from job_queue import JobQueue, QueueFullError
+from task_store import get_task_store
+from llm_cache import get_completion_cache
+from semantic_cache import semantic_cache_stats
+from embedding_cache import embedding_cache_stats
+from structured_output import structured_stats
+from ollama_client import get_ollama_client
+from load_balancer import get_load_balancer
+from warmup import get_model_warmer
+from worker import run_content_task
+from events import get_event_bus, is_terminal_status, status_event
+from startup import startup_report, timed_import
+from metrics import RequestMetricsMiddleware, stats_collector
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from config import execution_config, ollama_config, setup_logging
 
 # carrega variáveis de ambiente
 load_dotenv()
+setup_logging()
+
+# imports de main (fastapi, pydantic, módulos do projeto) no relatório de startup
+startup_report.record("import", "main", time.perf_counter() - _import_started)
+
+# início do processo, para o uptime em /stats
+started_at = time.time()
 
 app = FastAPI(
     title="Multi-Agentes Conteúdo API",
@@ -30,28 +57,103 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# storage em memória para tasks (em produção usar Redis/DB)
-active_tasks: Dict[str, ContentPackage] = {}
-task_status: Dict[str, str] = {}
+# latência por endpoint para o Prometheus (/metrics)
+app.add_middleware(RequestMetricsMiddleware)
+
+# frontend estático
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+# gauges de /metrics, lidos das estatísticas já mantidas a cada scrape
+stats_collector.add_source("queue", lambda: job_queue.stats() if job_queue else None)
+stats_collector.add_source("tasks", lambda: get_task_store().status_counts())
+stats_collector.add_source("ollama", lambda: get_ollama_client().stats())
+stats_collector.add_source("cache:llm", lambda: get_completion_cache().stats() if get_completion_cache() else None)
+stats_collector.add_source("cache:semantic", semantic_cache_stats)
+stats_collector.add_source("cache:embedding", embedding_cache_stats)
+stats_collector.add_source("cache:rag_context", lambda: memory_stats().get("context_cache"))
 
-# inicializa agentes (singleton)
-agents = None
-crew = None
+# agentes e crew são criados no primeiro uso: importar crewai/langchain é a parte
+# mais cara da startup e réplicas que só enfileiram (JOB_QUEUE_WORKERS=0) nunca precisam deles
+_crew = None
+_crew_lock = threading.Lock()
+
+def get_crew():
+    """Retorna o crew de agentes (singleton criado no primeiro uso), ou None se falhar"""
+    global _crew
+    with _crew_lock:
+        if _crew is None:
+            try:
+                agents_module = timed_import("agents", "agents")
+                with startup_report.measure("init", "agents"):
+                    agents = agents_module.ContentCreationAgents(
+                        ollama_config.base_url,
+                        os.getenv("OLLAMA_MODEL", "mistral")
+                    )
+                    _crew = agents_module.ContentCreationCrew(agents)
+                print(f"✅ Agentes inicializados com sucesso - Ollama: {ollama_config.base_url}")
+            except Exception as e:
+                print(f"❌ Erro ao inicializar agentes: {e}")
+    return _crew
+
+# memória RAG (chromadb/langchain): carregada em background na startup, fora do caminho das requisições
+_memory = None
+_memory_error: Optional[str] = None
+_memory_lock = threading.Lock()
+
+def get_memory():
+    """Retorna o gerenciador de memória (criado no primeiro uso), ou None se falhar"""
+    global _memory, _memory_error
+    with _memory_lock:
+        if _memory is None:
+            try:
+                _memory = timed_import("memory", "memory").get_memory_manager()
+                _memory_error = None
+            except Exception as e:
+                _memory_error = str(e)
+                print(f"❌ Erro ao inicializar memória: {e}")
+    return _memory
+
+# fila de jobs: o crew é síncrono e bloqueante, então roda em threads dedicadas
+job_queue: Optional[JobQueue] = None
 
 @app.on_event("startup")
 async def startup_event():
-    """Inicializa os agentes na startup da aplicação"""
-    global agents, crew
+    """Inicia a fila de jobs e os serviços de background (agentes são criados no primeiro uso)"""
+    global job_queue
     
-    ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    model_name = os.getenv("OLLAMA_MODEL", "mistral")
+    # health check periódico dos backends Ollama (OLLAMA_BASE_URLS)
+    get_load_balancer().start()
     
-    try:
-        agents = ContentCreationAgents(ollama_url, model_name)
-        crew = ContentCreationCrew(agents)
-        print(f"✅ Agentes inicializados com sucesso - Ollama: {ollama_url}")
-    except Exception as e:
-        print(f"❌ Erro ao inicializar agentes: {e}")
+    # pré-carrega os modelos em background; /health só indica pronto depois disso
+    get_model_warmer().start()
+    
+    # storage das tasks: memória (padrão) ou Redis, conforme TASK_STORE_BACKEND;
+    # criado aqui e não no import (conectar ao Redis e montar o índice fazem round trips)
+    with startup_report.measure("init", "task_store"):
+        task_store = get_task_store()
+    
+    job_queue = JobQueue(
+        process_content_task,
+        task_store,
+        workers=execution_config.job_queue_workers,
+        max_size=execution_config.job_queue_max_size
+    )
+    job_queue.start()
+    task_store.start_event_relay()
+    threading.Thread(target=get_memory, name="memory-init", daemon=True).start()
+    print(f"✅ Fila de jobs iniciada ({task_store.backend}) com {execution_config.job_queue_workers} worker(s)")
+    print(f"⏱️ Startup: {startup_report.summary()}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Para os workers da fila de jobs e fecha as conexões com o Ollama"""
+    if job_queue:
+        job_queue.stop(timeout=5)
+    if _memory is not None:
+        _memory.stop_background_jobs(timeout=5)
+    get_model_warmer().stop(timeout=5)
+    get_load_balancer().stop(timeout=5)
+    await get_ollama_client().aclose()
 
 @app.get("/")
 async def root():
@@ -60,113 +162,191 @@ async def root():
         "message": "Multi-Agentes Conteúdo API",
         "version": "1.0.0",
         "status": "running",
-        "agents_ready": agents is not None,
+        "agents_ready": _crew is not None,
         "endpoints": {
             "create_content": "/content/create",
             "get_task": "/content/task/{task_id}",
+            "task_events": "/content/task/{task_id}/events",
             "list_tasks": "/content/tasks",
             "respond_public": "/public/respond",
+            "respond_public_batch": "/public/respond/batch",
+            "queue": "/queue",
             "health": "/health"
         }
     }
 
+@app.get("/app")
+async def serve_frontend():
+    """Serve o frontend da aplicação"""
+    return FileResponse('static/index.html')
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato do Prometheus (latência por endpoint, agentes, fila, caches, erros do Ollama)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
-    """Endpoint de health check"""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "agents_initialized": agents is not None,
-        "ollama_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    }
+    """
+    Endpoint de health check / readiness
+    Responde 503 enquanto os modelos não estão carregados no Ollama,
+    para o balanceador não mandar tráfego para uma instância fria
+    """
+    warmer = get_model_warmer()
+    ready = warmer.ready
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "healthy" if ready else "warming_up",
+            "ready": ready,
+            "timestamp": datetime.now().isoformat(),
+            "agents_initialized": _crew is not None,
+            "ollama_url": ollama_config.base_url,
+            "models": warmer.stats()
+        }
+    )
 
-@app.post("/content/create", response_model=Dict[str, str])
-async def create_content(brief: ContentBrief, background_tasks: BackgroundTasks):
+@app.post("/content/create", response_model=Dict[str, Any])
+async def create_content(brief: ContentBrief):
     """
     Endpoint principal para criação de conteúdo
-    Recebe um brief e inicia o processamento em background
+    Recebe um brief e o coloca na fila de processamento
+    (os agentes são criados pelo worker que pegar o job)
     """
-    if not crew:
-        raise HTTPException(status_code=503, detail="Agentes não inicializados")
-    
     task_id = str(uuid.uuid4())
     
-    # marca task como em processamento
-    task_status[task_id] = "processing"
-    
-    # adiciona task em background
-    background_tasks.add_task(process_content_task, task_id, brief)
+    # registra a task como aguardando na fila
+    try:
+        position = job_queue.submit(task_id, brief)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     return {
         "task_id": task_id,
-        "status": "processing",
+        "status": "queued",
+        "queue_position": position,
         "message": "Conteúdo sendo gerado. Use /content/task/{task_id} para acompanhar"
     }
 
-async def process_content_task(task_id: str, brief: ContentBrief):
-    """Processa a criação de conteúdo em background"""
-    try:
-        # executa o crew de agentes
-        result = crew.process_brief(brief)
-        
-        # salva resultado
-        active_tasks[task_id] = result
-        task_status[task_id] = "completed"
-        
-    except Exception as e:
-        # marca como erro
-        task_status[task_id] = f"error: {str(e)}"
-        
-        # cria pacote de erro
-        error_package = ContentPackage(
-            brief=brief,
-            task_id=task_id,
-            created_at=datetime.now().isoformat(),
-            status=f"error: {str(e)}"
-        )
-        active_tasks[task_id] = error_package
+def process_content_task(task_id: str, brief: ContentBrief):
+    """Processa a criação de conteúdo (executado pelos workers da fila)"""
+    run_content_task(get_crew, get_task_store(), task_id, brief)
 
 @app.get("/content/task/{task_id}")
 async def get_task_status(task_id: str):
     """Retorna o status e resultado de uma task específica"""
     
-    if task_id not in task_status:
+    status = get_task_store().get_status(task_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Task não encontrada")
     
-    status = task_status[task_id]
-    
     response = {
         "task_id": task_id,
         "status": status,
         "timestamp": datetime.now().isoformat()
     }
     
+    # se ainda na fila, informa a posição
+    if status == "queued":
+        response["queue_position"] = job_queue.position(task_id)
+    
     # se completada, inclui o resultado
-    if task_id in active_tasks:
-        response["result"] = active_tasks[task_id]
+    result = get_task_store().get_result(task_id)
+    if result is not None:
+        response["result"] = result
     
     return response
 
-@app.get("/content/tasks")
-async def list_tasks():
-    """Lista todas as tasks ativas"""
-    tasks = []
+def format_sse(event: Dict) -> str:
+    """Formata um evento no protocolo Server-Sent Events"""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.get("/content/task/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Stream SSE com as transições de status e a conclusão de cada agente da task.
+    Reenvia o histórico ao conectar (respeitando Last-Event-ID) e encerra no status final.
+    """
+    task_store = get_task_store()
+    if task_store.get_status(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task não encontrada")
     
-    for task_id, status in task_status.items():
-        task_info = {
-            "task_id": task_id,
-            "status": status
-        }
-        
-        if task_id in active_tasks:
-            task_info["created_at"] = active_tasks[task_id].created_at
-            task_info["brief_topic"] = active_tasks[task_id].brief.topic
+    try:
+        last_seq = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_seq = 0
+    
+    async def event_stream():
+        nonlocal last_seq
         
-        tasks.append(task_info)
+        # assina antes de ler o histórico para não perder eventos no meio
+        with get_event_bus().subscribe(task_id) as queue:
+            for event in task_store.get_events(task_id, after_seq=last_seq):
+                last_seq = event["seq"]
+                yield format_sse(event)
+                if event["type"] == "status" and is_terminal_status(event["status"]):
+                    return
+            
+            # task já encerrada sem evento final no replay (reconexão após o fim ou
+            # histórico expirado): envia o status final e fecha em vez de esperar para sempre
+            status = task_store.get_status(task_id)
+            if is_terminal_status(status):
+                yield format_sse({"seq": last_seq, **status_event(status)})
+                return
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # comentário SSE mantém a conexão viva através de proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                if event["seq"] <= last_seq:
+                    continue
+                last_seq = event["seq"]
+                yield format_sse(event)
+                if event["type"] == "status" and is_terminal_status(event["status"]):
+                    return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/content/tasks")
+async def list_tasks(
+    status: Optional[str] = Query(None, description="queued, processing, completed ou error"),
+    topic: Optional[str] = Query(None, description="Trecho do tópico (sem diferenciar maiúsculas)"),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Lista as tasks, das mais novas para as mais antigas, com paginação por cursor:
+    repita a chamada com o next_cursor da resposta até ele vir nulo
+    """
+    try:
+        tasks, next_cursor = get_task_store().query_tasks(
+            status=status,
+            topic=topic,
+            created_after=created_after.timestamp() if created_after else None,
+            created_before=created_before.timestamp() if created_before else None,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
     
     return {
-        "total_tasks": len(tasks),
-        "tasks": tasks
+        "total_tasks": sum(get_task_store().status_counts().values()),
+        "tasks": tasks,
+        "next_cursor": next_cursor
     }
 
 class PublicComment(BaseModel):
@@ -174,24 +354,84 @@ class PublicComment(BaseModel):
     comment: str
     platform: Platform
     post_id: Optional[str] = None
+    regenerate: bool = False
 
 @app.post("/public/respond", response_model=PublicoOutput)
-async def respond_to_public(comment_data: PublicComment):
+def respond_to_public(comment_data: PublicComment):
     """
     Endpoint para responder comentários/DMs do público
     Usa o agente especializado para manter identidade da marca
+    (síncrono: a geração bloqueia, então roda no threadpool do FastAPI)
     """
+    crew = get_crew()
     if not crew:
         raise HTTPException(status_code=503, detail="Agentes não inicializados")
     
     brand_persona = os.getenv("BRAND_PERSONA", "Marca jovem e descontraída")
     
     try:
-        response = crew.respond_to_public(comment_data.comment, brand_persona)
+        response = crew.respond_to_public(
+            comment_data.comment,
+            brand_persona,
+            platform=comment_data.platform,
+            regenerate=comment_data.regenerate
+        )
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar resposta: {str(e)}")
 
+class PublicBatchRequest(BaseModel):
+    """Lote de comentários do público"""
+    comments: List[PublicComment]
+
+class PublicBatchResult(BaseModel):
+    """Resultado de um comentário do lote (resposta ou erro isolado)"""
+    index: int
+    post_id: Optional[str] = None
+    output: Optional[PublicoOutput] = None
+    error: Optional[str] = None
+
+class PublicBatchResponse(BaseModel):
+    """Respostas do lote, na mesma ordem dos comentários enviados"""
+    total: int
+    failed: int
+    results: List[PublicBatchResult]
+
+@app.post("/public/respond/batch", response_model=PublicBatchResponse)
+def respond_to_public_batch(batch: PublicBatchRequest):
+    """
+    Responde vários comentários/DMs de uma vez
+    Os comentários são agrupados em poucos prompts (por orçamento de tokens);
+    a falha de um comentário não afeta os demais
+    """
+    crew = get_crew()
+    if not crew:
+        raise HTTPException(status_code=503, detail="Agentes não inicializados")
+    
+    if len(batch.comments) > execution_config.public_batch_max_comments:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo de {execution_config.public_batch_max_comments} comentários por requisição"
+        )
+    
+    brand_persona = os.getenv("BRAND_PERSONA", "Marca jovem e descontraída")
+    
+    answers = crew.respond_to_public_batch(
+        [(item.comment, item.platform, item.regenerate) for item in batch.comments],
+        brand_persona
+    )
+    
+    results = [
+        PublicBatchResult(index=index, post_id=item.post_id, output=output, error=error)
+        for index, (item, (output, error)) in enumerate(zip(batch.comments, answers))
+    ]
+    
+    return PublicBatchResponse(
+        total=len(results),
+        failed=sum(1 for result in results if result.error),
+        results=results
+    )
+
 class ContentIdeasRequest(BaseModel):
     """Request para geração de ideias criativas"""
     topic: str
@@ -199,12 +439,13 @@ class ContentIdeasRequest(BaseModel):
     tonality: Tonality = Tonality.CASUAL
 
 @app.post("/content/ideas", response_model=ConteudoOutput)
-async def generate_content_ideas(request: ContentIdeasRequest):
+def generate_content_ideas(request: ContentIdeasRequest):
     """
     Endpoint para gerar ideias criativas de conteúdo
     Usa apenas o agente de conteúdo para sugestões rápidas
     """
-    if not agents:
+    crew = get_crew()
+    if not crew:
         raise HTTPException(status_code=503, detail="Agentes não inicializados")
     
     # cria brief simplificado para o agente de conteúdo
@@ -216,7 +457,7 @@ async def generate_content_ideas(request: ContentIdeasRequest):
     )
     
     try:
-        task = agents.create_conteudo_task(brief)
+        task = crew.agents.create_conteudo_task(brief)
         # aqui executaria apenas este agente
         # por simplicidade, retornando estrutura mock
         
@@ -242,32 +483,63 @@ async def generate_content_ideas(request: ContentIdeasRequest):
 async def delete_task(task_id: str):
     """Remove uma task do sistema"""
     
-    if task_id not in task_status:
+    # remove do store (e da fila, se ainda estiver aguardando)
+    if not get_task_store().delete(task_id):
         raise HTTPException(status_code=404, detail="Task não encontrada")
     
-    # remove da memória
-    if task_id in task_status:
-        del task_status[task_id]
-    if task_id in active_tasks:
-        del active_tasks[task_id]
-    
     return {"message": f"Task {task_id} removida com sucesso"}
 
+@app.get("/queue")
+async def get_queue_stats():
+    """Estado da fila de jobs"""
+    return job_queue.stats()
+
+def memory_stats() -> Dict[str, Any]:
+    """Estatísticas da memória RAG (status loading/error enquanto ela não está disponível)"""
+    memory = _memory
+    if memory is not None:
+        return memory.get_stats()
+    if _memory_error:
+        return {"status": "error", "error": _memory_error}
+    return {"status": "loading"}
+
 @app.get("/stats")
 async def get_stats():
     """Estatísticas do sistema"""
     
-    completed_tasks = sum(1 for status in task_status.values() if status == "completed")
-    error_tasks = sum(1 for status in task_status.values() if "error" in status)
-    processing_tasks = sum(1 for status in task_status.values() if status == "processing")
+    task_store = get_task_store()
+    counts = task_store.status_counts()
+    now = time.time()
+    uptime = now - started_at
+    # tasks concluídas (completed ou error) por janela; a taxa usa a última hora ou o uptime, se menor
+    finished_5m = task_store.finished_since(now - 300)
+    finished_1h = task_store.finished_since(now - 3600)
     
     return {
-        "total_tasks": len(task_status),
-        "completed": completed_tasks,
-        "errors": error_tasks,
-        "processing": processing_tasks,
-        "agents_ready": agents is not None,
-        "uptime": "calculado em implementação real"
+        "total_tasks": sum(counts.values()),
+        "completed": counts.get("completed", 0),
+        "errors": counts.get("error", 0),
+        "processing": counts.get("processing", 0),
+        "queued": counts.get("queued", 0),
+        "queue": job_queue.stats() if job_queue else None,
+        "task_store": task_store.health(),
+        "task_results": task_store.stats(),
+        "llm_cache": get_completion_cache().stats() if get_completion_cache() else None,
+        "semantic_cache": semantic_cache_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "memory": memory_stats(),
+        "structured_output": structured_stats.to_dict(),
+        "ollama_client": get_ollama_client().stats(),
+        "ollama_backends": get_load_balancer().stats(),
+        "agents_ready": _crew is not None,
+        "startup": startup_report.to_dict(),
+        "started_at": datetime.fromtimestamp(started_at).isoformat(),
+        "uptime_seconds": round(uptime, 1),
+        "throughput": {
+            "finished_5m": finished_5m,
+            "finished_1h": finished_1h,
+            "per_minute": round(finished_1h / max(1.0, min(uptime, 3600) / 60), 2)
+        }
     }
 
 if __name__ == "__main__":
@@ -280,6 +552,7 @@ if __name__ == "__main__":
     print(f"📝 Debug mode: {debug}")
     print(f"🤖 Ollama URL: {os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')}")
     
+    import uvicorn
     uvicorn.run(
         "main:app",
         host=host,
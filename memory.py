@@ -1,17 +1,112 @@
 import chromadb
 from chromadb.config import Settings
 from langchain.vectorstores import Chroma
-from langchain.embeddings import OllamaEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+import contextvars
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
 import json
+import numpy as np
 import os
+import time
+import re
+import sqlite3
+import threading
 from datetime import datetime
 import uuid
 
-from models import ContentPackage, ContentBrief, Platform
-from config import ollama_config, logger
+try:
+    import fcntl
+except ImportError:
+    # sem flock (Windows): só o lock entre threads do processo
+    fcntl = None
+
+from models import AgentType, ContentPackage, ContentBrief, Platform, Tonality
+from rag import ContextSection, RAGContext, assemble_context
+from rag_cache import RAGContextCache, brief_fingerprint
+from startup import startup_report
+from ollama_client import request_deadline
+from vector_index import InMemoryVectorIndex
+from config import ollama_config, rag_config, logger
+
+# coleções lógicas -> atributo do store no gerenciador
+COLLECTIONS = {
+    "content_history": "content_store",
+    "brand_knowledge": "brand_store",
+    "trends_insights": "trends_store"
+}
+
+# coleção física, modelo e dimensão de cada coleção lógica (no diretório do Chroma)
+EMBEDDING_INDEX_FILE = "embedding_index.json"
+
+# versão do layout dos metadados; 2 = plataformas como flags booleanas filtráveis
+METADATA_VERSION = 2
+
+def platform_flag(platform: Platform) -> str:
+    return f"platform_{platform.value}"
+
+def platform_metadata(platforms: List[Platform]) -> Dict[str, Any]:
+    """
+    Plataformas em formato filtrável no Chroma (que não filtra listas):
+    uma flag booleana por plataforma, mais a lista como texto para exibição
+    """
+    metadata: Dict[str, Any] = {platform_flag(p): p in platforms for p in Platform}
+    metadata["platforms"] = ",".join(p.value for p in platforms)
+    return metadata
+
+def upgrade_metadata(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Metadados no layout atual, ou None se já estão nele"""
+    platforms = metadata.get("platforms")
+    if platforms is None or all(platform_flag(p) in metadata for p in Platform):
+        return None
+    if isinstance(platforms, str):
+        platforms = [value for value in platforms.split(",") if value]
+    values = {Platform(value) for value in platforms if value in Platform._value2member_map_}
+    return {**metadata, **platform_metadata([p for p in Platform if p in values])}
+
+def iso_timestamp(value: Any) -> Optional[float]:
+    """Epoch de uma data ISO dos metadados (None se ausente ou inválida)"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def content_filter(platform: Optional[Platform] = None, tonality: Optional[Tonality] = None,
+                   audience: Optional[str] = None) -> Dict[str, Any]:
+    """Filtro where do histórico de conteúdo, aplicado dentro da busca vetorial"""
+    conditions: List[Dict[str, Any]] = [{"type": "content_package"}]
+    if platform:
+        conditions.append({platform_flag(platform): True})
+    if tonality:
+        conditions.append({"tonality": tonality.value})
+    if audience:
+        conditions.append({"audience": audience})
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+# contadores de escrita por coleção lógica (tamanho médio dos chunks, última escrita)
+WRITE_STATS_FILE = "memory_stats.json"
+
+@contextmanager
+def file_lock(path: str):
+    """Lock exclusivo entre processos (flock no arquivo de lock) para ler-modificar-gravar"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def physical_collection_name(name: str, model: str, dimension: int) -> str:
+    """Nome da coleção Chroma de uma coleção lógica para um modelo de embedding"""
+    slug = re.sub(r"[^a-z0-9]+", "_", model.lower()).strip("_")
+    suffix = f"_{dimension}"
+    # o Chroma aceita até 63 caracteres
+    return f"{name}__{slug[:63 - len(name) - 2 - len(suffix)]}{suffix}"
 
 class ContentMemoryManager:
     """Gerenciador de memória usando Chroma para RAG e histórico"""
@@ -19,10 +114,39 @@ class ContentMemoryManager:
     def __init__(self, persist_directory: str = None):
         self.persist_directory = persist_directory or os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
         
-        # inicializa embeddings via Ollama
-        self.embeddings = OllamaEmbeddings(
-            base_url=ollama_config.base_url,
-            model=ollama_config.model_name
+        # inicializa embeddings via Ollama (modelo dedicado, ver OLLAMA_EMBEDDING_MODEL)
+        self.embeddings = ollama_config.create_embeddings()
+        self.embedding_model = ollama_config.embedding_model
+        self.embedding_dimension = self._validate_embedding_dimension()
+        
+        # escritas e troca de índice (fim de migração) não podem se intercalar
+        self._write_lock = threading.RLock()
+        self._index_path = os.path.join(self.persist_directory, EMBEDDING_INDEX_FILE)
+        self._index_mtime: Optional[float] = None
+        self._index_state: Dict[str, Dict[str, Any]] = {}
+        # coleção lógica -> store novo sendo preenchido pela migração
+        self.pending_migrations: Dict[str, Chroma] = {}
+        self.migration = None
+        self.maintenance = None
+        # coleção física -> índice em memória (só das coleções em RAG_INMEMORY_COLLECTIONS)
+        self._vector_indexes: Dict[str, InMemoryVectorIndex] = {}
+        # contextos RAG montados, invalidados pelas escritas nas coleções (None = desabilitado)
+        self.context_cache = (
+            RAGContextCache(rag_config.context_cache_size) if rag_config.context_cache_size else None
+        )
+        self._write_stats_path = os.path.join(self.persist_directory, WRITE_STATS_FILE)
+        # versão de escrita de cada coleção já vista por este processo: se outro processo
+        # gravar, a versão no arquivo muda e o índice em memória e o cache são atualizados
+        self._write_stats_mtime: Optional[float] = None
+        self._seen_versions: Dict[str, int] = {
+            name: entry.get("version", 0) for name, entry in self._load_write_stats().items()
+        }
+        # coleção física -> id do segmento vetorial (diretório do índice HNSW)
+        self._segment_ids: Dict[str, str] = {}
+        # buscas do contexto RAG em paralelo (as que estouram o prazo terminam aqui, sem bloquear quem pediu)
+        self._retrieval_pool = ThreadPoolExecutor(
+            max_workers=rag_config.retrieval_workers,
+            thread_name_prefix="rag-retrieval"
         )
         
         # configurações do Chroma
@@ -41,36 +165,220 @@ class ContentMemoryManager:
             length_function=len
         )
     
+    def _validate_embedding_dimension(self) -> int:
+        """Dimensão dos vetores do modelo de embedding, conferida com OLLAMA_EMBEDDING_DIMENSION"""
+        dimension = len(self.embeddings.embed_query("dimension probe"))
+        expected = ollama_config.embedding_dimension
+        if expected and dimension != expected:
+            raise ValueError(
+                f"Modelo de embedding '{self.embedding_model}' retorna vetores de dimensão {dimension}, "
+                f"esperado {expected} (OLLAMA_EMBEDDING_DIMENSION)"
+            )
+        return dimension
+    
+    def _open_store(self, collection_name: str, embeddings) -> Chroma:
+        return Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=self.persist_directory
+        )
+    
+    def _load_index_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            self._index_mtime = os.path.getmtime(self._index_path)
+            with open(self._index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def _save_index_state(self):
+        os.makedirs(self.persist_directory, exist_ok=True)
+        temp_path = f"{self._index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index_state, f, indent=2)
+        os.replace(temp_path, self._index_path)
+        self._index_mtime = os.path.getmtime(self._index_path)
+    
+    def _adopt_collection(self, name: str) -> Dict[str, Any]:
+        """Estado de uma coleção criada antes do índice: modelo deduzido pelos vetores gravados"""
+        sample = self._open_store(name, self.embeddings)._collection.get(limit=1, include=["embeddings"])
+        if not sample["ids"]:
+            return {
+                "collection": name,
+                "model": self.embedding_model,
+                "dimension": self.embedding_dimension,
+                "metadata_version": METADATA_VERSION
+            }
+        # antes do modelo dedicado, os embeddings usavam o modelo de geração
+        return {
+            "collection": name,
+            "model": ollama_config.model_name,
+            "dimension": len(sample["embeddings"][0]),
+            "metadata_version": 1
+        }
+    
+    def _resolve_store(self, name: str) -> Chroma:
+        """
+        Store que atende a coleção lógica. Se o índice foi gerado com outro modelo de embedding,
+        ele continua servindo (consultas com o modelo antigo) e um índice novo fica pendente de migração
+        """
+        state = self._index_state.get(name)
+        if state is None:
+            state = self._index_state[name] = self._adopt_collection(name)
+        
+        if state["model"] == self.embedding_model and state["dimension"] == self.embedding_dimension:
+            self.pending_migrations.pop(name, None)
+            return self._open_store(state["collection"], self.embeddings)
+        
+        target_name = physical_collection_name(name, self.embedding_model, self.embedding_dimension)
+        if name not in self.pending_migrations:
+            self.pending_migrations[name] = self._open_store(target_name, self.embeddings)
+            logger.warning(
+                f"⚠️ Coleção '{name}' indexada com '{state['model']}' ({state['dimension']}d); "
+                f"migração para '{self.embedding_model}' ({self.embedding_dimension}d) pendente"
+            )
+        return self._open_store(state["collection"], ollama_config.create_embeddings(model=state["model"]))
+    
     def _setup_collections(self):
         """Configura as collections do Chroma"""
         try:
-            # collection para histórico de conteúdo gerado
-            self.content_store = Chroma(
-                collection_name="content_history",
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory
-            )
+            self._index_state = self._load_index_state()
             
-            # collection para persona e guidelines da marca
-            self.brand_store = Chroma(
-                collection_name="brand_knowledge",
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory
-            )
-            
-            # collection para tendências e insights
-            self.trends_store = Chroma(
-                collection_name="trends_insights",
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory
-            )
+            # content_history: histórico de conteúdo gerado
+            # brand_knowledge: persona e guidelines da marca
+            # trends_insights: tendências e insights
+            for name, attribute in COLLECTIONS.items():
+                setattr(self, attribute, self._resolve_store(name))
+                if self._index_state[name].get("metadata_version", 1) < METADATA_VERSION:
+                    self._migrate_metadata(name)
+                self._load_vector_index(name)
             
+            self._save_index_state()
             logger.info(f"✅ Collections Chroma inicializadas em {self.persist_directory}")
             
         except Exception as e:
             logger.error(f"❌ Erro ao inicializar Chroma: {e}")
             raise
     
+    def _migrate_metadata(self, name: str, page_size: int = 500):
+        """
+        Atualiza os metadados antigos da coleção para o layout atual (só metadados, sem re-embedar).
+        Roda uma vez por coleção; o índice novo de uma migração de modelo copia já atualizado.
+        """
+        collection = getattr(self, COLLECTIONS[name])._collection
+        updated = 0
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            changes = [
+                (doc_id, upgraded)
+                for doc_id, upgraded in (
+                    (doc_id, upgrade_metadata(metadata or {}))
+                    for doc_id, metadata in zip(page["ids"], page["metadatas"])
+                )
+                if upgraded is not None
+            ]
+            if changes:
+                collection.update(ids=[doc_id for doc_id, _ in changes], metadatas=[m for _, m in changes])
+                updated += len(changes)
+            offset += len(page["ids"])
+        
+        self._index_state[name]["metadata_version"] = METADATA_VERSION
+        if updated:
+            logger.info(f"🔁 Metadados de '{name}' atualizados ({updated} documentos)")
+    
+    def _load_vector_index(self, name: str):
+        """(Re)carrega do Chroma o índice em memória da coleção, se ela estiver nesse modo"""
+        if name not in rag_config.inmemory_collections:
+            return
+        store = getattr(self, COLLECTIONS[name])
+        index = InMemoryVectorIndex(name)
+        index.load(store._collection)
+        indexes = {physical: item for physical, item in self._vector_indexes.items() if item.name != name}
+        indexes[store._collection.name] = index
+        self._vector_indexes = indexes
+        logger.info(f"⚡ Índice em memória de '{name}': {index.stats()['documents']} documentos")
+    
+    def _sync_external_writes(self):
+        """Recarrega índices em memória e invalida o cache de contexto se outro processo gravou"""
+        if not self._vector_indexes and self.context_cache is None:
+            return
+        try:
+            mtime = os.path.getmtime(self._write_stats_path)
+        except OSError:
+            mtime = None
+        if mtime == self._write_stats_mtime:
+            return
+        
+        with self._write_lock:
+            self._write_stats_mtime = mtime
+            # versão lida antes da recarga: uma escrita no meio do caminho força outra
+            for name, entry in self._load_write_stats().items():
+                version = entry.get("version", 0)
+                if name not in COLLECTIONS or version == self._seen_versions.get(name, 0):
+                    continue
+                self._seen_versions[name] = version
+                self._load_vector_index(name)
+                self._invalidate_context(name)
+    
+    def _vector_index(self, store: Chroma) -> Optional[InMemoryVectorIndex]:
+        """Índice em memória do store, se a coleção estiver nesse modo"""
+        if not self._vector_indexes:
+            return None
+        self._sync_external_writes()
+        return self._vector_indexes.get(store._collection.name)
+    
+    def _invalidate_context(self, name: str, platforms: Optional[List[str]] = None):
+        if self.context_cache is not None:
+            self.context_cache.invalidate(name, platforms)
+    
+    def _set_store(self, name: str, store: Chroma):
+        setattr(self, COLLECTIONS[name], store)
+        self._load_vector_index(name)
+        self._invalidate_context(name)
+    
+    def _sync_index_state(self):
+        """Recarrega os stores se outro processo concluiu uma migração (o arquivo de índice mudou)"""
+        try:
+            mtime = os.path.getmtime(self._index_path)
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+        
+        with self._write_lock:
+            state = self._load_index_state()
+            for name in COLLECTIONS:
+                if name in state and state[name] != self._index_state.get(name):
+                    self._index_state[name] = state[name]
+                    self._set_store(name, self._resolve_store(name))
+    
+    def complete_migration(self, name: str, target: Chroma) -> bool:
+        """Passa a servir o índice novo da coleção e remove o antigo (chamado pela migração)"""
+        attribute = COLLECTIONS[name]
+        with self._write_lock:
+            if self.pending_migrations.get(name) is not target:
+                return False
+            old_store = getattr(self, attribute)
+            self._set_store(name, target)
+            del self.pending_migrations[name]
+            self._index_state[name] = {
+                "collection": target._collection.name,
+                "model": self.embedding_model,
+                "dimension": self.embedding_dimension,
+                "metadata_version": METADATA_VERSION
+            }
+            self._save_index_state()
+        
+        try:
+            old_store.delete_collection()
+        except Exception as e:
+            logger.warning(f"⚠️ Índice antigo de '{name}' não removido: {e}")
+        logger.info(f"✅ Coleção '{name}' migrada para '{self.embedding_model}'")
+        return True
+    
     def store_content_package(self, package: ContentPackage) -> str:
         """Armazena um pacote de conteúdo completo na memória"""
         try:
@@ -78,11 +386,13 @@ class ContentMemoryManager:
             metadata = {
                 "task_id": package.task_id,
                 "created_at": package.created_at,
+                # numérico para a retenção (o Chroma só compara números)
+                "created_ts": iso_timestamp(package.created_at) or time.time(),
                 "status": package.status,
                 "topic": package.brief.topic,
                 "tonality": package.brief.tonality.value,
                 "audience": package.brief.target_audience,
-                "platforms": [p.value for p in package.brief.platforms],
+                **platform_metadata(package.brief.platforms),
                 "duration": package.brief.duration,
                 "type": "content_package"
             }
@@ -118,21 +428,13 @@ class ContentMemoryManager:
             # divide em chunks se necessário
             chunks = self.text_splitter.split_text(full_content)
             
-            # armazena cada chunk
-            doc_ids = []
-            for i, chunk in enumerate(chunks):
-                chunk_metadata = metadata.copy()
-                chunk_metadata["chunk_id"] = i
-                chunk_metadata["total_chunks"] = len(chunks)
-                
-                doc_id = f"{package.task_id}_chunk_{i}"
-                
-                self.content_store.add_texts(
-                    texts=[chunk],
-                    metadatas=[chunk_metadata],
-                    ids=[doc_id]
-                )
-                doc_ids.append(doc_id)
+            # embeddings dos chunks em paralelo e uma única escrita no Chroma
+            chunk_metadatas = [
+                {**metadata, "chunk_id": i, "total_chunks": len(chunks)}
+                for i in range(len(chunks))
+            ]
+            doc_ids = [f"{package.task_id}_chunk_{i}" for i in range(len(chunks))]
+            self._bulk_upsert("content_history", chunks, chunk_metadatas, doc_ids, batch_size=len(chunks))
             
             logger.info(f"📝 Conteúdo armazenado: {package.task_id} ({len(chunks)} chunks)")
             return package.task_id
@@ -141,23 +443,168 @@ class ContentMemoryManager:
             logger.error(f"❌ Erro ao armazenar conteúdo: {e}")
             raise
     
+    def delete_content_packages(self, task_ids: List[str]) -> int:
+        """
+        Remove todos os chunks de cada task_id (um delete por pacote, então nenhum
+        pacote fica pela metade). Durante uma migração de modelo, remove também do índice novo.
+        """
+        with self._write_lock:
+            stores = [self.content_store]
+            if "content_history" in self.pending_migrations:
+                stores.append(self.pending_migrations["content_history"])
+            for task_id in task_ids:
+                for store in stores:
+                    store._collection.delete(where={"task_id": task_id})
+            self._load_vector_index("content_history")
+            self._invalidate_context("content_history")
+            self._record_write("content_history", [])
+        return len(task_ids)
+    
+    def _bulk_upsert(self, name: str, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str],
+                     batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        """
+        Grava documentos em lotes: os embeddings de cada lote são calculados em paralelo
+        (até `concurrency` requisições) e o lote entra no Chroma com um único upsert.
+        Durante uma migração de modelo, grava também no índice novo.
+        """
+        self._sync_index_state()
+        batch_size = max(1, batch_size or rag_config.ingest_batch_size)
+        for start in range(0, len(texts), batch_size):
+            end = start + batch_size
+            while True:
+                stores = self._write_targets(name)
+                # embeddings fora do lock: as chamadas ao Ollama não seguram buscas nem outras escritas
+                embeddings = [self._embed_batch(store, texts[start:end], concurrency) for store in stores]
+                with self._write_lock:
+                    # migração começou ou terminou no meio: refaz para os stores atuais
+                    # (os embeddings já calculados vêm do cache de embeddings)
+                    if [id(store) for store in self._write_targets(name)] != [id(store) for store in stores]:
+                        continue
+                    for store, store_embeddings in zip(stores, embeddings):
+                        store._collection.upsert(
+                            ids=ids[start:end],
+                            embeddings=store_embeddings,
+                            metadatas=metadatas[start:end],
+                            documents=texts[start:end]
+                        )
+                        index = self._vector_indexes.get(store._collection.name)
+                        if index is not None:
+                            index.upsert(ids[start:end], store_embeddings, texts[start:end], metadatas[start:end])
+                break
+        
+        # no histórico, só os contextos das plataformas gravadas (e os sem filtro) ficam inválidos
+        platforms = None
+        if name == "content_history":
+            platforms = [p.value for p in Platform if any(metadata.get(platform_flag(p)) for metadata in metadatas)]
+        self._invalidate_context(name, platforms)
+        self._record_write(name, texts)
+    
+    def _write_targets(self, name: str) -> List[Chroma]:
+        """Stores que recebem as escritas da coleção (o atual e, durante uma migração, o novo)"""
+        with self._write_lock:
+            stores = [getattr(self, COLLECTIONS[name])]
+            if name in self.pending_migrations:
+                stores.append(self.pending_migrations[name])
+            return stores
+    
+    @staticmethod
+    def _embed_batch(store: Chroma, texts: List[str], concurrency: Optional[int]) -> List[List[float]]:
+        if concurrency:
+            return store.embeddings.embed_documents(texts, concurrency=concurrency)
+        return store.embeddings.embed_documents(texts)
+    
+    def _load_write_stats(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._write_stats_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def _record_write(self, name: str, texts: List[str], reset: bool = False):
+        """
+        Atualiza os contadores de escrita da coleção (relidos do arquivo: API e worker gravam,
+        então a atualização roda sob um lock entre processos).
+        A versão sobe a cada escrita, remoção ou limpeza e nunca é zerada
+        """
+        os.makedirs(self.persist_directory, exist_ok=True)
+        with self._write_lock, file_lock(f"{self._write_stats_path}.lock"):
+            write_stats = self._load_write_stats()
+            previous = write_stats.get(name, {}).get("version", 0)
+            version = previous + 1
+            if reset:
+                write_stats.pop(name, None)
+            entry = write_stats.setdefault(name, {"documents_written": 0, "chars_written": 0, "last_write": None})
+            entry["version"] = version
+            if texts:
+                entry["documents_written"] += len(texts)
+                entry["chars_written"] += sum(len(text) for text in texts)
+                entry["last_write"] = datetime.now().isoformat()
+            
+            temp_path = f"{self._write_stats_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(write_stats, f)
+            os.replace(temp_path, self._write_stats_path)
+            
+            # outro processo gravou desde a última sincronização: sem isso a versão
+            # dele seria marcada como vista junto com a nossa e nunca recarregada
+            if previous != self._seen_versions.get(name, 0):
+                self._load_vector_index(name)
+                self._invalidate_context(name)
+            # escrita deste processo: índice em memória e cache já foram atualizados
+            self._seen_versions[name] = version
+    
+    def _vector_segment_bytes(self, collection_name: str) -> Optional[int]:
+        """Tamanho em disco do índice vetorial da coleção (diretório do segmento HNSW)"""
+        segment_id = self._segment_ids.get(collection_name)
+        if segment_id is None:
+            database = os.path.join(self.persist_directory, "chroma.sqlite3")
+            if not os.path.exists(database):
+                return None
+            conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+            try:
+                row = conn.execute(
+                    "SELECT s.id FROM segments s JOIN collections c ON s.collection = c.id "
+                    "WHERE c.name = ? AND s.scope = 'VECTOR'",
+                    (collection_name,)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                return None
+            segment_id = self._segment_ids[collection_name] = row[0]
+        
+        directory = os.path.join(self.persist_directory, segment_id)
+        if not os.path.isdir(directory):
+            # o Chroma só grava o índice em disco depois do primeiro lote de vetores
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+    
+    def _brand_document(self, title: str, content: str, category: str = "guideline") -> Tuple[str, Dict[str, Any]]:
+        metadata = {
+            "title": title,
+            "category": category,
+            "created_at": datetime.now().isoformat(),
+            "type": "brand_guideline"
+        }
+        return content, metadata
+    
+    def _trend_document(self, trend: str, description: str, platforms: List[Platform]) -> Tuple[str, Dict[str, Any]]:
+        metadata = {
+            "trend": trend,
+            **platform_metadata(platforms),
+            "created_at": datetime.now().isoformat(),
+            "type": "trend_insight"
+        }
+        content = f"Tendência: {trend}\nDescrição: {description}\nPlataformas: {', '.join([p.value for p in platforms])}"
+        return content, metadata
+    
     def store_brand_guideline(self, title: str, content: str, category: str = "guideline") -> str:
         """Armazena guideline ou informação da marca"""
         try:
             doc_id = str(uuid.uuid4())
+            text, metadata = self._brand_document(title, content, category)
             
-            metadata = {
-                "title": title,
-                "category": category,
-                "created_at": datetime.now().isoformat(),
-                "type": "brand_guideline"
-            }
-            
-            self.brand_store.add_texts(
-                texts=[content],
-                metadatas=[metadata],
-                ids=[doc_id]
-            )
+            self._bulk_upsert("brand_knowledge", [text], [metadata], [doc_id])
             
             logger.info(f"📋 Guideline armazenada: {title}")
             return doc_id
@@ -166,25 +613,42 @@ class ContentMemoryManager:
             logger.error(f"❌ Erro ao armazenar guideline: {e}")
             raise
     
+    def store_brand_guidelines(self, guidelines: List[Dict[str, str]], batch_size: Optional[int] = None,
+                               concurrency: Optional[int] = None) -> List[str]:
+        """
+        Ingestão em lote de guidelines da marca
+        Cada item tem "title", "content" e opcionalmente "category"; retorna os ids na mesma ordem
+        """
+        try:
+            documents = [
+                self._brand_document(item["title"], item["content"], item.get("category", "guideline"))
+                for item in guidelines
+            ]
+            doc_ids = [str(uuid.uuid4()) for _ in documents]
+            
+            self._bulk_upsert(
+                "brand_knowledge",
+                [text for text, _ in documents],
+                [metadata for _, metadata in documents],
+                doc_ids,
+                batch_size=batch_size,
+                concurrency=concurrency
+            )
+            
+            logger.info(f"📋 {len(doc_ids)} guidelines armazenadas")
+            return doc_ids
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao armazenar guidelines em lote: {e}")
+            raise
+    
     def store_trend_insight(self, trend: str, description: str, platforms: List[Platform]) -> str:
         """Armazena insight sobre tendência"""
         try:
             doc_id = str(uuid.uuid4())
+            content, metadata = self._trend_document(trend, description, platforms)
             
-            metadata = {
-                "trend": trend,
-                "platforms": [p.value for p in platforms],
-                "created_at": datetime.now().isoformat(),
-                "type": "trend_insight"
-            }
-            
-            content = f"Tendência: {trend}\nDescrição: {description}\nPlataformas: {', '.join([p.value for p in platforms])}"
-            
-            self.trends_store.add_texts(
-                texts=[content],
-                metadatas=[metadata],
-                ids=[doc_id]
-            )
+            self._bulk_upsert("trends_insights", [content], [metadata], [doc_id])
             
             logger.info(f"📈 Tendência armazenada: {trend}")
             return doc_id
@@ -193,32 +657,47 @@ class ContentMemoryManager:
             logger.error(f"❌ Erro ao armazenar tendência: {e}")
             raise
     
-    def search_similar_content(self, query: str, platform: Optional[Platform] = None, limit: int = 5) -> List[Dict]:
-        """Busca conteúdo similar para RAG"""
+    def store_trend_insights(self, insights: List[Dict[str, Any]], batch_size: Optional[int] = None,
+                             concurrency: Optional[int] = None) -> List[str]:
+        """
+        Ingestão em lote de tendências
+        Cada item tem "trend", "description" e "platforms"; retorna os ids na mesma ordem
+        """
         try:
-            # prepara filtros
-            where_filter = {"type": "content_package"}
-            if platform:
-                # nota: Chroma tem limitações com filtros em arrays, então fazemos busca mais ampla
-                pass
-            
-            # busca por similaridade
-            results = self.content_store.similarity_search_with_score(
-                query=query,
-                k=limit,
-                filter=where_filter
+            documents = [
+                self._trend_document(item["trend"], item["description"], [Platform(p) for p in item["platforms"]])
+                for item in insights
+            ]
+            doc_ids = [str(uuid.uuid4()) for _ in documents]
+            
+            self._bulk_upsert(
+                "trends_insights",
+                [content for content, _ in documents],
+                [metadata for _, metadata in documents],
+                doc_ids,
+                batch_size=batch_size,
+                concurrency=concurrency
             )
             
-            # formata resultados
-            formatted_results = []
-            for doc, score in results:
-                result = {
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": score,
-                    "relevance": "high" if score < 0.3 else "medium" if score < 0.6 else "low"
-                }
-                formatted_results.append(result)
+            logger.info(f"📈 {len(doc_ids)} tendências armazenadas")
+            return doc_ids
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao armazenar tendências em lote: {e}")
+            raise
+    
+    def search_similar_content(self, query: str, platform: Optional[Platform] = None, limit: int = 5,
+                               tonality: Optional[Tonality] = None, audience: Optional[str] = None) -> List[Dict]:
+        """Busca conteúdo similar para RAG (plataforma, tom e público filtrados dentro da busca)"""
+        try:
+            # prepara filtros
+            where_filter = content_filter(platform, tonality, audience)
+            
+            # busca por similaridade (score = similaridade de cosseno, maior = mais parecido)
+            formatted_results = self._similarity_search(self.content_store, query, limit, where=where_filter)
+            for result in formatted_results:
+                score = result["similarity_score"]
+                result["relevance"] = "high" if score >= 0.85 else "medium" if score >= 0.7 else "low"
             
             logger.info(f"🔍 Busca realizada: '{query}' - {len(formatted_results)} resultados")
             return formatted_results
@@ -227,24 +706,50 @@ class ContentMemoryManager:
             logger.error(f"❌ Erro na busca: {e}")
             return []
     
+    def _similarity_search(self, store: Chroma, query: str, limit: int,
+                           where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Busca por texto no índice em memória da coleção, se houver, ou no Chroma.
+        similarity_score é sempre a similaridade de cosseno entre 0 e 1 (maior = mais parecido)
+        """
+        query_embedding = store.embeddings.embed_query(query)
+        index = self._vector_index(store)
+        if index is not None:
+            return [
+                {
+                    "content": item["content"],
+                    "metadata": item["metadata"],
+                    "similarity_score": max(0.0, 1.0 - item["distance"])
+                }
+                for item in index.query(query_embedding, limit, where=where)
+            ]
+        
+        # o Chroma ordena por distância L2; o cosseno é calculado com os embeddings devolvidos
+        results = store._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=limit,
+            where=where or None,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not results["ids"] or not results["ids"][0]:
+            return []
+        
+        vectors = np.asarray(results["embeddings"][0], dtype=np.float32)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+        scores = np.clip(vectors @ query_vector / np.maximum(norms, 1e-12), 0.0, 1.0)
+        
+        formatted_results = [
+            {"content": document, "metadata": metadata, "similarity_score": float(score)}
+            for document, metadata, score in zip(results["documents"][0], results["metadatas"][0], scores)
+        ]
+        formatted_results.sort(key=lambda result: result["similarity_score"], reverse=True)
+        return formatted_results
+    
     def get_brand_context(self, query: str, limit: int = 3) -> List[Dict]:
         """Recupera contexto da marca para RAG"""
         try:
-            results = self.brand_store.similarity_search_with_score(
-                query=query,
-                k=limit
-            )
-            
-            formatted_results = []
-            for doc, score in results:
-                result = {
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": score
-                }
-                formatted_results.append(result)
-            
-            return formatted_results
+            return self._similarity_search(self.brand_store, query, limit)
             
         except Exception as e:
             logger.error(f"❌ Erro ao buscar contexto da marca: {e}")
@@ -256,85 +761,217 @@ class ContentMemoryManager:
             # busca geral por tendências
             query = f"tendências {platform.value}" if platform else "tendências atuais"
             
-            results = self.trends_store.similarity_search_with_score(
-                query=query,
-                k=limit
-            )
-            
-            formatted_results = []
-            for doc, score in results:
-                result = {
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": score
-                }
-                formatted_results.append(result)
-            
-            return formatted_results
+            return self._similarity_search(self.trends_store, query, limit)
             
         except Exception as e:
             logger.error(f"❌ Erro ao buscar tendências: {e}")
             return []
     
-    def build_rag_context(self, brief: ContentBrief) -> str:
-        """Constrói contexto RAG para um brief"""
-        try:
-            context_parts = []
-            
-            # busca conteúdo similar
-            similar_content = self.search_similar_content(
-                query=f"{brief.topic} {brief.target_audience}",
-                platform=brief.platforms[0] if brief.platforms else None,
-                limit=3
-            )
-            
-            if similar_content:
-                context_parts.append("=== CONTEÚDO SIMILAR ANTERIOR ===")
-                for content in similar_content:
-                    context_parts.append(f"- {content['content'][:200]}...")
-            
-            # busca contexto da marca
-            brand_context = self.get_brand_context(
-                query=f"{brief.topic} {brief.tonality.value}",
-                limit=2
+    def _query_candidates(self, store: Chroma, query_embedding: List[float], k: int,
+                          where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Busca os k vizinhos mais próximos com os embeddings (necessários para o MMR)"""
+        index = self._vector_index(store)
+        if index is not None:
+            return index.query(query_embedding, k, where)
+        
+        results = store._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances", "embeddings"]
+        )
+        return [
+            {"content": document, "metadata": metadata, "distance": distance, "embedding": embedding}
+            for document, metadata, distance, embedding in zip(
+                results["documents"][0], results["metadatas"][0],
+                results["distances"][0], results["embeddings"][0]
             )
-            
-            if brand_context:
-                context_parts.append("\n=== DIRETRIZES DA MARCA ===")
-                for context in brand_context:
-                    context_parts.append(f"- {context['content']}")
-            
-            # busca tendências relevantes
-            trends = self.get_trending_insights(
-                platform=brief.platforms[0] if brief.platforms else None,
-                limit=2
+        ]
+    
+    @staticmethod
+    def _embed_queries(searches: List[Tuple[Chroma, str]]) -> Dict[Tuple[int, str], List[float]]:
+        """
+        Embeddings das consultas, uma vez por texto e em um lote por modelo
+        (durante uma migração um store pode ainda usar o modelo antigo)
+        """
+        by_model: Dict[int, Tuple[Any, List[str]]] = {}
+        for store, query in searches:
+            embeddings, queries = by_model.setdefault(id(store.embeddings), (store.embeddings, []))
+            if query not in queries:
+                queries.append(query)
+        
+        vectors = {}
+        for model_id, (embeddings, queries) in by_model.items():
+            for query, vector in zip(queries, embeddings.embed_queries(queries)):
+                vectors[(model_id, query)] = vector
+        return vectors
+    
+    def assemble_rag_context(self, brief: ContentBrief, agent: Optional[AgentType] = None,
+                             token_budget: Optional[int] = None) -> RAGContext:
+        """
+        Monta o contexto RAG de um brief dentro do orçamento de tokens do agente.
+        Seções por prioridade: diretrizes da marca, conteúdo similar e tendências;
+        trechos escolhidos por MMR, sem quase-duplicados (ver rag.assemble_context).
+        As três buscas rodam em paralelo dentro de RAG_RETRIEVAL_TIMEOUT; seção que falha
+        ou não chega a tempo fica de fora (context.missing_sections).
+        Contextos completos ficam no cache por fingerprint do brief até uma escrita
+        nas coleções de que dependem (RAG_CONTEXT_CACHE_SIZE=0 desabilita).
+        """
+        self._sync_index_state()
+        budget = token_budget or rag_config.budget_for(agent.value if agent else None)
+        if self.context_cache is None:
+            return self._retrieve_rag_context(brief, budget)
+        
+        self._sync_external_writes()
+        platform = brief.platforms[0].value if brief.platforms else None
+        # o histórico é filtrado pela plataforma; marca e tendências são lidas inteiras
+        dependencies = {"brand_knowledge": None, "content_history": platform, "trends_insights": None}
+        return self.context_cache.get_or_build(
+            brief_fingerprint(brief, budget), dependencies,
+            lambda: self._retrieve_rag_context(brief, budget)
+        )
+    
+    def _retrieve_rag_context(self, brief: ContentBrief, budget: int) -> RAGContext:
+        platform = brief.platforms[0] if brief.platforms else None
+        
+        searches = [
+            ("brand", "DIRETRIZES DA MARCA", self.brand_store, f"{brief.topic} {brief.tonality.value}", None, 0.35),
+            ("similar", "CONTEÚDO SIMILAR ANTERIOR", self.content_store, f"{brief.topic} {brief.target_audience}",
+             content_filter(platform), 0.45),
+            ("trends", "TENDÊNCIAS ATUAIS", self.trends_store,
+             f"tendências {platform.value}" if platform else "tendências atuais", None, 0.20)
+        ]
+        
+        started = time.monotonic()
+        deadline = started + rag_config.retrieval_timeout
+        sections = []
+        missing: List[str] = []
+        
+        # um lote de embeddings para todas as consultas, antes de buscar em paralelo;
+        # as chamadas ao Ollama herdam o prazo, então a thread do pool é liberada junto com quem pediu
+        with request_deadline(deadline):
+            embed_future = self._retrieval_pool.submit(
+                contextvars.copy_context().run,
+                self._embed_queries, [(store, query) for _, _, store, query, _, _ in searches]
             )
+        try:
+            query_embeddings = embed_future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # ainda na fila do pool (cheio): nem começa
+            embed_future.cancel()
+            logger.warning(f"⚠️ Embeddings das buscas RAG passaram de {rag_config.retrieval_timeout}s; contexto vazio")
+            query_embeddings = None
+        except Exception as e:
+            logger.error(f"❌ Erro nos embeddings das buscas RAG: {e}")
+            query_embeddings = None
+        
+        if query_embeddings is None:
+            missing = [key for key, *_ in searches]
+        else:
+            futures = {
+                key: self._retrieval_pool.submit(
+                    self._query_candidates, store, query_embeddings[(id(store.embeddings), query)],
+                    rag_config.fetch_k, where
+                )
+                for key, _, store, query, where, _ in searches
+            }
+            wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
             
-            if trends:
-                context_parts.append("\n=== TENDÊNCIAS ATUAIS ===")
-                for trend in trends:
-                    context_parts.append(f"- {trend['content']}")
-            
-            return "\n".join(context_parts) if context_parts else ""
+            for key, title, store, query, where, share in searches:
+                future = futures[key]
+                candidates = []
+                if not future.done():
+                    # busca que ainda não começou sai da fila do pool
+                    future.cancel()
+                    logger.warning(f"⚠️ Busca de {key} para o contexto RAG passou do prazo; seção omitida")
+                    missing.append(key)
+                elif future.exception() is not None:
+                    logger.error(f"❌ Erro na busca de {key} para o contexto RAG: {future.exception()}")
+                    missing.append(key)
+                else:
+                    candidates = future.result()
+                sections.append(ContextSection(
+                    key, title, query_embeddings[(id(store.embeddings), query)], candidates, share
+                ))
+        
+        context = assemble_context(
+            sections,
+            budget,
+            mmr_lambda=rag_config.mmr_lambda,
+            duplicate_threshold=rag_config.duplicate_threshold
+        )
+        context.missing_sections = missing
+        context.retrieval_ms = round((time.monotonic() - started) * 1000, 1)
+        logger.info(
+            f"🧩 Contexto RAG: {context.tokens_used}/{budget} tokens, "
+            f"{context.dropped_duplicates} duplicados descartados, busca em {context.retrieval_ms}ms"
+            + (f", sem {', '.join(missing)}" if missing else "")
+        )
+        return context
+    
+    def build_rag_context(self, brief: ContentBrief, agent: Optional[AgentType] = None) -> str:
+        """Constrói contexto RAG para um brief (texto limitado ao orçamento de tokens do agente)"""
+        try:
+            return self.assemble_rag_context(brief, agent).text
             
         except Exception as e:
             logger.error(f"❌ Erro ao construir contexto RAG: {e}")
             return ""
     
+    def stop_background_jobs(self, timeout: Optional[float] = None):
+        """Para a manutenção e a migração de embeddings em background (shutdown do processo)"""
+        for job in (self.maintenance, self.migration):
+            if job:
+                job.stop(timeout)
+    
     def get_stats(self) -> Dict[str, Any]:
-        """Retorna estatísticas da memória"""
+        """
+        Retorna estatísticas da memória
+        Contagens nativas das collections e contadores de escrita mantidos a cada gravação:
+        nada é lido documento a documento, então pode ser consultado com frequência
+        """
         try:
-            # conta documentos em cada collection
-            content_count = len(self.content_store.get()["ids"])
-            brand_count = len(self.brand_store.get()["ids"])
-            trends_count = len(self.trends_store.get()["ids"])
+            self._sync_index_state()
+            write_stats = self._load_write_stats()
+            
+            collections = {}
+            for name, attribute in COLLECTIONS.items():
+                collection = getattr(self, attribute)._collection
+                written = write_stats.get(name, {})
+                try:
+                    disk_bytes = self._vector_segment_bytes(collection.name)
+                except sqlite3.Error:
+                    disk_bytes = None
+                collections[name] = {
+                    "documents": collection.count(),
+                    "collection": collection.name,
+                    "vector_index_bytes": disk_bytes,
+                    "avg_chunk_chars": (
+                        round(written["chars_written"] / written["documents_written"], 1)
+                        if written.get("documents_written") else None
+                    ),
+                    "last_write": written.get("last_write")
+                }
             
+            database = os.path.join(self.persist_directory, "chroma.sqlite3")
             return {
-                "total_documents": content_count + brand_count + trends_count,
-                "content_packages": content_count,
-                "brand_guidelines": brand_count,
-                "trend_insights": trends_count,
+                "total_documents": sum(item["documents"] for item in collections.values()),
+                "content_packages": collections["content_history"]["documents"],
+                "brand_guidelines": collections["brand_knowledge"]["documents"],
+                "trend_insights": collections["trends_insights"]["documents"],
+                "collections": collections,
                 "persist_directory": self.persist_directory,
+                # documentos e metadados de todas as collections ficam no mesmo SQLite
+                "sqlite_bytes": os.path.getsize(database) if os.path.exists(database) else None,
+                "embedding": {
+                    "model": self.embedding_model,
+                    "dimension": self.embedding_dimension,
+                    "pending_migrations": list(self.pending_migrations),
+                    "migration": self.migration.stats() if self.migration else None
+                },
+                "maintenance": self.maintenance.stats() if self.maintenance else None,
+                "vector_indexes": {index.name: index.stats() for index in self._vector_indexes.values()},
+                "context_cache": self.context_cache.stats() if self.context_cache else None,
                 "status": "healthy"
             }
             
@@ -347,30 +984,29 @@ class ContentMemoryManager:
     
     def clear_collection(self, collection_name: str) -> bool:
         """Limpa uma collection específica (usar com cuidado!)"""
+        if collection_name not in COLLECTIONS:
+            return False
+        
         try:
-            if collection_name == "content_history":
-                self.content_store.delete_collection()
-                self.content_store = Chroma(
-                    collection_name="content_history",
-                    embedding_function=self.embeddings,
-                    persist_directory=self.persist_directory
-                )
-            elif collection_name == "brand_knowledge":
-                self.brand_store.delete_collection()
-                self.brand_store = Chroma(
-                    collection_name="brand_knowledge",
-                    embedding_function=self.embeddings,
-                    persist_directory=self.persist_directory
-                )
-            elif collection_name == "trends_insights":
-                self.trends_store.delete_collection()
-                self.trends_store = Chroma(
-                    collection_name="trends_insights",
-                    embedding_function=self.embeddings,
-                    persist_directory=self.persist_directory
-                )
-            else:
-                return False
+            attribute = COLLECTIONS[collection_name]
+            with self._write_lock:
+                getattr(self, attribute).delete_collection()
+                # coleção vazia não precisa de migração: já recomeça com o modelo atual
+                target = self.pending_migrations.pop(collection_name, None)
+                if target is not None:
+                    target.delete_collection()
+                
+                physical_name = self._index_state[collection_name]["collection"]
+                self._segment_ids.pop(physical_name, None)
+                self._set_store(collection_name, self._open_store(physical_name, self.embeddings))
+                self._index_state[collection_name] = {
+                    "collection": physical_name,
+                    "model": self.embedding_model,
+                    "dimension": self.embedding_dimension,
+                    "metadata_version": METADATA_VERSION
+                }
+                self._save_index_state()
+                self._record_write(collection_name, [], reset=True)
             
             logger.info(f"🗑️ Collection '{collection_name}' limpa")
             return True
@@ -379,9 +1015,43 @@ class ContentMemoryManager:
             logger.error(f"❌ Erro ao limpar collection: {e}")
             return False
 
-# instância global
-memory_manager = ContentMemoryManager()
+# instância global, criada no primeiro uso (conecta no Chroma e no modelo de embeddings)
+_memory_manager: Optional[ContentMemoryManager] = None
+_memory_lock = threading.Lock()
 
 def get_memory_manager() -> ContentMemoryManager:
     """Retorna instância do gerenciador de memória"""
-    return memory_manager
\ No newline at end of file
+    global _memory_manager
+    with _memory_lock:
+        if _memory_manager is None:
+            with startup_report.measure("init", "memory"):
+                _memory_manager = ContentMemoryManager()
+            
+            # índices gerados com outro modelo de embedding são re-embedados em background
+            if _memory_manager.pending_migrations and rag_config.migration_enabled:
+                from embedding_migration import EmbeddingMigration
+                _memory_manager.migration = EmbeddingMigration(
+                    _memory_manager,
+                    batch_size=rag_config.migration_batch_size,
+                    concurrency=rag_config.migration_concurrency
+                )
+                _memory_manager.migration.start()
+            
+            # retenção e compactação do content_history
+            if rag_config.maintenance_enabled:
+                from memory_maintenance import MemoryMaintenance
+                _memory_manager.maintenance = MemoryMaintenance(
+                    _memory_manager,
+                    interval=rag_config.maintenance_interval,
+                    retention_days=rag_config.retention_days,
+                    error_retention_days=rag_config.error_retention_days,
+                    duplicate_threshold=rag_config.compaction_threshold,
+                    io_budget=rag_config.maintenance_io_budget
+                )
+                _memory_manager.maintenance.start()
+    return _memory_manager
+
+def memory_stats() -> Optional[Dict[str, Any]]:
+    """Estatísticas da memória sem criá-la (None se ainda não foi usada)"""
+    manager = _memory_manager
+    return manager.get_stats() if manager is not None else None
\ No newline at end of file
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import logger
+
+# memory (chromadb/langchain) só para tipagem: a manutenção recebe o manager pronto
+if TYPE_CHECKING:
+    from memory import ContentMemoryManager
+
+def _created_ts(metadata: Dict[str, Any]) -> Optional[float]:
+    """Epoch de criação do chunk (created_ts, ou created_at ISO de chunks antigos)"""
+    if metadata.get("created_ts"):
+        return metadata["created_ts"]
+    try:
+        return datetime.fromisoformat(metadata.get("created_at")).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class MemoryMaintenance:
+    """
+    Manutenção periódica do content_history em background:
+    expira pacotes por idade (e pacotes com erro mais cedo), colapsa pacotes quase
+    idênticos (mesmo tópico e público, reexecuções do mesmo brief) mantendo o mais recente,
+    e remove todos os chunks de cada pacote de uma vez. A leitura é paginada por id e limitada
+    a io_budget documentos por segundo, para não disputar o Chroma com as buscas.
+    """
+
+    def __init__(self, manager: "ContentMemoryManager", interval: float = 3600.0, retention_days: float = 90.0,
+                 error_retention_days: float = 7.0, duplicate_threshold: float = 0.98,
+                 io_budget: int = 500, page_size: int = 200):
+        self.manager = manager
+        self.interval = interval
+        # 0 = sem expiração
+        self.retention_days = retention_days
+        self.error_retention_days = error_retention_days
+        # 0 = sem compactação de quase-duplicados
+        self.duplicate_threshold = duplicate_threshold
+        self.io_budget = max(1, io_budget)
+        self.page_size = max(1, page_size)
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.expired = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="memory-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Erro na manutenção da memória: {e}")
+            self._stop.wait(self.interval)
+
+    def _throttle(self, documents: int, started: float):
+        """Dorme o necessário para ficar dentro de io_budget documentos por segundo"""
+        wait = documents / self.io_budget - (time.monotonic() - started)
+        if wait > 0:
+            self._stop.wait(wait)
+
+    def _scan(self) -> Dict[str, Dict[str, Any]]:
+        """task_id -> ids dos chunks, data, status e grupo (tópico, público), só com metadados"""
+        collection = self.manager.content_store._collection
+        packages: Dict[str, Dict[str, Any]] = {}
+        started = time.monotonic()
+
+        # páginas por id sobre um retrato dos ids: com offset, escritas e deletes concorrentes
+        # deslocariam as páginas (chunks pulados ou contados duas vezes); o que entrar
+        # depois do retrato fica para a próxima passada
+        all_ids = collection.get(include=[])["ids"]
+        for offset in range(0, len(all_ids), self.page_size):
+            if self._stop.is_set():
+                break
+            page = collection.get(ids=all_ids[offset:offset + self.page_size], include=["metadatas"])
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                task_id = metadata.get("task_id")
+                if not task_id:
+                    continue
+                package = packages.setdefault(task_id, {
+                    "ids": [],
+                    "created": _created_ts(metadata),
+                    "status": str(metadata.get("status", "")),
+                    "group": (str(metadata.get("topic", "")).strip().lower(),
+                              str(metadata.get("audience", "")).strip().lower())
+                })
+                package["ids"].append(doc_id)
+            self._throttle(offset + len(page["ids"]), started)
+
+        return packages
+
+    def _expired(self, packages: Dict[str, Dict[str, Any]]) -> List[str]:
+        now = time.time()
+        expired = []
+        for task_id, package in packages.items():
+            created = package["created"]
+            if created is None:
+                continue
+            age_days = (now - created) / 86400
+            if "error" in package["status"] and self.error_retention_days and age_days > self.error_retention_days:
+                expired.append(task_id)
+            elif self.retention_days and age_days > self.retention_days:
+                expired.append(task_id)
+        return expired
+
+    def _near_duplicates(self, packages: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Pacotes quase idênticos a um mais recente do mesmo grupo (vetor médio dos chunks)"""
+        groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for task_id, package in packages.items():
+            groups[package["group"]].append(task_id)
+
+        collection = self.manager.content_store._collection
+        duplicates = []
+        started = time.monotonic()
+        read = 0
+
+        for task_ids in groups.values():
+            if len(task_ids) < 2 or self._stop.is_set():
+                continue
+            # mais recente primeiro: é o que fica
+            task_ids.sort(key=lambda task_id: packages[task_id]["created"] or 0, reverse=True)
+            ids = [doc_id for task_id in task_ids for doc_id in packages[task_id]["ids"]]
+            result = collection.get(ids=ids, include=["embeddings"])
+            read += len(ids)
+
+            by_id = dict(zip(result["ids"], result["embeddings"]))
+            chunk_vectors = [
+                [by_id[doc_id] for doc_id in packages[task_id]["ids"] if doc_id in by_id]
+                for task_id in task_ids
+            ]
+            dimension = next((len(vectors[0]) for vectors in chunk_vectors if vectors), 0)
+            if not dimension:
+                continue
+            # pacote sem vetores (removido no meio da passada) fica com vetor nulo e nunca é duplicado
+            matrix = np.stack([
+                np.mean(np.asarray(vectors, dtype=np.float32), axis=0) if vectors
+                else np.zeros(dimension, dtype=np.float32)
+                for vectors in chunk_vectors
+            ])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+            similarity = matrix @ matrix.T
+
+            kept: List[int] = []
+            for index, task_id in enumerate(task_ids):
+                if kept and similarity[index, kept].max() >= self.duplicate_threshold:
+                    duplicates.append(task_id)
+                else:
+                    kept.append(index)
+            self._throttle(read, started)
+
+        return duplicates
+
+    def run_once(self) -> dict:
+        """Uma passada completa de manutenção; retorna o que foi removido"""
+        started = time.monotonic()
+        packages = self._scan()
+
+        expired = self._expired(packages)
+        for task_id in expired:
+            packages.pop(task_id)
+        duplicates = self._near_duplicates(packages) if self.duplicate_threshold else []
+
+        # delete por task_id (where), não pelos ids lidos: chunks gravados depois da leitura também saem
+        removed = expired + duplicates
+        delete_started = time.monotonic()
+        for index in range(0, len(removed), self.page_size):
+            if self._stop.is_set():
+                break
+            batch = removed[index:index + self.page_size]
+            self.manager.delete_content_packages(batch)
+            self._throttle(index + len(batch), delete_started)
+
+        self.runs += 1
+        self.expired += len(expired)
+        self.duplicates += len(duplicates)
+        self.last_run = time.time()
+        self.last_duration = round(time.monotonic() - started, 2)
+        if removed:
+            logger.info(
+                f"🧹 Manutenção da memória: {len(expired)} pacotes expirados, "
+                f"{len(duplicates)} quase-duplicados removidos ({self.last_duration}s)"
+            )
+        return {"packages": len(packages) + len(expired), "expired": len(expired), "duplicates": len(duplicates)}
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "retention_days": self.retention_days,
+            "error_retention_days": self.error_retention_days,
+            "duplicate_threshold": self.duplicate_threshold,
+            "io_budget": self.io_budget,
+            "runs": self.runs,
+            "expired": self.expired,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration
+        }
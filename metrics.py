@@ -0,0 +1,173 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import httpx
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+from models import AgentType
+
+# agente que está gerando na thread/contexto atual (propagado para as threads do DAG)
+_current_agent = contextvars.ContextVar("metrics_agent", default=None)
+
+@contextmanager
+def agent_context(agent: Optional[AgentType]):
+    """Rotula as chamadas ao LLM feitas dentro do bloco com o tipo do agente"""
+    token = _current_agent.set(agent)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+def current_agent_label() -> str:
+    agent = _current_agent.get()
+    return agent.value if agent is not None else "none"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP até o início da resposta",
+    ["method", "handler", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+GENERATION_SECONDS = Histogram(
+    "agent_generation_seconds",
+    "Duração de cada geração no Ollama (total_duration), por agente",
+    ["agent"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+)
+PROMPT_TOKENS = Counter("agent_prompt_tokens_total", "Tokens de prompt processados, por agente", ["agent"])
+COMPLETION_TOKENS = Counter("agent_completion_tokens_total", "Tokens gerados, por agente", ["agent"])
+TOKENS_PER_SECOND = Histogram(
+    "agent_tokens_per_second",
+    "Velocidade de geração (eval_count / eval_duration), por agente",
+    ["agent"],
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 150)
+)
+
+OLLAMA_ERRORS = Counter("ollama_errors_total", "Erros nas chamadas ao Ollama", ["endpoint", "kind"])
+
+class RequestMetricsMiddleware:
+    """
+    Middleware ASGI com a latência de cada requisição até o início da resposta
+    (streams SSE contam só a abertura). O rótulo handler é o template da rota
+    ("/content/task/{task_id}"), para não criar uma série por id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # endpoint -> template do path, montado no primeiro uso (rotas já registradas)
+        self._paths: Optional[Dict[Any, str]] = None
+
+    def _handler(self, scope) -> str:
+        if self._paths is None:
+            self._paths = {
+                route.endpoint: route.path
+                for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        observed = False
+
+        async def send_wrapper(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                REQUEST_LATENCY.labels(scope["method"], self._handler(scope), str(message["status"])).observe(
+                    time.perf_counter() - started
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not observed:
+                REQUEST_LATENCY.labels(scope["method"], self._handler(scope), "500").observe(
+                    time.perf_counter() - started
+                )
+            raise
+
+def record_generation(part: Dict[str, Any]):
+    """Registra a parte final (done) de um /api/generate: durações do Ollama vêm em nanossegundos"""
+    agent = current_agent_label()
+    prompt_tokens = part.get("prompt_eval_count") or 0
+    completion_tokens = part.get("eval_count") or 0
+    if prompt_tokens:
+        PROMPT_TOKENS.labels(agent).inc(prompt_tokens)
+    if completion_tokens:
+        COMPLETION_TOKENS.labels(agent).inc(completion_tokens)
+    if part.get("total_duration"):
+        GENERATION_SECONDS.labels(agent).observe(part["total_duration"] / 1e9)
+    if completion_tokens and part.get("eval_duration"):
+        TOKENS_PER_SECOND.labels(agent).observe(completion_tokens / (part["eval_duration"] / 1e9))
+
+def record_ollama_error(endpoint: str, error: Exception):
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        kind = f"http_{status_code}"
+    elif isinstance(error, (httpx.TimeoutException, TimeoutError)):
+        # TimeoutError: prazo de quem pediu (ollama_client.DeadlineExceeded)
+        kind = "timeout"
+    elif isinstance(error, httpx.TransportError):
+        kind = "transport"
+    else:
+        kind = "other"
+    OLLAMA_ERRORS.labels(endpoint, kind).inc()
+
+class StatsCollector:
+    """
+    Gauges lidos só no scrape, a partir das estatísticas que o processo já mantém
+    (fila, tasks, caches, cliente Ollama): nada é atualizado no caminho das requisições.
+    Cada fonte devolve o dict de stats ou None (componente não carregado neste processo).
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Optional[dict]]] = {}
+
+    def add_source(self, name: str, source: Callable[[], Optional[dict]]):
+        self._sources[name] = source
+
+    def _read(self, name: str) -> Optional[dict]:
+        source = self._sources.get(name)
+        if source is None:
+            return None
+        try:
+            return source()
+        except Exception:
+            # scrape não pode falhar por causa de um componente
+            return None
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        queue = self._read("queue")
+        if queue:
+            yield GaugeMetricFamily("job_queue_depth", "Jobs aguardando na fila", value=queue["depth"])
+
+        counts = self._read("tasks")
+        if counts is not None:
+            tasks = GaugeMetricFamily("tasks", "Tasks no store por categoria de status", labels=["status"])
+            for status in ("queued", "processing", "completed", "error"):
+                tasks.add_metric([status], counts.get(status, 0))
+            yield tasks
+            yield GaugeMetricFamily("tasks_in_flight", "Tasks em processamento", value=counts.get("processing", 0))
+
+        ollama = self._read("ollama")
+        if ollama:
+            yield GaugeMetricFamily("ollama_in_flight_requests", "Requisições ao Ollama em andamento", value=ollama["in_flight"])
+
+        ratios = GaugeMetricFamily("cache_hit_ratio", "Taxa de acerto de cada cache desde o início do processo", labels=["cache"])
+        for name in ("llm", "semantic", "embedding", "rag_context"):
+            stats = self._read(f"cache:{name}")
+            if stats:
+                ratios.add_metric([name], stats["hit_ratio"])
+        yield ratios
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
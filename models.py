@@ -37,6 +37,7 @@ class ContentBrief(BaseModel):
     target_audience: str = Field("público geral", description="Público-alvo")
     platforms: List[Platform] = Field([Platform.TIKTOK], description="Plataformas de destino")
     additional_context: Optional[str] = Field(None, description="Contexto adicional")
+    regenerate: bool = Field(False, description="Ignora o cache do LLM e gera novamente")
 
 # modelos de saída padronizados
 class AgentMetadata(BaseModel):
@@ -66,6 +67,14 @@ class PublicoOutput(BaseModel):
     follow_up: Optional[str] = Field(None, description="Mensagem de follow-up se necessário")
     escalate_to_support: bool = Field(False, description="Se deve escalar para suporte")
 
+class PublicoBatchItem(PublicoOutput):
+    """Resposta a um comentário dentro de um lote"""
+    index: int = Field(..., description="Índice do comentário no lote")
+
+class PublicoBatchOutput(BaseModel):
+    """Saída do agente para público ao responder vários comentários de uma vez"""
+    responses: List[PublicoBatchItem] = Field(..., description="Uma resposta por comentário, com o mesmo índice")
+
 class ImagePrompt(BaseModel):
     """Prompt individual para geração de imagem"""
     prompt: str = Field(..., description="Prompt para Stable Diffusion/Midjourney")
@@ -131,6 +140,9 @@ class ContentPackage(BaseModel):
     editor_result: Optional[EditorOutput] = None
     images_result: Optional[ImagensOutput] = None
     production_result: Optional[ProducaoOutput] = None
+    # resultados de imagens/produção de cada plataforma do brief (os campos acima são os da principal)
+    images_by_platform: Dict[str, ImagensOutput] = Field(default_factory=dict)
+    production_by_platform: Dict[str, ProducaoOutput] = Field(default_factory=dict)
     content_ideas: Optional[ConteudoOutput] = None
     task_id: str = Field(..., description="ID único do pacote")
     created_at: str = Field(..., description="Timestamp de criação")
@@ -0,0 +1,287 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, TypeVar, Union
+
+import httpx
+
+from config import ollama_config, logger
+from load_balancer import OllamaLoadBalancer, get_load_balancer
+from metrics import record_generation, record_ollama_error
+
+T = TypeVar("T")
+
+# prazo (time.monotonic) das chamadas feitas no contexto atual; limita o timeout HTTP
+# para que a thread seja liberada quando quem pediu já desistiu de esperar
+_deadline = contextvars.ContextVar("ollama_deadline", default=None)
+
+@contextmanager
+def request_deadline(deadline: Optional[float]):
+    """Chamadas ao Ollama dentro do bloco usam no máximo o tempo que falta até deadline"""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+class DeadlineExceeded(TimeoutError):
+    """Chamada interrompida pelo prazo de quem pediu (não conta como falha do backend)"""
+
+class OllamaError(Exception):
+    """Erro HTTP retornado pelo Ollama"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Ollama HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+class OllamaClient:
+    """
+    Cliente HTTP único do processo para o Ollama.
+    Geração, embeddings e health checks compartilham um pool de conexões
+    keep-alive (sem handshake TCP por chamada de agente) e passam pelas
+    mesmas métricas de I/O. Com um balanceador, geração e embeddings são
+    distribuídos entre os backends (e refeitos em outro se a conexão falhar).
+    """
+
+    def __init__(self, base_url: str, timeout: float = 120.0, connect_timeout: float = 5.0,
+                 max_connections: int = 10, max_keepalive_connections: int = 10,
+                 balancer: Optional[OllamaLoadBalancer] = None, keep_alive: Optional[Union[int, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.balancer = balancer
+        # keep_alive enviado em toda chamada: sem ele o Ollama volta ao padrão (5m) e descarrega o modelo
+        self.keep_alive = keep_alive
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._client = httpx.Client(timeout=self._timeout, limits=self._limits)
+        # clientes assíncronos criados sob demanda, um por event loop
+        # (API e thread de health check do balanceador)
+        self._async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._in_flight = 0
+
+    def _request_timeout(self) -> httpx.Timeout:
+        """Timeout da chamada: o do cliente, reduzido ao que falta do prazo do contexto"""
+        deadline = _deadline.get()
+        if deadline is None:
+            return self._timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("prazo da chamada ao Ollama esgotado")
+        return httpx.Timeout(min(self._timeout.read, remaining), connect=min(self._timeout.connect, remaining))
+
+    @staticmethod
+    def _deadline_passed() -> bool:
+        deadline = _deadline.get()
+        return deadline is not None and time.monotonic() >= deadline
+
+    def _url(self, path: str, base_url: Optional[str] = None) -> str:
+        return f"{(base_url or self.base_url).rstrip('/')}{path}"
+
+    @contextmanager
+    def _measure(self, endpoint: str):
+        """Conta chamadas, erros, tempo total e requisições em andamento por endpoint"""
+        with self._lock:
+            self._in_flight += 1
+            stats = self._stats.setdefault(endpoint, {"requests": 0, "errors": 0, "seconds": 0.0})
+            stats["requests"] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                stats["errors"] += 1
+            record_ollama_error(endpoint, e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                stats["seconds"] += time.perf_counter() - start
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response):
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise OllamaError(response.status_code, message)
+
+    def _routed(self, base_url: Optional[str]) -> bool:
+        """Sem URL explícita (ou com a URL de um backend do pool) a chamada é balanceada"""
+        return self.balancer is not None and (base_url is None or base_url in self.balancer)
+
+    def _call_with_failover(self, model: str, call: Callable[[str], T]) -> T:
+        tried: Set[str] = set()
+        while True:
+            try:
+                with self.balancer.lease(model, exclude=tried) as backend:
+                    tried.add(backend.url)
+                    return call(backend.url)
+            except httpx.TransportError:
+                if len(tried) >= len(self.balancer.backends):
+                    raise
+
+    def generate_stream(self, payload: Dict[str, Any], base_url: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """POST /api/generate em streaming; produz cada parte da resposta já decodificada"""
+        if not self._routed(base_url):
+            yield from self._generate_stream(payload, base_url)
+            return
+
+        tried: Set[str] = set()
+        while True:
+            started = False
+            try:
+                with self.balancer.lease(payload["model"], exclude=tried) as backend:
+                    tried.add(backend.url)
+                    for part in self._generate_stream(payload, backend.url):
+                        started = True
+                        yield part
+                return
+            except httpx.TransportError:
+                # só refaz em outro backend se nada foi entregue ainda
+                if started or len(tried) >= len(self.balancer.backends):
+                    raise
+
+    def _generate_stream(self, payload: Dict[str, Any], base_url: Optional[str]) -> Iterator[Dict[str, Any]]:
+        if self.keep_alive is not None:
+            payload = {"keep_alive": self.keep_alive, **payload}
+        with self._measure("generate"):
+            with self._client.stream("POST", self._url("/api/generate", base_url), json={**payload, "stream": True}) as response:
+                if response.status_code != 200:
+                    response.read()
+                self._raise_for_status(response)
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    part = json.loads(line)
+                    if "error" in part:
+                        raise OllamaError(response.status_code, part["error"])
+                    if part.get("done"):
+                        # tokens e durações da geração, por agente
+                        record_generation(part)
+                    yield part
+
+    def embed(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+              base_url: Optional[str] = None) -> List[float]:
+        """POST /api/embeddings para um texto"""
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt}
+        if options:
+            payload["options"] = options
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        def call(url: Optional[str]) -> List[float]:
+            with self._measure("embeddings"):
+                try:
+                    response = self._client.post(
+                        self._url("/api/embeddings", url), json=payload, timeout=self._request_timeout()
+                    )
+                except httpx.TimeoutException as e:
+                    # timeout pelo prazo de quem pediu: sem failover e sem marcar o backend
+                    if self._deadline_passed():
+                        raise DeadlineExceeded(str(e)) from e
+                    raise
+                self._raise_for_status(response)
+                return response.json()["embedding"]
+
+        if self._routed(base_url):
+            return self._call_with_failover(model, call)
+        return call(base_url)
+
+    def load_model(self, model: str, base_url: str, embedding: bool = False):
+        """Carrega o modelo na memória de um backend específico (sem gerar texto)"""
+        payload: Dict[str, Any] = {"model": model}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if embedding:
+            # modelos só de embedding não aceitam /api/generate
+            path = "/api/embeddings"
+            payload["prompt"] = ""
+        else:
+            path = "/api/generate"
+            payload["stream"] = False
+        with self._measure("load"):
+            response = self._client.post(self._url(path, base_url), json=payload)
+            self._raise_for_status(response)
+
+    def loaded_models(self, base_url: str) -> List[str]:
+        """GET /api/ps: modelos carregados na memória de um backend"""
+        with self._measure("ps"):
+            response = self._client.get(self._url("/api/ps", base_url), timeout=10.0)
+            self._raise_for_status(response)
+            return [model.get("name", "") for model in response.json().get("models", [])]
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(timeout=self._timeout, limits=self._limits)
+                self._async_clients[loop] = client
+            return client
+
+    async def tags(self, base_url: Optional[str] = None, timeout: float = 10.0) -> httpx.Response:
+        """GET /api/tags (modelos disponíveis) de um backend específico"""
+        with self._measure("tags"):
+            return await self._async_client().get(self._url("/api/tags", base_url), timeout=timeout)
+
+    async def aclose(self):
+        """Fecha os pools de conexão (shutdown da API)"""
+        self._client.close()
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        self._client.close()
+
+    def stats(self) -> dict:
+        """Métricas de I/O com o Ollama por endpoint"""
+        with self._lock:
+            endpoints = {
+                name: {
+                    "requests": int(values["requests"]),
+                    "errors": int(values["errors"]),
+                    "seconds": round(values["seconds"], 3),
+                    "avg_seconds": round(values["seconds"] / values["requests"], 3) if values["requests"] else 0.0
+                }
+                for name, values in self._stats.items()
+            }
+            return {
+                "backends": [backend.url for backend in self.balancer.backends] if self.balancer else [self.base_url],
+                "in_flight": self._in_flight,
+                "max_connections": self._limits.max_connections,
+                "endpoints": endpoints
+            }
+
+_ollama_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+def get_ollama_client() -> OllamaClient:
+    """Retorna o cliente Ollama compartilhado do processo"""
+    global _ollama_client
+    with _client_lock:
+        if _ollama_client is None:
+            _ollama_client = OllamaClient(
+                ollama_config.base_url,
+                timeout=ollama_config.timeout,
+                connect_timeout=ollama_config.connect_timeout,
+                max_connections=ollama_config.max_connections,
+                max_keepalive_connections=ollama_config.max_keepalive_connections,
+                balancer=get_load_balancer(),
+                keep_alive=ollama_config.keep_alive
+            )
+            logger.info(
+                f"🔌 Cliente Ollama inicializado ({', '.join(ollama_config.base_urls)}, "
+                f"até {ollama_config.max_connections} conexões)"
+            )
+    return _ollama_client
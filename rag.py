@@ -0,0 +1,126 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tokens import estimate_tokens, truncate_to_tokens
+
+# trechos menores que isso não valem o corte para caber no que sobrou do orçamento
+MIN_TRUNCATED_TOKENS = 32
+
+class ContextSection:
+    """Seção do contexto RAG: título, busca e fração máxima do orçamento"""
+
+    def __init__(self, key: str, title: str, query_embedding: Sequence[float],
+                 candidates: List[Dict[str, Any]], max_share: float):
+        self.key = key
+        self.title = title
+        self.query_embedding = query_embedding
+        # dicts com "content" e "embedding" (resultado da busca na collection)
+        self.candidates = candidates
+        self.max_share = max_share
+
+class RAGContext:
+    """Contexto montado para um prompt, com a contabilidade de tokens"""
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+        self.tokens_used = 0
+        self.sections: Dict[str, List[str]] = {}
+        self.titles: Dict[str, str] = {}
+        self.candidates = 0
+        self.dropped_duplicates = 0
+        self.truncated = 0
+        # seções cuja busca falhou ou estourou o prazo (contexto parcial)
+        self.missing_sections: List[str] = []
+        self.retrieval_ms = 0.0
+
+    @property
+    def text(self) -> str:
+        parts = []
+        for key, items in self.sections.items():
+            if items:
+                parts.append(f"=== {self.titles[key]} ===")
+                parts.extend(f"- {item}" for item in items)
+        return "\n".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "tokens_used": self.tokens_used,
+            "sections": {key: len(items) for key, items in self.sections.items()},
+            "candidates": self.candidates,
+            "dropped_duplicates": self.dropped_duplicates,
+            "truncated": self.truncated,
+            "missing_sections": self.missing_sections,
+            "retrieval_ms": self.retrieval_ms
+        }
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def assemble_context(sections: List[ContextSection], token_budget: int, mmr_lambda: float = 0.7,
+                     duplicate_threshold: float = 0.95) -> RAGContext:
+    """
+    Preenche as seções em ordem de prioridade dentro do orçamento de tokens.
+    Em cada seção os trechos são escolhidos por MMR (relevância para a busca menos
+    redundância com o que já entrou, inclusive de outras seções); trechos quase
+    idênticos a um já escolhido são descartados. Cada seção usa até max_share do
+    orçamento, e o que uma seção não usa passa para as seguintes.
+    """
+    context = RAGContext(token_budget)
+    selected: List[np.ndarray] = []
+    carry = 0
+
+    for section in sections:
+        context.sections[section.key] = []
+        context.titles[section.key] = section.title
+        context.candidates += len(section.candidates)
+
+        header_tokens = estimate_tokens(f"=== {section.title} ===")
+        section_budget = min(int(token_budget * section.max_share) + carry, token_budget - context.tokens_used)
+        section_used = 0
+
+        candidates = [c for c in section.candidates if c.get("content") and c.get("embedding") is not None]
+        if candidates and section_budget > header_tokens:
+            embeddings = _normalize(np.asarray([c["embedding"] for c in candidates], dtype=np.float32))
+            query = _normalize(np.asarray(section.query_embedding, dtype=np.float32))
+            relevance = embeddings @ query
+            # maior similaridade de cada candidato com os trechos já escolhidos
+            redundancy = (
+                (embeddings @ np.stack(selected).T).max(axis=1) if selected
+                else np.zeros(len(candidates), dtype=np.float32)
+            )
+            remaining = list(range(len(candidates)))
+
+            while remaining:
+                scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy[remaining]
+                index = remaining.pop(int(np.argmax(scores)))
+
+                if redundancy[index] >= duplicate_threshold:
+                    context.dropped_duplicates += 1
+                    continue
+
+                available = section_budget - section_used - (0 if context.sections[section.key] else header_tokens)
+                content = " ".join(candidates[index]["content"].split())
+                cost = estimate_tokens(f"- {content}")
+                if cost > available:
+                    if available < MIN_TRUNCATED_TOKENS:
+                        continue
+                    content = truncate_to_tokens(content, available - 1)
+                    cost = estimate_tokens(f"- {content}")
+                    context.truncated += 1
+
+                if not context.sections[section.key]:
+                    section_used += header_tokens
+                context.sections[section.key].append(content)
+                section_used += cost
+
+                selected.append(embeddings[index])
+                redundancy = np.maximum(redundancy, embeddings @ embeddings[index])
+
+        context.tokens_used += section_used
+        carry = max(0, int(token_budget * section.max_share) + carry - section_used)
+
+    return context
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from embedding_cache import normalize_embedding_text
+from models import ContentBrief
+from rag import RAGContext
+
+def brief_fingerprint(brief: ContentBrief, token_budget: int) -> Tuple[str, str, str, str, int]:
+    """
+    Chave do contexto RAG de um brief: só o que entra nas buscas (tópico, público, tom,
+    primeira plataforma) mais o orçamento de tokens. Textos normalizados como no cache de embeddings
+    """
+    platform = brief.platforms[0].value if brief.platforms else ""
+    return (
+        normalize_embedding_text(brief.topic),
+        normalize_embedding_text(brief.target_audience),
+        brief.tonality.value,
+        platform,
+        token_budget
+    )
+
+class RAGContextCache:
+    """
+    LRU de contextos RAG montados, por fingerprint do brief.
+    Cada entrada guarda de quais coleções depende e com qual escopo (ex.: o histórico
+    filtrado por plataforma); uma escrita invalida só as entradas que ela pode alterar.
+    Briefs iguais montados ao mesmo tempo esperam a mesma busca (single-flight).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        # chave -> (contexto, coleção -> escopo ou None = coleção inteira)
+        self._entries: "OrderedDict[Hashable, Tuple[RAGContext, Dict[str, Optional[str]]]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        # incrementado a cada invalidação: resultado montado durante uma escrita não entra no cache
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get_or_build(self, key: Hashable, dependencies: Dict[str, Optional[str]],
+                     build: Callable[[], RAGContext]) -> RAGContext:
+        leader = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                generations = {name: self._generations.get(name, 0) for name in dependencies}
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            context = build()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            # contexto parcial (busca que falhou ou estourou o prazo) não é guardado
+            current = all(self._generations.get(name, 0) == generation for name, generation in generations.items())
+            if current and not context.missing_sections:
+                self._entries[key] = (context, dependencies)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        future.set_result(context)
+        return context
+
+    def invalidate(self, collection: str, scopes: Optional[Iterable[str]] = None) -> int:
+        """
+        Remove as entradas que dependem da coleção. Com scopes, só as de escopo
+        nesse conjunto ou sem escopo (que leem a coleção inteira)
+        """
+        scopes = set(scopes) if scopes is not None else None
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+            stale = [
+                key for key, (_, dependencies) in self._entries.items()
+                if collection in dependencies
+                and (scopes is None or dependencies[collection] is None or dependencies[collection] in scopes)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Estatísticas de uso do cache"""
+        lookups = self.hits + self.shared + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.shared) / lookups, 4) if lookups else 0.0
+        }
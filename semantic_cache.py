@@ -0,0 +1,224 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import Platform, PublicoOutput
+from startup import startup_report
+from config import langchain_config, ollama_config, logger
+
+def normalize_comment(comment: str) -> str:
+    """Normaliza o comentário para o match exato (caixa, espaços e pontuação repetida)"""
+    text = comment.strip().lower()
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"([!?.…])\1+", r"\1", text)
+    return text
+
+class _Partition:
+    """Índice vetorial de uma combinação plataforma + persona (linhas normalizadas)"""
+
+    def __init__(self, dimension: int, capacity: int = 64):
+        self.matrix = np.zeros((capacity, dimension), dtype=np.float32)
+        self.size = 0
+        self.entry_ids: List[int] = []
+
+    def add(self, entry_id: int, vector: np.ndarray) -> int:
+        if self.size == self.matrix.shape[0]:
+            grown = np.zeros((self.matrix.shape[0] * 2, self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+        self.matrix[self.size] = vector
+        self.entry_ids.append(entry_id)
+        self.size += 1
+        return self.size - 1
+
+    def remove(self, row: int) -> Optional[int]:
+        """Remove a linha trocando pela última; retorna o entry_id que mudou de linha"""
+        last = self.size - 1
+        moved = None
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.entry_ids[row] = self.entry_ids[last]
+            moved = self.entry_ids[row]
+        self.entry_ids.pop()
+        self.size -= 1
+        return moved
+
+    def best_match(self, vector: np.ndarray) -> Tuple[int, float]:
+        scores = self.matrix[:self.size] @ vector
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+class SemanticResponseCache:
+    """
+    Cache semântico de respostas ao público.
+    Comentários quase idênticos ("link?", "qual o link??") da mesma plataforma e
+    persona reutilizam a resposta anterior se a similaridade de cosseno passar do
+    limiar. Antes do embedding há um match exato pelo texto normalizado, que evita
+    até a chamada ao modelo de embeddings. Tamanho limitado com remoção LRU.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], List[float]], threshold: float = 0.92,
+                 max_entries: int = 5000, ttl: float = 0):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # 0 = sem expiração
+        self.ttl = ttl
+
+        self._partitions: Dict[str, _Partition] = {}
+        # entry_id -> (partição, linha, texto normalizado, resposta, criado em); ordem = LRU
+        self._entries: "OrderedDict[int, list]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _partition_key(platform: Optional[Platform], brand_persona: str) -> str:
+        persona_hash = hashlib.sha1(brand_persona.encode("utf-8")).hexdigest()[:12]
+        return f"{platform.value if platform else 'any'}:{persona_hash}"
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry: list) -> bool:
+        return bool(self.ttl) and time.time() - entry[4] > self.ttl
+
+    def lookup(self, comment: str, platform: Optional[Platform], brand_persona: str) -> Tuple[Optional[PublicoOutput], Optional[np.ndarray]]:
+        """
+        Procura resposta para um comentário equivalente.
+        Retorna (resposta, embedding); o embedding calculado pode ser reaproveitado no store.
+        """
+        partition_key = self._partition_key(platform, brand_persona)
+        normalized = normalize_comment(comment)
+
+        with self._lock:
+            entry_id = self._exact.get((partition_key, normalized))
+            if entry_id is not None:
+                entry = self._entries[entry_id]
+                if not self._expired(entry):
+                    self._entries.move_to_end(entry_id)
+                    self.exact_hits += 1
+                    return entry[3], None
+                self._remove(entry_id)
+
+            if partition_key not in self._partitions:
+                self.misses += 1
+                return None, None
+
+        # embedding fora do lock (chamada de rede)
+        vector = self._embed(normalized)
+
+        with self._lock:
+            partition = self._partitions.get(partition_key)
+            if partition is not None and partition.size and partition.matrix.shape[1] == vector.shape[0]:
+                row, score = partition.best_match(vector)
+                entry_id = partition.entry_ids[row]
+                entry = self._entries[entry_id]
+                if score >= self.threshold and not self._expired(entry):
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry[3], vector
+
+            self.misses += 1
+            return None, vector
+
+    def store(self, comment: str, platform: Optional[Platform], brand_persona: str,
+              output: PublicoOutput, embedding: Optional[np.ndarray] = None):
+        """Adiciona uma resposta ao índice (reaproveitando o embedding do lookup, se houver)"""
+        partition_key = self._partition_key(platform, brand_persona)
+        normalized = normalize_comment(comment)
+        vector = embedding if embedding is not None else self._embed(normalized)
+
+        with self._lock:
+            previous = self._exact.get((partition_key, normalized))
+            if previous is not None:
+                self._remove(previous)
+
+            partition = self._partitions.get(partition_key)
+            if partition is None or partition.matrix.shape[1] != vector.shape[0]:
+                # dimensão mudou (troca de modelo de embedding): recomeça a partição
+                if partition is not None:
+                    for entry_id in list(partition.entry_ids):
+                        self._remove(entry_id)
+                partition = _Partition(vector.shape[0])
+                self._partitions[partition_key] = partition
+
+            entry_id = self._next_id
+            self._next_id += 1
+            row = partition.add(entry_id, vector)
+            self._entries[entry_id] = [partition_key, row, normalized, output, time.time()]
+            self._exact[(partition_key, normalized)] = entry_id
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        partition_key, row, normalized, _, _ = self._entries.pop(entry_id)
+        self._exact.pop((partition_key, normalized), None)
+        partition = self._partitions[partition_key]
+        moved = partition.remove(row)
+        if moved is not None:
+            self._entries[moved][1] = row
+        if partition.size == 0:
+            del self._partitions[partition_key]
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._entries.clear()
+            self._exact.clear()
+
+    def stats(self) -> dict:
+        """Estatísticas de uso do cache"""
+        lookups = self.hits + self.exact_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "partitions": len(self._partitions),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.exact_hits) / lookups, 4) if lookups else 0.0
+        }
+
+_semantic_cache: Optional[SemanticResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticResponseCache]:
+    """Retorna o cache semântico de respostas, ou None se desabilitado"""
+    global _semantic_cache
+    if not langchain_config.semantic_cache_enabled:
+        return None
+    with _cache_lock:
+        if _semantic_cache is None:
+            with startup_report.measure("init", "semantic_cache"):
+                embeddings = ollama_config.create_embeddings()
+                _semantic_cache = SemanticResponseCache(
+                    embed_fn=embeddings.embed_query,
+                    threshold=langchain_config.semantic_cache_threshold,
+                    max_entries=langchain_config.semantic_cache_max_entries,
+                    ttl=langchain_config.semantic_cache_ttl
+                )
+            logger.info("🧠 Cache semântico de respostas inicializado")
+    return _semantic_cache
+
+def semantic_cache_stats() -> Optional[dict]:
+    """Estatísticas do cache semântico sem criá-lo (None se ainda não foi usado ou está desabilitado)"""
+    cache = _semantic_cache
+    return cache.stats() if cache is not None else None
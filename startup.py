@@ -0,0 +1,62 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Dict, List, Tuple
+
+class StartupReport:
+    """Tempo de import e de inicialização de cada componente (cold start)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (fase, componente, segundos) na ordem em que aconteceram
+        self.entries: List[Tuple[str, str, float]] = []
+
+    @contextmanager
+    def measure(self, phase: str, component: str):
+        """Mede o bloco e registra como fase ("import" ou "init") do componente"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, component, time.perf_counter() - start)
+
+    def record(self, phase: str, component: str, seconds: float):
+        with self._lock:
+            self.entries.append((phase, component, seconds))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            entries = list(self.entries)
+
+        components: Dict[str, Dict[str, float]] = {}
+        for phase, component, seconds in entries:
+            times = components.setdefault(component, {})
+            times[phase] = round(times.get(phase, 0.0) + seconds, 4)
+
+        return {
+            "components": components,
+            "import_seconds": round(sum(s for phase, _, s in entries if phase == "import"), 4),
+            "init_seconds": round(sum(s for phase, _, s in entries if phase == "init"), 4)
+        }
+
+    def summary(self) -> str:
+        """Linha única para o log de startup"""
+        report = self.to_dict()
+        parts = [
+            f"{component} " + "/".join(f"{phase} {seconds:.2f}s" for phase, seconds in times.items())
+            for component, times in report["components"].items()
+        ]
+        return (
+            f"imports {report['import_seconds']:.2f}s, init {report['init_seconds']:.2f}s"
+            + (f" ({', '.join(parts)})" if parts else "")
+        )
+
+def timed_import(component: str, module_name: str) -> ModuleType:
+    """Importa o módulo registrando o tempo no relatório de startup"""
+    with startup_report.measure("import", component):
+        return importlib.import_module(module_name)
+
+# relatório do processo (API ou worker)
+startup_report = StartupReport()
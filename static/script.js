@@ -20,7 +20,7 @@ const contentIdeasResult = document.getElementById('contentIdeasResult');
 
 // variável global para armazenar o brief ID atual
 let currentBriefId = null;
-let statusCheckInterval = null;
+let statusEventSource = null;
 
 // event listeners
 briefForm.addEventListener('submit', handleFormSubmit);
@@ -37,10 +37,10 @@ async function handleFormSubmit(event) {
         setLoadingState(true);
         const response = await submitBrief(briefData);
         
-        if (response.brief_id) {
-            currentBriefId = response.brief_id;
+        if (response.task_id) {
+            currentBriefId = response.task_id;
             showStatusSection(response);
-            startStatusPolling();
+            startStatusStream();
         }
     } catch (error) {
         showError('Erro ao enviar brief: ' + error.message);
@@ -76,7 +76,7 @@ function extractFormData(formData) {
 
 // envia brief para a API
 async function submitBrief(briefData) {
-    const response = await fetch(`${API_BASE_URL}/brief`, {
+    const response = await fetch(`${API_BASE_URL}/content/create`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -97,7 +97,7 @@ async function checkBriefStatus() {
     if (!currentBriefId) return;
     
     try {
-        const response = await fetch(`${API_BASE_URL}/brief/${currentBriefId}/status`);
+        const response = await fetch(`${API_BASE_URL}/content/task/${currentBriefId}`);
         
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}`);
@@ -106,9 +106,9 @@ async function checkBriefStatus() {
         const data = await response.json();
         updateStatusDisplay(data);
         
-        if (data.status === 'completed' && data.result) {
+        if (isFinalStatus(data.status) && data.result) {
             displayResults(data.result);
-            stopStatusPolling();
+            stopStatusStream();
         }
     } catch (error) {
         console.error('Erro ao verificar status:', error);
@@ -118,9 +118,11 @@ async function checkBriefStatus() {
 
 // exibe seção de status
 function showStatusSection(response) {
-    briefIdSpan.textContent = response.brief_id;
+    briefIdSpan.textContent = response.task_id;
     briefStatusSpan.textContent = response.status;
-    briefStatusSpan.className = `status-badge ${response.status}`;
+    briefStatusSpan.className = `status-badge ${statusClass(response.status)}`;
+    loadingSpinner.style.display = 'block';
+    getAgentProgressList().innerHTML = '';
     
     statusSection.style.display = 'block';
     statusSection.classList.add('fade-in');
@@ -132,13 +134,59 @@ function showStatusSection(response) {
 // atualiza display do status
 function updateStatusDisplay(data) {
     briefStatusSpan.textContent = data.status;
-    briefStatusSpan.className = `status-badge ${data.status}`;
+    briefStatusSpan.className = `status-badge ${statusClass(data.status)}`;
     
-    if (data.status === 'completed') {
+    if (isFinalStatus(data.status)) {
         loadingSpinner.style.display = 'none';
     }
 }
 
+// status final da task (completed ou error: ...)
+function isFinalStatus(status) {
+    return status === 'completed' || (status || '').startsWith('error');
+}
+
+// classe css do badge de status
+function statusClass(status) {
+    return (status || '').startsWith('error') ? 'error' : status;
+}
+
+// lista de progresso dos agentes (criada sob demanda na seção de status)
+function getAgentProgressList() {
+    let list = document.getElementById('agentProgress');
+    if (!list) {
+        list = document.createElement('ul');
+        list.id = 'agentProgress';
+        list.className = 'agent-progress';
+        statusSection.querySelector('.status-card').after(list);
+    }
+    return list;
+}
+
+// atualiza o progresso de um agente
+function updateAgentProgress(event) {
+    const list = getAgentProgressList();
+    const itemId = `agent-${event.agent.replace(/[^a-z0-9_-]/gi, '-')}`;
+    let item = document.getElementById(itemId);
+    
+    if (!item) {
+        item = document.createElement('li');
+        item.id = itemId;
+        list.appendChild(item);
+    }
+    
+    const icons = { started: 'fa-spinner fa-spin', completed: 'fa-check', failed: 'fa-times' };
+    const duration = event.duration !== undefined ? ` (${event.duration.toFixed(1)}s)` : '';
+    item.className = `agent-${event.state}`;
+    item.innerHTML = `<i class="fas ${icons[event.state] || 'fa-circle'}"></i> ${event.agent}${duration}`;
+}
+
+// resultados por plataforma (pacotes antigos só têm o da plataforma principal)
+function platformResults(byPlatform, primary) {
+    if (byPlatform && Object.keys(byPlatform).length) return byPlatform;
+    return primary ? { '': primary } : {};
+}
+
 // exibe os resultados na interface
 function displayResults(result) {
     const resultsDiv = document.getElementById('resultsSection');
@@ -164,7 +212,7 @@ function displayResults(result) {
                 <p><strong>Público-alvo:</strong> ${result.brief.target_audience}</p>
                 <p><strong>Tom:</strong> ${result.brief.tonality}</p>
                 <p><strong>Plataformas:</strong> ${result.brief.platforms.join(', ')}</p>
-                ${result.brief.additional_info ? `<p><strong>Informações adicionais:</strong> ${result.brief.additional_info}</p>` : ''}
+                ${result.brief.additional_context ? `<p><strong>Informações adicionais:</strong> ${result.brief.additional_context}</p>` : ''}
             </div>
         `;
         resultsDiv.appendChild(briefCard);
@@ -177,13 +225,15 @@ function displayResults(result) {
         copyCard.innerHTML = `
             <h3>✍️ Copywriter</h3>
             <div class="result-content">
-                <h4>Script Principal:</h4>
-                <p><strong>Plataforma:</strong> ${result.copywriter_result.scripts[0].platform}</p>
-                <p><strong>Script:</strong> ${result.copywriter_result.scripts[0].script}</p>
-                <p><strong>Hook:</strong> ${result.copywriter_result.scripts[0].hook}</p>
-                <p><strong>CTA:</strong> ${result.copywriter_result.scripts[0].cta}</p>
+                <h4>${result.copywriter_result.title}</h4>
+                <h4>Hooks:</h4>
+                <ul>
+                    ${result.copywriter_result.hooks.map(hook => `<li>${hook}</li>`).join('')}
+                </ul>
+                <p><strong>Script:</strong> ${result.copywriter_result.script_short}</p>
+                <p><strong>Descrição:</strong> ${result.copywriter_result.description}</p>
+                <p><strong>CTA:</strong> ${result.copywriter_result.cta}</p>
                 <p><strong>Hashtags:</strong> ${result.copywriter_result.hashtags.join(' ')}</p>
-                <p><strong>Cronograma:</strong> ${result.copywriter_result.posting_schedule}</p>
             </div>
         `;
         resultsDiv.appendChild(copyCard);
@@ -196,66 +246,69 @@ function displayResults(result) {
         editorCard.innerHTML = `
             <h3>📝 Editor</h3>
             <div class="result-content">
-                <h4>Script Final Otimizado:</h4>
-                <p>${result.editor_result.final_script}</p>
-                <h4>Melhorias Sugeridas:</h4>
+                <h4>Versão A (conservadora):</h4>
+                <p>${result.editor_result.version_a}</p>
+                <h4>Versão B (concisa/high-energy):</h4>
+                <p>${result.editor_result.version_b}</p>
+                <h4>Melhorias Aplicadas:</h4>
                 <ul>
                     ${result.editor_result.improvements.map(imp => `<li>${imp}</li>`).join('')}
                 </ul>
-                <p><strong>Score de Engajamento:</strong> ${result.editor_result.engagement_score}/10</p>
             </div>
         `;
         resultsDiv.appendChild(editorCard);
     }
     
-    // resultados de imagens
-    if (result.images_result) {
+    // resultados de imagens (um card por plataforma)
+    Object.entries(platformResults(result.images_by_platform, result.images_result)).forEach(([platform, images]) => {
         const imagesCard = document.createElement('div');
         imagesCard.className = 'result-card';
         imagesCard.innerHTML = `
-            <h3>🎨 Especialista em Imagens</h3>
+            <h3>🎨 Especialista em Imagens${platform ? ` (${platform})` : ''}</h3>
             <div class="result-content">
                 <h4>Prompts para Geração de Imagens:</h4>
                 <ul>
-                    ${result.images_result.prompts.map(prompt => `<li>${prompt}</li>`).join('')}
+                    ${images.image_prompts.map(item => 
+                        `<li>${item.prompt}<br><small><strong>Estilo:</strong> ${item.style} | <strong>Composição:</strong> ${item.composition}</small></li>`
+                    ).join('')}
                 </ul>
-                <h4>Dicas de Composição:</h4>
+                <h4>Recomendações de Thumbnail:</h4>
                 <ul>
-                    ${result.images_result.composition_tips.map(tip => `<li>${tip}</li>`).join('')}
+                    ${images.thumbnail_recommendations.map(tip => `<li>${tip}</li>`).join('')}
                 </ul>
                 <h4>Paleta de Cores:</h4>
                 <div style="display: flex; gap: 10px; margin-top: 10px;">
-                    ${result.images_result.color_palette.map(color => 
+                    ${images.color_palette.map(color => 
                         `<div style="width: 30px; height: 30px; background: ${color}; border-radius: 5px; border: 1px solid #ddd;" title="${color}"></div>`
                     ).join('')}
                 </div>
             </div>
         `;
         resultsDiv.appendChild(imagesCard);
-    }
+    });
     
-    // resultados de produção
-    if (result.production_result) {
+    // resultados de produção (um card por plataforma)
+    Object.entries(platformResults(result.production_by_platform, result.production_result)).forEach(([platform, production]) => {
         const productionCard = document.createElement('div');
         productionCard.className = 'result-card';
         productionCard.innerHTML = `
-            <h3>🎬 Especialista em Produção</h3>
+            <h3>🎬 Especialista em Produção${platform ? ` (${platform})` : ''}</h3>
             <div class="result-content">
                 <h4>Planos de Filmagem:</h4>
                 <ul>
-                    ${result.production_result.filming_plans.map(plan => 
+                    ${production.filming_plans.map(plan => 
                         `<li><strong>${plan.shot_type}:</strong> ${plan.background} - ${plan.lighting}</li>`
                     ).join('')}
                 </ul>
                 <h4>Falas do Apresentador:</h4>
                 <ul>
-                    ${result.production_result.presenter_lines.map(line => `<li>"${line}"</li>`).join('')}
+                    ${production.presenter_lines.map(line => `<li>"${line}"</li>`).join('')}
                 </ul>
-                <p><strong>Ritmo de Edição:</strong> ${result.production_result.editing_rhythm}</p>
+                <p><strong>Ritmo de Edição:</strong> ${production.editing_rhythm}</p>
             </div>
         `;
         resultsDiv.appendChild(productionCard);
-    }
+    });
     
     // resultados do criador de conteúdo
     if (result.content_creator_result) {
@@ -357,20 +410,44 @@ function formatResult(result) {
     return String(result);
 }
 
-// inicia polling de status
-function startStatusPolling() {
-    // verifica imediatamente
-    setTimeout(checkBriefStatus, 2000);
+// acompanha a task via Server-Sent Events (sem polling)
+function startStatusStream() {
+    stopStatusStream();
+    
+    if (!window.EventSource) {
+        // navegador sem suporte a SSE: consulta manual pelo botão
+        checkBriefStatus();
+        return;
+    }
+    
+    statusEventSource = new EventSource(`${API_BASE_URL}/content/task/${currentBriefId}/events`);
+    
+    statusEventSource.addEventListener('status', (message) => {
+        const event = JSON.parse(message.data);
+        updateStatusDisplay(event);
+        
+        if (isFinalStatus(event.status)) {
+            // o stream termina no status final; busca o resultado uma única vez
+            stopStatusStream();
+            checkBriefStatus();
+        }
+    });
+    
+    statusEventSource.addEventListener('agent', (message) => {
+        updateAgentProgress(JSON.parse(message.data));
+    });
     
-    // depois verifica a cada 5 segundos
-    statusCheckInterval = setInterval(checkBriefStatus, 5000);
+    statusEventSource.onerror = () => {
+        // o EventSource reconecta sozinho (com Last-Event-ID); só registra
+        console.warn('Conexão de eventos interrompida, reconectando...');
+    };
 }
 
-// para polling de status
-function stopStatusPolling() {
-    if (statusCheckInterval) {
-        clearInterval(statusCheckInterval);
-        statusCheckInterval = null;
+// encerra o stream de status
+function stopStatusStream() {
+    if (statusEventSource) {
+        statusEventSource.close();
+        statusEventSource = null;
     }
 }
 
@@ -428,8 +505,8 @@ function clearPreviousResults() {
     productionResult.textContent = '';
     contentIdeasResult.textContent = '';
     
-    // para polling anterior
-    stopStatusPolling();
+    // encerra stream anterior
+    stopStatusStream();
     currentBriefId = null;
 }
 
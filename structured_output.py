@@ -0,0 +1,178 @@
+import json
+import re
+import threading
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from config import langchain_config, logger
+
+T = TypeVar("T", bound=BaseModel)
+
+class StructuredOutputError(Exception):
+    """Saída do modelo não validou no schema mesmo após as tentativas de reparo"""
+
+    def __init__(self, model_name: str, errors: str, raw: str):
+        super().__init__(f"{model_name} inválido após reparos: {errors}")
+        self.model_name = model_name
+        self.errors = errors
+        self.raw = raw
+
+_schemas: Dict[type, Dict[str, Any]] = {}
+_schemas_lock = threading.Lock()
+
+def output_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """JSON schema do modelo de saída (gerado uma vez por classe)"""
+    with _schemas_lock:
+        schema = _schemas.get(model)
+        if schema is None:
+            schema = model.model_json_schema()
+            _schemas[model] = schema
+        return schema
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+def _extract_object(text: str) -> Optional[str]:
+    """Recorta o primeiro objeto JSON balanceado do texto (ignora prosa ao redor)"""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+def repair_json(text: str, model: Type[BaseModel]) -> Optional[str]:
+    """
+    Reparo local (sem chamar o modelo): remove cercas de markdown e texto ao redor,
+    vírgulas sobrando e o envelope {"NomeDoSchema": {...}} que alguns modelos criam.
+    """
+    candidate = _extract_object(_FENCE_RE.sub("", text.strip()))
+    if candidate is None:
+        return None
+    candidate = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        return candidate
+
+    if isinstance(data, dict) and len(data) == 1:
+        (key, value), = data.items()
+        if isinstance(value, dict) and key not in model.model_fields:
+            return json.dumps(value, ensure_ascii=False)
+    return candidate
+
+class StructuredOutputStats:
+    """Contadores de parsing das saídas dos agentes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.repaired = 0
+        self.retries = 0
+        self.failures = 0
+
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "parsed": self.parsed,
+            "repaired": self.repaired,
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+structured_stats = StructuredOutputStats()
+
+def parse_output(model: Type[T], text: str) -> T:
+    """
+    Converte o texto do modelo direto na classe de saída.
+    Caminho rápido: model_validate_json (parse + validação em uma passada, no pydantic-core);
+    só se falhar tenta o reparo local. Levanta ValidationError se nada validar.
+    """
+    try:
+        result = model.model_validate_json(text)
+        structured_stats.incr("parsed")
+        return result
+    except ValidationError:
+        repaired = repair_json(text, model)
+        if repaired is None or repaired == text:
+            raise
+
+    result = model.model_validate_json(repaired)
+    structured_stats.incr("repaired")
+    return result
+
+def _schema_prompt(prompt: str, schema: Dict[str, Any]) -> str:
+    return (
+        f"{prompt}\n\n"
+        "Responda APENAS com um objeto JSON válido seguindo exatamente este JSON schema:\n"
+        f"{json.dumps(schema, ensure_ascii=False)}"
+    )
+
+def _repair_prompt(raw: str, errors: str, schema: Dict[str, Any]) -> str:
+    return (
+        "O JSON abaixo não valida no schema. Corrija apenas o necessário, mantendo o conteúdo.\n"
+        f"Erros de validação:\n{errors}\n\n"
+        f"JSON:\n{raw}\n\n"
+        "Responda APENAS com o JSON corrigido seguindo este JSON schema:\n"
+        f"{json.dumps(schema, ensure_ascii=False)}"
+    )
+
+def generate_structured(llm, prompt: str, model: Type[T], max_retries: Optional[int] = None) -> T:
+    """
+    Gera a saída de um agente com decodificação restrita ao JSON schema do modelo
+    (parâmetro format do Ollama) e converte direto para a classe pydantic.
+    Saídas inválidas passam por reparo local e, se preciso, por até max_retries
+    pedidos de correção ao modelo (que só reescrevem o JSON, sem refazer a tarefa).
+    Só a saída que validou vai para o cache de completions, como resposta ao prompt
+    original: um brief que falhou não volta a ler a mesma saída inválida do cache.
+    """
+    if max_retries is None:
+        max_retries = langchain_config.structured_output_retries
+
+    schema = output_schema(model)
+    schema_prompt = _schema_prompt(prompt, schema)
+    raw = llm.invoke(schema_prompt, format=schema)
+
+    for attempt in range(max_retries + 1):
+        try:
+            result = parse_output(model, raw)
+        except ValidationError as e:
+            errors = str(e)
+        else:
+            cache_completion = getattr(llm, "cache_completion", None)
+            if cache_completion is not None:
+                cache_completion(schema_prompt, raw, format=schema)
+            return result
+
+        if attempt == max_retries:
+            break
+
+        structured_stats.incr("retries")
+        logger.warning(f"⚠️ Saída inválida para {model.__name__}, pedindo correção ({attempt + 1}/{max_retries})")
+        raw = llm.invoke(_repair_prompt(raw, errors, schema), format=schema)
+
+    structured_stats.incr("failures")
+    raise StructuredOutputError(model.__name__, errors, raw)
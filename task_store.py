@@ -0,0 +1,957 @@
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from models import ContentBrief, ContentPackage
+from events import get_event_bus, is_terminal_status, status_category, status_event
+from config import storage_config, logger
+
+class TaskStore(ABC):
+    """
+    Interface de armazenamento das tasks: status, resultados e a fila de briefs.
+    API e workers compartilham o mesmo store, então com um backend externo
+    (Redis) eles podem rodar em processos/máquinas diferentes.
+    """
+
+    # ---- status e resultados ----
+
+    @abstractmethod
+    def set_status(self, task_id: str, status: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_status(self, task_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def save_result(self, task_id: str, package: ContentPackage) -> None:
+        """Salva o pacote final e atualiza o status com o status do pacote"""
+
+    @abstractmethod
+    def get_result(self, task_id: str) -> Optional[ContentPackage]:
+        ...
+
+    @abstractmethod
+    def get_info(self, task_id: str) -> Optional[Dict]:
+        """Metadados leves da task (created_at, brief_topic)"""
+
+    @abstractmethod
+    def list_tasks(self) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def query_tasks(self, status: Optional[str] = None, topic: Optional[str] = None,
+                    created_after: Optional[float] = None, created_before: Optional[float] = None,
+                    cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Página de tasks, das mais novas para as mais antigas, filtrada por categoria de status,
+        trecho do tópico e criação (epoch). Retorna (tasks, cursor da próxima página ou None);
+        cursor inválido levanta ValueError
+        """
+
+    @abstractmethod
+    def status_counts(self) -> Dict[str, int]:
+        """Tasks por categoria de status (queued, processing, completed, error), sem varrer as tasks"""
+
+    @abstractmethod
+    def finished_since(self, timestamp: float) -> int:
+        """Tasks que terminaram (completed/error) desde o epoch dado, até THROUGHPUT_WINDOW atrás"""
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        """Remove a task (e a retira da fila se ainda estiver aguardando)"""
+
+    # ---- fila ----
+
+    @abstractmethod
+    def enqueue(self, task_id: str, brief: ContentBrief) -> int:
+        """Registra a task como 'queued' e a coloca no fim da fila; retorna a posição"""
+
+    @abstractmethod
+    def dequeue(self, timeout: float = 1.0) -> Optional[Tuple[str, ContentBrief]]:
+        """Retira o próximo brief da fila, bloqueando por até `timeout` segundos"""
+
+    @abstractmethod
+    def ack(self, task_id: str) -> None:
+        """Confirma que o processamento terminou (libera o lease do job)"""
+
+    @abstractmethod
+    def heartbeat(self, task_ids: List[str]) -> None:
+        """Renova o lease dos jobs em processamento"""
+
+    @abstractmethod
+    def requeue_expired(self) -> int:
+        """Devolve à fila jobs cujo worker morreu sem confirmar; retorna quantos"""
+
+    @abstractmethod
+    def queue_position(self, task_id: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def queue_depth(self) -> int:
+        ...
+
+    # ---- eventos de progresso ----
+
+    @abstractmethod
+    def publish_event(self, task_id: str, event: Dict) -> Dict:
+        """Registra um evento da task (com número de sequência) e notifica os assinantes"""
+
+    @abstractmethod
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Dict]:
+        """Histórico de eventos da task com seq > after_seq (para replay no SSE)"""
+
+    def start_event_relay(self) -> None:
+        """Começa a repassar eventos publicados por outros processos ao barramento local"""
+
+    # janela de conclusões guardada para o throughput (segundos)
+    THROUGHPUT_WINDOW = 3600
+
+    # intervalo mínimo entre varreduras de expiração (tasks cujo resultado expirou saem por inteiro)
+    PURGE_INTERVAL = 60.0
+
+    def health(self) -> Dict:
+        return {"backend": self.backend, "status": "healthy"}
+
+    def stats(self) -> Dict:
+        """Ocupação do store (resultados em memória/disco, quando aplicável)"""
+        return {"backend": self.backend}
+
+class ResultStore:
+    """
+    Resultados das tasks do store em memória, com ocupação limitada.
+    Os usados mais recentemente ficam em memória até max_bytes (tamanho do JSON);
+    os demais vão para um SQLite em disco, comprimidos, e voltam de forma
+    transparente no get. Resultados salvos há mais de ttl segundos são descartados.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 0, spill_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        # 0 = sem expiração
+        self.ttl = ttl
+        self.spill_path = spill_path
+
+        # task_id -> (pacote, tamanho); ordem = LRU
+        self._entries: "OrderedDict[str, Tuple[ContentPackage, int]]" = OrderedDict()
+        # task_id -> quando foi salvo; ordem = gravação (para expirar sem varrer tudo)
+        self._saved: "OrderedDict[str, float]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if spill_path:
+            # arquivo próprio do processo (réplicas e workers podem apontar para o mesmo caminho):
+            # nada do que ficou de outro processo é lido nem apagado
+            directory, filename = os.path.split(spill_path)
+            root, ext = os.path.splitext(filename)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd, self.spill_path = tempfile.mkstemp(prefix=f"{root}.{os.getpid()}.", suffix=ext, dir=directory or None)
+            os.close(fd)
+            self._conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (task_id TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+            atexit.register(self.close)
+
+        self.spilled = 0
+        self.loaded = 0
+        self.expired = 0
+        self.dropped = 0
+
+    def put(self, task_id: str, package: ContentPackage) -> List[str]:
+        """Guarda o resultado; retorna os task_ids descartados por falta de espaço (sem spill_path)"""
+        data = package.model_dump_json()
+        with self._lock:
+            self._remove(task_id)
+            self._entries[task_id] = (package, len(data))
+            self._bytes += len(data)
+            self._saved[task_id] = time.time()
+            return self._spill()
+
+    def get(self, task_id: str) -> Optional[ContentPackage]:
+        with self._lock:
+            # expirado mas ainda não purgado: já conta como ausente
+            saved_at = self._saved.get(task_id)
+            if saved_at is None or (self.ttl and saved_at <= time.time() - self.ttl):
+                return None
+            entry = self._entries.get(task_id)
+            if entry is not None:
+                self._entries.move_to_end(task_id)
+                return entry[0]
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT value FROM results WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        self.loaded += 1
+        # não volta para a memória: uma consulta eventual não deve despejar resultados recentes
+        return ContentPackage.model_validate_json(zlib.decompress(row[0]))
+
+    def pop(self, task_id: str):
+        with self._lock:
+            self._remove(task_id)
+            self._saved.pop(task_id, None)
+
+    def expire(self) -> List[str]:
+        """Descarta os resultados mais velhos que ttl; retorna os task_ids removidos"""
+        if not self.ttl:
+            return []
+        cutoff = time.time() - self.ttl
+        expired = []
+        with self._lock:
+            while self._saved:
+                task_id, saved_at = next(iter(self._saved.items()))
+                if saved_at > cutoff:
+                    break
+                self._remove(task_id)
+                self._saved.popitem(last=False)
+                expired.append(task_id)
+        self.expired += len(expired)
+        return expired
+
+    def close(self):
+        """Fecha e apaga o arquivo de spill do processo"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.close()
+            self._conn = None
+            for suffix in ("", "-journal"):
+                try:
+                    os.remove(self.spill_path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def _remove(self, task_id: str):
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        elif self._conn is not None and task_id in self._saved:
+            self._conn.execute("DELETE FROM results WHERE task_id = ?", (task_id,))
+            self._conn.commit()
+
+    def _spill(self) -> List[str]:
+        """Move os menos usados para o disco até a memória caber em max_bytes (sem disco, descarta)"""
+        spilled = []
+        dropped = []
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            task_id, (package, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            if self._conn is None:
+                self._saved.pop(task_id, None)
+                dropped.append(task_id)
+                continue
+            value = zlib.compress(package.model_dump_json().encode("utf-8"))
+            spilled.append((task_id, value, len(value)))
+        if spilled:
+            self._conn.executemany("INSERT OR REPLACE INTO results (task_id, value, size) VALUES (?, ?, ?)", spilled)
+            self._conn.commit()
+            self.spilled += len(spilled)
+        self.dropped += len(dropped)
+        return dropped
+
+    def stats(self) -> Dict:
+        with self._lock:
+            disk_entries, disk_bytes = (
+                self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+                if self._conn is not None else (0, 0)
+            )
+            return {
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_memory_bytes": self.max_bytes,
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+                "spill_path": self.spill_path,
+                "ttl": self.ttl,
+                "spilled": self.spilled,
+                "loaded": self.loaded,
+                "expired": self.expired,
+                "dropped": self.dropped
+            }
+
+class InMemoryTaskStore(TaskStore):
+    """
+    Store em memória do processo (padrão; não sobrevive a restart nem é compartilhado).
+    Resultados ficam no ResultStore; ao expirarem, a task sai do store por inteiro.
+    Tasks indexadas por categoria de status e por ordem de criação: contagens e
+    páginas não varrem todas as tasks.
+    """
+
+    backend = "memory"
+
+    def __init__(self, results: Optional[ResultStore] = None):
+        self._status: Dict[str, str] = {}
+        self._results = results or ResultStore(
+            max_bytes=storage_config.result_memory_bytes,
+            ttl=storage_config.result_ttl,
+            spill_path=storage_config.result_spill_path or None
+        )
+        self._info: Dict[str, Dict] = {}
+        self._queue: "OrderedDict[str, ContentBrief]" = OrderedDict()
+        self._events: Dict[str, List[Dict]] = {}
+        self._cond = threading.Condition()
+        self._next_purge = 0.0
+
+        # número de criação e epoch de cada task; ids em ordem de criação (tasks removidas
+        # ficam como buraco até a próxima compactação); (seq, task_id) por categoria de status,
+        # também em ordem de criação
+        self._seq: Dict[str, int] = {}
+        self._created: Dict[str, float] = {}
+        self._order_seqs: List[int] = []
+        self._order_ids: List[str] = []
+        self._removed = 0
+        self._next_seq = 0
+        self._by_status: Dict[str, List[Tuple[int, str]]] = {}
+        # epoch das conclusões dentro de THROUGHPUT_WINDOW
+        self._finished: deque = deque()
+
+    def _track(self, task_id: str, status: str):
+        """Registra a transição de status nos índices (chamado com self._cond)"""
+        previous = self._status.get(task_id)
+        self._status[task_id] = status
+        if task_id not in self._seq:
+            self._seq[task_id] = self._next_seq
+            self._created[task_id] = time.time()
+            self._order_seqs.append(self._next_seq)
+            self._order_ids.append(task_id)
+            self._next_seq += 1
+
+        if is_terminal_status(status) and not is_terminal_status(previous):
+            now = time.time()
+            self._finished.append(now)
+            while self._finished[0] < now - self.THROUGHPUT_WINDOW:
+                self._finished.popleft()
+
+        category = status_category(status)
+        if previous is not None:
+            previous_category = status_category(previous)
+            if previous_category == category:
+                return
+            self._unindex(task_id, previous_category)
+        insort(self._by_status.setdefault(category, []), (self._seq[task_id], task_id))
+
+    def _unindex(self, task_id: str, category: str):
+        bucket = self._by_status.get(category)
+        if bucket is None:
+            return
+        entry = (self._seq[task_id], task_id)
+        index = bisect_left(bucket, entry)
+        if index < len(bucket) and bucket[index] == entry:
+            del bucket[index]
+        if not bucket:
+            del self._by_status[category]
+
+    def _untrack(self, task_id: str) -> bool:
+        """Remove a task dos índices (chamado com self._cond)"""
+        status = self._status.pop(task_id, None)
+        if status is None:
+            return False
+        self._unindex(task_id, status_category(status))
+        self._seq.pop(task_id, None)
+        self._created.pop(task_id, None)
+        self._removed += 1
+        if self._removed > len(self._order_ids) // 2:
+            alive = [
+                (seq, task_id) for seq, task_id in zip(self._order_seqs, self._order_ids)
+                if self._seq.get(task_id) == seq
+            ]
+            self._order_seqs = [seq for seq, _ in alive]
+            self._order_ids = [task_id for _, task_id in alive]
+            self._removed = 0
+        return True
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.PURGE_INTERVAL
+        expired = self._results.expire()
+        for task_id in expired:
+            self.delete(task_id)
+        if expired:
+            logger.info(f"🧹 {len(expired)} tasks expiradas removidas do store")
+
+    def set_status(self, task_id: str, status: str) -> None:
+        with self._cond:
+            self._track(task_id, status)
+        self.publish_event(task_id, status_event(status))
+
+    def get_status(self, task_id: str) -> Optional[str]:
+        return self._status.get(task_id)
+
+    def save_result(self, task_id: str, package: ContentPackage) -> None:
+        self._purge_expired()
+        dropped = self._results.put(task_id, package)
+        self.set_status(task_id, package.status)
+        # resultado descartado (memória cheia, sem spill): a task sai como se tivesse expirado
+        for dropped_id in dropped:
+            self.delete(dropped_id)
+        if dropped:
+            logger.warning(f"🧹 {len(dropped)} tasks removidas: resultados descartados por falta de memória")
+
+    def get_result(self, task_id: str) -> Optional[ContentPackage]:
+        return self._results.get(task_id)
+
+    def get_info(self, task_id: str) -> Optional[Dict]:
+        return self._info.get(task_id)
+
+    def list_tasks(self) -> List[Dict]:
+        self._purge_expired()
+        return [
+            {"task_id": task_id, "status": status, **self._info.get(task_id, {})}
+            for task_id, status in list(self._status.items())
+        ]
+
+    def query_tasks(self, status: Optional[str] = None, topic: Optional[str] = None,
+                    created_after: Optional[float] = None, created_before: Optional[float] = None,
+                    cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+        self._purge_expired()
+        # cursor = número de criação da última task da página anterior
+        before = int(cursor) if cursor else None
+        topic = topic.lower() if topic else None
+
+        with self._cond:
+            if before is None:
+                before = self._next_seq
+            if status is not None:
+                # só a categoria pedida, andando do cursor para trás
+                bucket = self._by_status.get(status, [])
+                end = bisect_left(bucket, (before,))
+                candidates = (bucket[i] for i in range(end - 1, -1, -1))
+            else:
+                end = bisect_left(self._order_seqs, before)
+                candidates = ((self._order_seqs[i], self._order_ids[i]) for i in range(end - 1, -1, -1))
+
+            page = []
+            for seq, task_id in candidates:
+                if self._seq.get(task_id) != seq:
+                    continue
+                created = self._created[task_id]
+                # ordem de criação: daqui para trás todas são mais antigas
+                if created_after is not None and created < created_after:
+                    break
+                if created_before is not None and created >= created_before:
+                    continue
+                info = self._info.get(task_id, {})
+                if topic and topic not in info.get("brief_topic", "").lower():
+                    continue
+                page.append({"task_id": task_id, "status": self._status[task_id], **info})
+                if len(page) == limit:
+                    return page, str(seq)
+        return page, None
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._cond:
+            return {category: len(bucket) for category, bucket in self._by_status.items()}
+
+    def finished_since(self, timestamp: float) -> int:
+        with self._cond:
+            return len(self._finished) - bisect_left(self._finished, timestamp)
+
+    def delete(self, task_id: str) -> bool:
+        with self._cond:
+            self._queue.pop(task_id, None)
+            removed = self._untrack(task_id)
+        self._results.pop(task_id)
+        self._info.pop(task_id, None)
+        self._events.pop(task_id, None)
+        return removed
+
+    def enqueue(self, task_id: str, brief: ContentBrief) -> int:
+        with self._cond:
+            self._track(task_id, "queued")
+            self._info[task_id] = {
+                "created_at": datetime.now().isoformat(),
+                "brief_topic": brief.topic
+            }
+            self._queue[task_id] = brief
+            self._cond.notify()
+            position = len(self._queue)
+        self.publish_event(task_id, status_event("queued"))
+        return position
+
+    def dequeue(self, timeout: float = 1.0) -> Optional[Tuple[str, ContentBrief]]:
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout)
+            if not self._queue:
+                return None
+            return self._queue.popitem(last=False)
+
+    def ack(self, task_id: str) -> None:
+        # jobs em memória morrem junto com o processo, não há lease
+        pass
+
+    def heartbeat(self, task_ids: List[str]) -> None:
+        pass
+
+    def requeue_expired(self) -> int:
+        return 0
+
+    def queue_position(self, task_id: str) -> Optional[int]:
+        with self._cond:
+            for index, queued_id in enumerate(self._queue):
+                if queued_id == task_id:
+                    return index + 1
+        return None
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def publish_event(self, task_id: str, event: Dict) -> Dict:
+        with self._cond:
+            history = self._events.setdefault(task_id, [])
+            event = {"seq": len(history) + 1, **event}
+            history.append(event)
+        get_event_bus().publish(task_id, event)
+        return event
+
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Dict]:
+        return self._events.get(task_id, [])[after_seq:]
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend, "tasks": len(self._status), "results": self._results.stats()}
+
+# transição de status atômica: grava o status, ajusta as contagens por categoria,
+# registra a criação (ordem das tasks) e a conclusão (throughput)
+# KEYS: status, counts, tasks, finished; ARGV: task_id, status, agora, janela de conclusões,
+# prefixo dos sorted sets de criação por categoria
+_TRANSITION_SCRIPT = """
+local function category(status)
+    if string.sub(status, 1, 9) == "completed" then return "completed" end
+    if string.sub(status, 1, 5) == "error" then return "error" end
+    return status
+end
+local function terminal(status)
+    local value = category(status)
+    return value == "completed" or value == "error"
+end
+local previous = redis.call("HGET", KEYS[1], ARGV[1])
+redis.call("HSET", KEYS[1], ARGV[1], ARGV[2])
+if not previous then
+    redis.call("ZADD", KEYS[3], "NX", ARGV[3], ARGV[1])
+end
+if terminal(ARGV[2]) and not (previous and terminal(previous)) then
+    redis.call("ZADD", KEYS[4], ARGV[3], ARGV[1])
+    redis.call("ZREMRANGEBYSCORE", KEYS[4], "-inf", tonumber(ARGV[3]) - tonumber(ARGV[4]))
+end
+local new = category(ARGV[2])
+if previous then
+    local old = category(previous)
+    if old == new then return 0 end
+    redis.call("HINCRBY", KEYS[2], old, -1)
+    redis.call("ZREM", ARGV[5] .. old, ARGV[1])
+end
+redis.call("HINCRBY", KEYS[2], new, 1)
+redis.call("ZADD", ARGV[5] .. new, redis.call("ZSCORE", KEYS[3], ARGV[1]) or ARGV[3], ARGV[1])
+return 1
+"""
+
+# remoção atômica do status e dos índices
+# KEYS: status, counts, tasks; ARGV: task_id, prefixo dos sorted sets por categoria
+_REMOVE_SCRIPT = """
+local previous = redis.call("HGET", KEYS[1], ARGV[1])
+if not previous then return 0 end
+local old = previous
+if string.sub(previous, 1, 9) == "completed" then old = "completed"
+elseif string.sub(previous, 1, 5) == "error" then old = "error" end
+redis.call("HDEL", KEYS[1], ARGV[1])
+redis.call("HINCRBY", KEYS[2], old, -1)
+redis.call("ZREM", KEYS[3], ARGV[1])
+redis.call("ZREM", ARGV[2] .. old, ARGV[1])
+return 1
+"""
+
+# publicação atômica de um evento: o seq é incrementado e o evento entra na lista e no
+# canal na mesma operação, então publicadores concorrentes não invertem a ordem
+# KEYS: events, events_seq; ARGV: evento em JSON (sem seq), TTL, canal
+_PUBLISH_EVENT_SCRIPT = """
+local seq = redis.call("INCR", KEYS[2])
+local payload = '{"seq": ' .. seq .. ', ' .. string.sub(ARGV[1], 2)
+redis.call("RPUSH", KEYS[1], payload)
+if tonumber(ARGV[2]) > 0 then
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+    redis.call("EXPIRE", KEYS[2], ARGV[2])
+end
+redis.call("PUBLISH", ARGV[3], payload)
+return payload
+"""
+
+class RedisTaskStore(TaskStore):
+    """
+    Store no Redis, compartilhado entre réplicas da API e processos worker.
+    Jobs retirados da fila ficam numa lista 'processing' com lease renovado
+    pelo worker; se o worker morre, o job volta para a fila.
+    Transições de status passam por um script Lua que mantém as contagens por
+    categoria e os sorted sets de criação e conclusão.
+    """
+
+    backend = "redis"
+
+    # máximo de tasks examinadas por página filtrada (o cursor retoma de onde parou)
+    QUERY_SCAN_LIMIT = 2000
+    # versão dos índices derivados; subir força a remontagem em stores já existentes
+    INDEX_VERSION = 2
+
+    def __init__(self, url: str = None, prefix: str = None, lease_seconds: int = None, client: "redis.Redis" = None):
+        # client pode ser injetado (ex.: servidor local de teste)
+        # import do cliente Redis só quando esse backend é usado (não pesa na startup do backend em memória)
+        import redis
+        self.client = client or redis.Redis.from_url(url or storage_config.redis_url, decode_responses=True)
+        self.prefix = prefix or storage_config.key_prefix
+        self.lease_seconds = lease_seconds or storage_config.lease_seconds
+
+        self._status_key = f"{self.prefix}:status"
+        self._info_key = f"{self.prefix}:info"
+        self._queue_key = f"{self.prefix}:queue"
+        self._processing_key = f"{self.prefix}:processing"
+        self._counts_key = f"{self.prefix}:counts"
+        self._tasks_key = f"{self.prefix}:tasks"
+        # + categoria: sorted set de criação só das tasks naquela categoria
+        self._tasks_by_status_prefix = f"{self.prefix}:tasks:"
+        self._finished_key = f"{self.prefix}:finished"
+        # task_id -> epoch em que o resultado expira (a task inteira sai na varredura)
+        self._expires_key = f"{self.prefix}:expires"
+        self._next_purge = 0.0
+        self._transition = self.client.register_script(_TRANSITION_SCRIPT)
+        self._remove = self.client.register_script(_REMOVE_SCRIPT)
+        self._publish_event = self.client.register_script(_PUBLISH_EVENT_SCRIPT)
+        self._build_index()
+        
+        # jobs vistos sem lease na varredura anterior; só são devolvidos na segunda,
+        # o que cobre a janela entre o BLMOVE e a criação do lease no dequeue
+        self._suspects = set()
+
+    def _result_key(self, task_id: str) -> str:
+        return f"{self.prefix}:result:{task_id}"
+
+    def _brief_key(self, task_id: str) -> str:
+        return f"{self.prefix}:brief:{task_id}"
+
+    def _lease_key(self, task_id: str) -> str:
+        return f"{self.prefix}:lease:{task_id}"
+
+    def _events_key(self, task_id: str) -> str:
+        return f"{self.prefix}:events:{task_id}"
+
+    def _events_seq_key(self, task_id: str) -> str:
+        return f"{self.prefix}:events_seq:{task_id}"
+
+    def _events_channel(self, task_id: str) -> str:
+        return f"{self.prefix}:channel:{task_id}"
+
+    def _build_index(self):
+        """
+        Monta contagens, ordem de criação e ordem por categoria para tasks gravadas antes
+        dos índices (uma vez por prefixo e INDEX_VERSION)
+        """
+        version_key = f"{self.prefix}:index_version"
+        if int(self.client.get(version_key) or 0) >= self.INDEX_VERSION:
+            return
+        # só um processo monta; os outros seguem com o que as transições já mantêm
+        if not self.client.set(f"{version_key}:{self.INDEX_VERSION}:building", 1, nx=True, ex=300):
+            return
+        statuses = self.client.hgetall(self._status_key)
+        if statuses:
+            infos = self.client.hgetall(self._info_key)
+            known = dict(self.client.zrange(self._tasks_key, 0, -1, withscores=True))
+            counts: Dict[str, int] = {}
+            created = {}
+            by_status: Dict[str, Dict[str, float]] = {}
+            for task_id, status in statuses.items():
+                category = status_category(status)
+                counts[category] = counts.get(category, 0) + 1
+                if task_id in known:
+                    created[task_id] = known[task_id]
+                else:
+                    try:
+                        info = json.loads(infos.get(task_id, "{}"))
+                        created[task_id] = datetime.fromisoformat(info["created_at"]).timestamp()
+                    except (KeyError, ValueError):
+                        created[task_id] = time.time()
+                by_status.setdefault(category, {})[task_id] = created[task_id]
+            pipe = self.client.pipeline()
+            pipe.delete(self._counts_key)
+            pipe.hset(self._counts_key, mapping=counts)
+            pipe.zadd(self._tasks_key, created, nx=True)
+            for category, members in by_status.items():
+                pipe.delete(self._tasks_by_status_prefix + category)
+                pipe.zadd(self._tasks_by_status_prefix + category, members)
+            pipe.execute()
+            logger.info(f"🗂️ Índice de tasks montado ({len(statuses)} tasks)")
+        pipe = self.client.pipeline()
+        pipe.set(version_key, self.INDEX_VERSION)
+        pipe.delete(f"{version_key}:{self.INDEX_VERSION}:building")
+        pipe.execute()
+
+    def _set_status(self, task_id: str, status: str, client=None):
+        self._transition(
+            keys=[self._status_key, self._counts_key, self._tasks_key, self._finished_key],
+            args=[task_id, status, time.time(), self.THROUGHPUT_WINDOW, self._tasks_by_status_prefix],
+            client=client
+        )
+
+    def set_status(self, task_id: str, status: str) -> None:
+        self._set_status(task_id, status)
+        self.publish_event(task_id, status_event(status))
+
+    def get_status(self, task_id: str) -> Optional[str]:
+        return self.client.hget(self._status_key, task_id)
+
+    def _purge_expired(self):
+        """Remove status, info e índices das tasks cujo resultado expirou (como no store em memória)"""
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.PURGE_INTERVAL
+        expired = self.client.zrangebyscore(self._expires_key, "-inf", time.time())
+        # delete é idempotente: outro processo pode estar varrendo ao mesmo tempo
+        for task_id in expired:
+            self.delete(task_id)
+        if expired:
+            logger.info(f"🧹 {len(expired)} tasks expiradas removidas do store")
+
+    def save_result(self, task_id: str, package: ContentPackage) -> None:
+        self._purge_expired()
+        pipe = self.client.pipeline()
+        pipe.set(self._result_key(task_id), package.model_dump_json(), ex=storage_config.result_ttl or None)
+        if storage_config.result_ttl:
+            pipe.zadd(self._expires_key, {task_id: time.time() + storage_config.result_ttl})
+        self._set_status(task_id, package.status, client=pipe)
+        pipe.execute()
+        self.publish_event(task_id, status_event(package.status))
+
+    def get_result(self, task_id: str) -> Optional[ContentPackage]:
+        raw = self.client.get(self._result_key(task_id))
+        return ContentPackage.model_validate_json(raw) if raw else None
+
+    def get_info(self, task_id: str) -> Optional[Dict]:
+        raw = self.client.hget(self._info_key, task_id)
+        return json.loads(raw) if raw else None
+
+    def list_tasks(self) -> List[Dict]:
+        self._purge_expired()
+        statuses = self.client.hgetall(self._status_key)
+        infos = self.client.hgetall(self._info_key)
+        return [
+            {"task_id": task_id, "status": status, **json.loads(infos.get(task_id, "{}"))}
+            for task_id, status in statuses.items()
+        ]
+
+    def query_tasks(self, status: Optional[str] = None, topic: Optional[str] = None,
+                    created_after: Optional[float] = None, created_before: Optional[float] = None,
+                    cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+        self._purge_expired()
+        # cursor = "score:task_id" da última task examinada; empates de score vêm em ordem lexicográfica reversa
+        cursor_score, cursor_id = None, None
+        if cursor:
+            score, cursor_id = cursor.split(":", 1)
+            cursor_score = float(score)
+        if cursor_score is not None:
+            upper = cursor_score
+        elif created_before is not None:
+            upper = f"({created_before}"
+        else:
+            upper = "+inf"
+        lower = created_after if created_after is not None else "-inf"
+        topic = topic.lower() if topic else None
+        # com filtro de status, só o sorted set da categoria (as demais nem são lidas)
+        index_key = self._tasks_by_status_prefix + status if status else self._tasks_key
+        # a faixa de score já para em created_after: lote incompleto = não há mais tasks
+        num = min(limit * 2, 500)
+
+        page: List[Dict] = []
+        offset = 0
+        last = None
+        while offset < self.QUERY_SCAN_LIMIT:
+            batch = self.client.zrevrangebyscore(index_key, upper, lower, start=offset, num=num, withscores=True)
+            if not batch:
+                return page, None
+            offset += len(batch)
+            ids = [task_id for task_id, _ in batch]
+            pipe = self.client.pipeline()
+            pipe.hmget(self._status_key, ids)
+            pipe.hmget(self._info_key, ids)
+            statuses, infos = pipe.execute()
+
+            for (task_id, score), task_status, raw_info in zip(batch, statuses, infos):
+                last = f"{score!r}:{task_id}"
+                if cursor_score is not None and score == cursor_score and task_id >= cursor_id:
+                    continue
+                if created_before is not None and score >= created_before:
+                    continue
+                # removida entre as leituras, ou de outra categoria
+                if task_status is None or (status and status_category(task_status) != status):
+                    continue
+                info = json.loads(raw_info) if raw_info else {}
+                if topic and topic not in info.get("brief_topic", "").lower():
+                    continue
+                page.append({"task_id": task_id, "status": task_status, **info})
+                if len(page) == limit:
+                    return page, last
+            if len(batch) < num:
+                return page, None
+        return page, last
+
+    def status_counts(self) -> Dict[str, int]:
+        return {category: int(count) for category, count in self.client.hgetall(self._counts_key).items() if int(count) > 0}
+
+    def finished_since(self, timestamp: float) -> int:
+        return self.client.zcount(self._finished_key, timestamp, "+inf")
+
+    def delete(self, task_id: str) -> bool:
+        pipe = self.client.pipeline()
+        pipe.lrem(self._queue_key, 0, task_id)
+        pipe.delete(self._result_key(task_id), self._brief_key(task_id))
+        pipe.delete(self._events_key(task_id), self._events_seq_key(task_id))
+        pipe.hdel(self._info_key, task_id)
+        pipe.zrem(self._expires_key, task_id)
+        self._remove(
+            keys=[self._status_key, self._counts_key, self._tasks_key],
+            args=[task_id, self._tasks_by_status_prefix],
+            client=pipe
+        )
+        return bool(pipe.execute()[-1])
+
+    def enqueue(self, task_id: str, brief: ContentBrief) -> int:
+        info = {"created_at": datetime.now().isoformat(), "brief_topic": brief.topic}
+        pipe = self.client.pipeline()
+        pipe.set(self._brief_key(task_id), brief.model_dump_json())
+        self._set_status(task_id, "queued", client=pipe)
+        pipe.hset(self._info_key, task_id, json.dumps(info))
+        pipe.rpush(self._queue_key, task_id)
+        position = pipe.execute()[-1]
+        self.publish_event(task_id, status_event("queued"))
+        return position
+
+    def dequeue(self, timeout: float = 1.0) -> Optional[Tuple[str, ContentBrief]]:
+        # move atômico fila -> processing, para não perder o job se o worker cair
+        task_id = self.client.blmove(self._queue_key, self._processing_key, timeout, "LEFT", "RIGHT")
+        if task_id is None:
+            return None
+
+        self.client.set(self._lease_key(task_id), "1", ex=self.lease_seconds)
+        raw = self.client.get(self._brief_key(task_id))
+        if raw is None:
+            # task removida enquanto estava na fila
+            self.ack(task_id)
+            return None
+        return task_id, ContentBrief.model_validate_json(raw)
+
+    def ack(self, task_id: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.lrem(self._processing_key, 0, task_id)
+        pipe.delete(self._lease_key(task_id), self._brief_key(task_id))
+        pipe.execute()
+
+    def heartbeat(self, task_ids: List[str]) -> None:
+        if not task_ids:
+            return
+        pipe = self.client.pipeline()
+        for task_id in task_ids:
+            pipe.set(self._lease_key(task_id), "1", ex=self.lease_seconds)
+        pipe.execute()
+
+    def requeue_expired(self) -> int:
+        requeued = 0
+        suspects = set()
+        for task_id in self.client.lrange(self._processing_key, 0, -1):
+            if self.client.exists(self._lease_key(task_id)):
+                continue
+            if task_id not in self._suspects:
+                suspects.add(task_id)
+                continue
+            # só devolve se ainda estiver em processing (outro worker pode ter feito antes)
+            if self.client.lrem(self._processing_key, 1, task_id):
+                pipe = self.client.pipeline()
+                pipe.lpush(self._queue_key, task_id)
+                self._set_status(task_id, "queued", client=pipe)
+                pipe.execute()
+                self.publish_event(task_id, status_event("queued"))
+                requeued += 1
+                logger.warning(f"♻️ Job {task_id} sem lease devolvido à fila")
+        self._suspects = suspects
+        return requeued
+
+    def queue_position(self, task_id: str) -> Optional[int]:
+        index = self.client.lpos(self._queue_key, task_id)
+        return index + 1 if index is not None else None
+
+    def queue_depth(self) -> int:
+        return self.client.llen(self._queue_key)
+
+    def publish_event(self, task_id: str, event: Dict) -> Dict:
+        payload = self._publish_event(
+            keys=[self._events_key(task_id), self._events_seq_key(task_id)],
+            args=[json.dumps(event), storage_config.events_ttl, self._events_channel(task_id)]
+        )
+        return json.loads(payload)
+
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Dict]:
+        # filtra pelo seq de cada evento, não pela posição na lista
+        events = (json.loads(raw) for raw in self.client.lrange(self._events_key(task_id), 0, -1))
+        return [event for event in events if event["seq"] > after_seq]
+
+    def start_event_relay(self) -> None:
+        # eventos publicados por workers em outros processos chegam via pub/sub do Redis
+        if getattr(self, "_relay_thread", None) is not None:
+            return
+        channel_prefix = f"{self.prefix}:channel:"
+        bus = get_event_bus()
+
+        def handle(message):
+            task_id = message["channel"][len(channel_prefix):]
+            bus.publish(task_id, json.loads(message["data"]))
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(**{f"{channel_prefix}*": handle})
+        self._relay_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        logger.info("📡 Relay de eventos do Redis iniciado")
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend, "ttl": storage_config.result_ttl, "expiring": self.client.zcard(self._expires_key)}
+
+    def health(self) -> Dict:
+        try:
+            start = time.perf_counter()
+            self.client.ping()
+            return {
+                "backend": self.backend,
+                "status": "healthy",
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+            }
+        except Exception as e:
+            # erro do Redis (conexão recusada, timeout)
+            return {"backend": self.backend, "status": "error", "message": str(e)}
+
+_task_store: Optional[TaskStore] = None
+
+def create_task_store(backend: str = None) -> TaskStore:
+    """Cria o store configurado em TASK_STORE_BACKEND (memory | redis)"""
+    backend = (backend or storage_config.backend).lower()
+    if backend == "memory":
+        return InMemoryTaskStore()
+    if backend == "redis":
+        return RedisTaskStore()
+    raise ValueError(f"Backend de task store desconhecido: {backend}")
+
+def get_task_store() -> TaskStore:
+    """Retorna instância do task store (criada no primeiro uso)"""
+    global _task_store
+    if _task_store is None:
+        _task_store = create_task_store()
+        logger.info(f"🗄️ Task store: {_task_store.backend}")
+    return _task_store
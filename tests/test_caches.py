@@ -0,0 +1,119 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache, VectorFile, make_embedding_key
+from llm_cache import CompletionCache, DiskCacheTier, llm_cache_bypass
+
+def test_completion_cache_evicts_least_recently_used():
+    cache = CompletionCache(max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    assert cache.stats()["evictions"] == 1
+
+def test_completion_cache_respects_byte_budget():
+    cache = CompletionCache(max_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 6
+
+def test_completion_cache_ttl_and_bypass(monkeypatch):
+    cache = CompletionCache(ttl=60)
+    cache.set("a", "A")
+    with llm_cache_bypass():
+        assert cache.get("a") is None
+    assert cache.get("a") == "A"
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("a") is None
+    assert cache.stats()["bypassed"] == 1
+
+def test_completion_cache_promotes_disk_hits(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    CompletionCache(disk_path=path).set("a", "A")
+
+    # nova instância (outro processo ou restart): só o disco tem a entrada
+    cache = CompletionCache(disk_path=path)
+    assert cache.get("a") == "A"
+    assert cache.get("a") == "A"
+    assert (cache.disk_hits, cache.hits) == (1, 1)
+
+def test_disk_tier_evicts_oldest_access_over_budget(tmp_path, monkeypatch):
+    clock = iter(range(1, 1000))
+    monkeypatch.setattr(time, "time", lambda: float(next(clock)))
+    disk = DiskCacheTier(str(tmp_path / "llm.sqlite3"), max_bytes=10**6)
+    for index in range(5):
+        disk.set(f"k{index}", os.urandom(400).hex())
+    # cabe o que já existe, mas não mais uma entrada
+    disk.max_bytes = disk.stats()["bytes"] + 100
+    disk.get("k0", ttl=0)
+
+    evicted = disk.set("k5", os.urandom(400).hex())
+
+    assert evicted == 1
+    assert disk.stats()["bytes"] <= disk.max_bytes
+    assert disk.get("k0", ttl=0) is not None
+    assert disk.get("k1", ttl=0) is None
+
+def test_disk_tier_running_total_matches_table(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    disk = DiskCacheTier(path, max_bytes=10**6)
+    disk.set("a", "x" * 500)
+    disk.set("b", "y" * 500)
+    # substituição troca o tamanho, não soma
+    disk.set("a", os.urandom(300).hex())
+    assert disk._bytes == disk.stats()["bytes"]
+
+    # reaberto: total inicializado a partir do arquivo
+    assert DiskCacheTier(path, max_bytes=10**6)._bytes == disk.stats()["bytes"]
+    disk.clear()
+    assert disk._bytes == disk.stats()["bytes"] == 0
+
+def test_embedding_cache_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.set("nomic", "a", [1.0, 0.0])
+    cache.set("nomic", "b", [0.0, 1.0])
+    assert cache.get("nomic", "a") == [1.0, 0.0]
+
+    cache.set("nomic", "c", [1.0, 1.0])
+
+    assert cache.get("nomic", "b") is None
+    assert cache.get("nomic", "a") == [1.0, 0.0]
+    # chave inclui o modelo
+    assert cache.get("outro", "a") is None
+    assert cache.stats()["evictions"] == 1
+
+def test_embedding_disk_compaction_keeps_newest(tmp_path):
+    path = str(tmp_path / "embeddings.bin")
+    dimension = 64
+    vectors = VectorFile(path, max_bytes=4096)
+    keys = [make_embedding_key("nomic", f"texto {index}") for index in range(20)]
+    for index, key in enumerate(keys):
+        vectors.set(key, np.full(dimension, index, dtype=np.float32))
+
+    assert vectors.compactions >= 1
+    assert vectors.size <= vectors.max_bytes
+    assert vectors.get(keys[0]) is None
+    assert vectors.get(keys[-1]).tolist() == [19.0] * dimension
+
+    # reaberto: índice reconstruído a partir do arquivo compactado
+    reopened = VectorFile(path, max_bytes=4096)
+    assert reopened.stats()["entries"] == vectors.stats()["entries"]
+    assert reopened.get(keys[-1]).tolist() == [19.0] * dimension
+
+@pytest.mark.parametrize("text", ["Olá  Mundo", " Olá\nMundo ", "Ola\u0301 Mundo"])
+def test_embedding_key_normalizes_whitespace_and_unicode(text):
+    assert make_embedding_key("nomic", text) == make_embedding_key("nomic", "Olá Mundo")
+    # maiúsculas importam para o modelo
+    assert make_embedding_key("nomic", text) != make_embedding_key("nomic", "olá mundo")
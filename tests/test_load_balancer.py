@@ -0,0 +1,194 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from load_balancer import OllamaLoadBalancer
+from ollama_client import OllamaClient, OllamaError
+
+class FakeOllama:
+    """Servidor HTTP local que imita o Ollama (tags, embeddings e generate em streaming)"""
+
+    def __init__(self, models=("mistral:latest",), delay: float = 0.0):
+        self.models = list(models)
+        self.delay = delay
+        # status devolvido por todas as rotas (500 = backend com problema)
+        self.status = 200
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str = "application/json"):
+                self.send_response(server.status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server.status != 200:
+                    self._send(json.dumps({"error": "indisponível"}).encode())
+                elif self.path == "/api/tags":
+                    self._send(json.dumps({"models": [{"name": name} for name in server.models]}).encode())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.delay)
+                if server.status != 200:
+                    self._send(json.dumps({"error": "indisponível"}).encode())
+                elif self.path == "/api/embeddings":
+                    self._send(json.dumps({"embedding": [1.0, 0.0]}).encode())
+                elif self.path == "/api/generate":
+                    parts = [{"response": "ol", "done": False}, {"response": "á", "done": True}]
+                    self._send(b"".join(json.dumps(part).encode() + b"\n" for part in parts), "application/x-ndjson")
+                else:
+                    self.send_error(404)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+@pytest.fixture
+def fake_ollama():
+    servers = []
+
+    def start(**kwargs) -> FakeOllama:
+        server = FakeOllama(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def dead_url():
+    """URL de uma porta sem ninguém escutando (conexão recusada)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+def make_client(balancer: OllamaLoadBalancer) -> OllamaClient:
+    return OllamaClient(balancer.backends[0].url, timeout=5, connect_timeout=1, balancer=balancer)
+
+def test_least_outstanding_prefers_idle_backend(fake_ollama):
+    first, second = fake_ollama(), fake_ollama()
+    balancer = OllamaLoadBalancer([first.url, second.url], health_interval=0)
+
+    with balancer.lease("mistral") as busy:
+        assert busy.url == first.url
+        assert balancer.choose("mistral").url == second.url
+    assert balancer.backends[0].outstanding == 0
+
+def test_concurrent_calls_spread_across_backends(fake_ollama):
+    first, second = fake_ollama(delay=0.2), fake_ollama(delay=0.2)
+    balancer = OllamaLoadBalancer([first.url, second.url], health_interval=0)
+    client = make_client(balancer)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: client.embed("mistral", "texto"), range(4)))
+
+    assert (first.requests, second.requests) == (2, 2)
+
+def test_latency_strategy_routes_to_fastest_backend(fake_ollama):
+    slow, fast = fake_ollama(delay=0.15), fake_ollama()
+    balancer = OllamaLoadBalancer([slow.url, fast.url], strategy="latency", health_interval=0)
+    client = make_client(balancer)
+
+    for _ in range(8):
+        client.embed("mistral", "texto")
+
+    # cada backend é medido uma vez; depois tudo vai para o mais rápido
+    assert slow.requests == 1
+    assert fast.requests == 7
+
+def test_model_aware_selection(fake_ollama):
+    chat = fake_ollama(models=["mistral:latest"])
+    embeddings = fake_ollama(models=["nomic-embed-text:latest"])
+    balancer = OllamaLoadBalancer([chat.url, embeddings.url], health_interval=0)
+    asyncio.run(balancer.check_all())
+    client = make_client(balancer)
+
+    for _ in range(3):
+        client.embed("nomic-embed-text", "texto")
+        assert [part["response"] for part in client.generate_stream({"model": "mistral", "prompt": "oi"})] == ["ol", "á"]
+
+    assert embeddings.requests == 3
+    assert chat.requests == 3
+    # modelo que nenhum backend tem: qualquer backend saudável
+    assert balancer.choose("llama3").url in (chat.url, embeddings.url)
+
+def test_backend_ejected_after_failures_and_restored_by_health_check(fake_ollama):
+    failing, healthy = fake_ollama(), fake_ollama()
+    failing.status = 500
+    balancer = OllamaLoadBalancer([failing.url, healthy.url], health_interval=0, failure_threshold=2)
+    client = make_client(balancer)
+
+    for _ in range(2):
+        with pytest.raises(OllamaError):
+            client.embed("mistral", "texto")
+    assert balancer.backends[0].healthy is False
+    assert balancer.healthy_count() == 1
+
+    client.embed("mistral", "texto")
+    assert (failing.requests, healthy.requests) == (2, 1)
+
+    # health check com erro mantém fora; quando passa, o backend volta ao pool
+    asyncio.run(balancer.check_all())
+    assert balancer.backends[0].healthy is False
+    failing.status = 200
+    asyncio.run(balancer.check_all())
+    assert balancer.backends[0].healthy is True
+    assert balancer.choose("mistral").url == failing.url
+
+def test_health_check_ejects_unreachable_backend(fake_ollama, dead_url):
+    live = fake_ollama()
+    balancer = OllamaLoadBalancer([dead_url, live.url], health_interval=0)
+
+    asyncio.run(balancer.check_all())
+
+    assert [backend.healthy for backend in balancer.backends] == [False, True]
+    assert balancer.choose("mistral").url == live.url
+
+def test_failover_on_transport_error(fake_ollama, dead_url):
+    live = fake_ollama()
+    balancer = OllamaLoadBalancer([dead_url, live.url], health_interval=0)
+    client = make_client(balancer)
+
+    assert client.embed("mistral", "texto") == [1.0, 0.0]
+    assert [part["response"] for part in client.generate_stream({"model": "mistral", "prompt": "oi"})] == ["ol", "á"]
+
+    assert live.requests == 2
+    assert balancer.backends[0].errors == 2
+    assert balancer.backends[1].errors == 0
+
+def test_transport_error_raised_when_all_backends_fail(dead_url):
+    balancer = OllamaLoadBalancer([dead_url], health_interval=0)
+    client = make_client(balancer)
+
+    with pytest.raises(httpx.TransportError):
+        client.embed("mistral", "texto")
+    with pytest.raises(httpx.TransportError):
+        list(client.generate_stream({"model": "mistral", "prompt": "oi"}))
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+
+from memory_maintenance import MemoryMaintenance
+
+DAY = 86400
+
+class FakeCollection:
+    """Subconjunto da coleção do Chroma usado pela manutenção (get por id e delete por where)"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, doc_id, embedding, **metadata):
+        self.rows[doc_id] = (embedding, metadata)
+
+    def get(self, ids=None, include=()):
+        selected = [doc_id for doc_id in (ids if ids is not None else list(self.rows)) if doc_id in self.rows]
+        return {
+            "ids": selected,
+            "metadatas": [self.rows[doc_id][1] for doc_id in selected],
+            "embeddings": [self.rows[doc_id][0] for doc_id in selected]
+        }
+
+    def delete(self, where):
+        for doc_id, (_, metadata) in list(self.rows.items()):
+            if all(metadata.get(key) == value for key, value in where.items()):
+                del self.rows[doc_id]
+
+class FakeStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+class FakeManager:
+    def __init__(self):
+        self.content_store = FakeStore()
+
+    def delete_content_packages(self, task_ids):
+        for task_id in task_ids:
+            self.content_store._collection.delete(where={"task_id": task_id})
+        return len(task_ids)
+
+@pytest.fixture
+def manager():
+    return FakeManager()
+
+def add_package(manager, task_id, age_days, embedding, chunks=2, status="completed", topic="café"):
+    created = time.time() - age_days * DAY
+    for index in range(chunks):
+        manager.content_store._collection.add(
+            f"{task_id}-{index}", embedding,
+            task_id=task_id, created_ts=created, status=status, topic=topic, audience="geral"
+        )
+
+def task_ids(manager):
+    return {metadata["task_id"] for _, metadata in manager.content_store._collection.rows.values()}
+
+def make_maintenance(manager, **kwargs):
+    options = {"retention_days": 90, "error_retention_days": 7, "duplicate_threshold": 0.98, "io_budget": 10**6}
+    options.update(kwargs)
+    return MemoryMaintenance(manager, page_size=3, **options)
+
+def test_expires_old_packages_and_errors_earlier(manager):
+    add_package(manager, "recente", 1, [1.0, 0.0], topic="a")
+    add_package(manager, "antigo", 120, [0.0, 1.0], topic="b")
+    add_package(manager, "erro", 10, [1.0, 1.0], status="error: timeout", topic="c")
+
+    result = make_maintenance(manager).run_once()
+
+    assert result == {"packages": 3, "expired": 2, "duplicates": 0}
+    assert task_ids(manager) == {"recente"}
+
+def test_collapses_near_duplicates_keeping_newest(manager):
+    add_package(manager, "novo", 1, [1.0, 0.0])
+    add_package(manager, "reexecucao", 2, [1.0, 0.001])
+    add_package(manager, "diferente", 3, [0.0, 1.0])
+    # mesmo vetor, mas outro tópico: grupo diferente, não é duplicado
+    add_package(manager, "outro_topico", 4, [1.0, 0.0], topic="chá")
+
+    result = make_maintenance(manager).run_once()
+
+    assert result["duplicates"] == 1
+    assert task_ids(manager) == {"novo", "diferente", "outro_topico"}
+
+def test_scan_reads_every_chunk_once_across_pages(manager):
+    for index in range(5):
+        add_package(manager, f"t{index}", 1, [float(index), 1.0], chunks=3, topic=f"tópico {index}")
+
+    packages = make_maintenance(manager)._scan()
+
+    assert sorted(packages) == [f"t{index}" for index in range(5)]
+    assert all(len(package["ids"]) == 3 for package in packages.values())
+
+def test_scan_unaffected_by_deletes_between_pages(manager):
+    for index in range(4):
+        add_package(manager, f"t{index}", 1, [float(index), 1.0], chunks=3, topic=f"tópico {index}")
+    collection = manager.content_store._collection
+    get = collection.get
+    calls = []
+
+    def get_and_delete(*args, **kwargs):
+        result = get(*args, **kwargs)
+        calls.append(kwargs)
+        # outro processo apaga um pacote já lido depois da primeira página
+        if len(calls) == 2:
+            collection.delete(where={"task_id": "t0"})
+        return result
+
+    collection.get = get_and_delete
+    packages = make_maintenance(manager)._scan()
+
+    assert sorted(packages) == ["t0", "t1", "t2", "t3"]
+    assert all(len(package["ids"]) == 3 for package in packages.values())
+
+def test_disabled_thresholds_keep_everything(manager):
+    add_package(manager, "antigo", 400, [1.0, 0.0])
+    add_package(manager, "copia", 401, [1.0, 0.0])
+
+    result = make_maintenance(manager, retention_days=0, error_retention_days=0, duplicate_threshold=0).run_once()
+
+    assert result == {"packages": 2, "expired": 0, "duplicates": 0}
+    assert task_ids(manager) == {"antigo", "copia"}
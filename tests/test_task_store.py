@@ -0,0 +1,152 @@
+import os
+import time
+
+import pytest
+
+from models import ContentBrief, ContentPackage
+from task_store import InMemoryTaskStore, RedisTaskStore, ResultStore
+
+def make_package(task_id: str, status: str = "completed", topic: str = "café") -> ContentPackage:
+    # tópico longo: cada resultado ocupa algumas centenas de bytes
+    return ContentPackage(brief=ContentBrief(topic=topic * 50), task_id=task_id, created_at="agora", status=status)
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / "spill" / "task_results.sqlite3")
+
+@pytest.fixture
+def memory_store():
+    return InMemoryTaskStore(ResultStore())
+
+@pytest.fixture
+def redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    # scripts Lua do store rodam no fakeredis via lupa
+    pytest.importorskip("lupa")
+    return RedisTaskStore(client=fakeredis.FakeRedis(decode_responses=True), prefix="teste")
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    return request.getfixturevalue(f"{request.param}_store")
+
+def test_result_store_expires_after_ttl(monkeypatch):
+    results = ResultStore(ttl=60)
+    results.put("a", make_package("a"))
+    assert results.get("a").task_id == "a"
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    # expirado e ainda não purgado: já conta como ausente
+    assert results.get("a") is None
+    assert results.expire() == ["a"]
+    assert results.stats()["expired"] == 1
+
+def test_result_store_spills_to_disk_and_reads_back(spill_path):
+    results = ResultStore(max_bytes=1, spill_path=spill_path)
+    for task_id in ("a", "b", "c"):
+        results.put(task_id, make_package(task_id))
+
+    stats = results.stats()
+    assert (stats["memory_entries"], stats["disk_entries"], stats["spilled"]) == (1, 2, 2)
+    assert [results.get(task_id).task_id for task_id in ("a", "b", "c")] == ["a", "b", "c"]
+    assert results.loaded == 2
+
+    results.pop("a")
+    assert results.get("a") is None
+    assert results.stats()["disk_entries"] == 1
+
+def test_result_store_drops_without_spill_path():
+    results = ResultStore(max_bytes=1)
+    assert results.put("a", make_package("a")) == []
+    assert results.put("b", make_package("b")) == ["a"]
+    assert results.get("a") is None
+
+def test_result_store_spill_file_is_per_process_and_removed_on_close(spill_path):
+    first = ResultStore(max_bytes=1, spill_path=spill_path)
+    second = ResultStore(max_bytes=1, spill_path=spill_path)
+    assert first.spill_path != second.spill_path
+    assert os.path.basename(first.spill_path).startswith(f"task_results.{os.getpid()}.")
+
+    for task_id in ("a", "b"):
+        first.put(task_id, make_package(task_id))
+    second.put("c", make_package("c"))
+    second.put("d", make_package("d"))
+
+    # um store não lê nem apaga o spill do outro
+    second.close()
+    assert not os.path.exists(second.spill_path)
+    assert first.get("a").task_id == "a"
+    first.close()
+    assert os.listdir(os.path.dirname(spill_path)) == []
+
+def test_memory_store_expired_result_removes_whole_task(monkeypatch):
+    store = InMemoryTaskStore(ResultStore(ttl=60))
+    store.enqueue("a", ContentBrief(topic="café"))
+    store.save_result("a", make_package("a"))
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    store._next_purge = 0
+    assert store.query_tasks() == ([], None)
+    assert store.get_status("a") is None
+    assert store.status_counts() == {}
+
+def populate(store, count: int = 12):
+    """Cria `count` tasks; a cada 3 uma em processamento, a cada 4 uma concluída"""
+    for index in range(count):
+        store.enqueue(f"t{index:02d}", ContentBrief(topic=f"tópico {index}"))
+        # scores de criação distintos no Redis
+        time.sleep(0.002)
+    for index in range(0, count, 3):
+        store.set_status(f"t{index:02d}", "processing")
+    for index in range(0, count, 4):
+        store.save_result(f"t{index:02d}", make_package(f"t{index:02d}", topic=f"tópico {index}"))
+
+def collect_pages(store, limit: int, **filters):
+    task_ids, pages, cursor = [], 0, None
+    while True:
+        page, cursor = store.query_tasks(cursor=cursor, limit=limit, **filters)
+        task_ids += [task["task_id"] for task in page]
+        pages += 1
+        if cursor is None:
+            return task_ids, pages
+
+def test_query_tasks_pages_newest_first(store):
+    populate(store)
+
+    task_ids, _ = collect_pages(store, limit=5)
+
+    assert task_ids == [f"t{index:02d}" for index in range(11, -1, -1)]
+
+def test_query_tasks_filters_by_status_across_pages(store):
+    populate(store)
+    store.delete("t04")
+
+    completed, _ = collect_pages(store, limit=1, status="completed")
+    processing, _ = collect_pages(store, limit=2, status="processing")
+    queued, _ = collect_pages(store, limit=3, status="queued")
+
+    assert completed == ["t08", "t00"]
+    assert processing == ["t09", "t06", "t03"]
+    assert queued == ["t11", "t10", "t07", "t05", "t02", "t01"]
+    assert store.status_counts() == {"completed": 2, "processing": 3, "queued": 6}
+
+def test_query_tasks_status_change_moves_task_between_filters(store):
+    populate(store, count=4)
+
+    store.set_status("t01", "processing")
+
+    assert collect_pages(store, limit=10, status="processing")[0] == ["t03", "t01"]
+    assert collect_pages(store, limit=10, status="queued")[0] == ["t02"]
+
+def test_query_tasks_topic_and_creation_window(store):
+    populate(store, count=6)
+    cutoff = time.time()
+    time.sleep(0.002)
+    store.enqueue("novo", ContentBrief(topic="Tópico especial"))
+
+    assert collect_pages(store, limit=10, created_after=cutoff)[0] == ["novo"]
+    assert collect_pages(store, limit=10, created_before=cutoff, status="completed")[0] == ["t04", "t00"]
+    assert collect_pages(store, limit=2, topic="ESPECIAL")[0] == ["novo"]
+    # nada criado depois: a varredura para sem devolver cursor
+    assert store.query_tasks(created_after=time.time() + 60) == ([], None)
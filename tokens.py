@@ -0,0 +1,43 @@
+from typing import Callable, List, TypeVar
+
+T = TypeVar("T")
+
+# média para português/inglês nos tokenizers dos modelos do Ollama (llama, mistral)
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa rápida de tokens de um texto (sem carregar tokenizer)"""
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+def chunk_by_token_budget(items: List[T], cost: Callable[[T], int], budget: int, max_items: int = 0) -> List[List[T]]:
+    """
+    Agrupa itens em lotes consecutivos cujo custo somado cabe no orçamento de tokens.
+    Mantém a ordem; um item maior que o orçamento vai sozinho em um lote.
+    max_items limita o tamanho do lote (0 = sem limite).
+    """
+    batches: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+
+    for item in items:
+        item_cost = cost(item)
+        if current and (used + item_cost > budget or (max_items and len(current) >= max_items)):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item_cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em max_tokens, no último espaço antes do limite"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - 1)
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
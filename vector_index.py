@@ -0,0 +1,125 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Subconjunto do filtro where do Chroma: igualdade por chave e $and"""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(metadata, condition) for condition in where["$and"])
+    return all(metadata.get(key) == value for key, value in where.items())
+
+class InMemoryVectorIndex:
+    """
+    Índice vetorial em memória para coleções pequenas e muito consultadas.
+    Os vetores ficam numa matriz NumPy contígua com linhas normalizadas e o top-k é um
+    único produto matriz-vetor. Escritas criam arrays novos (copy-on-write), então as
+    consultas leem sem lock; o custo é aceitável para poucas centenas de documentos.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        # (matriz, ids, documentos, metadados), trocado de uma vez a cada escrita
+        self._state = (np.zeros((0, 0), dtype=np.float32), [], [], [])
+        self._positions: Dict[str, int] = {}
+        self.queries = 0
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def load(self, collection, page_size: int = 1000):
+        """Carrega todos os documentos de uma collection do Chroma"""
+        ids, embeddings, documents, metadatas = [], [], [], []
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            embeddings.extend(page["embeddings"])
+            documents.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            offset += len(page["ids"])
+
+        matrix = self._normalize(np.asarray(embeddings, dtype=np.float32)) if ids else np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._state = (matrix, ids, documents, metadatas)
+            self._positions = {doc_id: position for position, doc_id in enumerate(ids)}
+
+    def upsert(self, ids: List[str], embeddings: Sequence[Sequence[float]], documents: List[str],
+               metadatas: List[Dict[str, Any]]):
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            matrix, doc_ids, docs, metas = self._state
+            matrix = matrix.copy() if doc_ids else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            doc_ids, docs, metas = list(doc_ids), list(docs), list(metas)
+            positions = dict(self._positions)
+
+            new_rows = []
+            for doc_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                position = positions.get(doc_id)
+                if position is None:
+                    positions[doc_id] = len(doc_ids) + len(new_rows)
+                    new_rows.append(vector)
+                    doc_ids.append(doc_id)
+                    docs.append(document)
+                    metas.append(metadata or {})
+                else:
+                    matrix[position] = vector
+                    docs[position] = document
+                    metas[position] = metadata or {}
+            if new_rows:
+                matrix = np.vstack([matrix, np.stack(new_rows)])
+
+            self._state = (matrix, doc_ids, docs, metas)
+            self._positions = positions
+
+    def clear(self):
+        with self._lock:
+            self._state = (np.zeros((0, 0), dtype=np.float32), [], [], [])
+            self._positions = {}
+
+    def query(self, query_embedding: Sequence[float], k: int, where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Top-k por similaridade de cosseno; distance = 1 - cosseno"""
+        # estado lido uma vez: uma escrita concorrente troca os arrays, não os altera
+        matrix, doc_ids, documents, metadatas = self._state
+        self.queries += 1
+        if not doc_ids or k <= 0:
+            return []
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = matrix @ query
+        if where:
+            mask = np.fromiter((_matches(metadata, where) for metadata in metadatas), dtype=bool, count=len(metadatas))
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+            if k == 0:
+                return []
+
+        k = min(k, len(doc_ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "content": documents[position],
+                "metadata": metadatas[position],
+                "distance": float(1.0 - scores[position]),
+                "embedding": matrix[position]
+            }
+            for position in top
+        ]
+
+    def stats(self) -> dict:
+        matrix, doc_ids, _, _ = self._state
+        return {
+            "documents": len(doc_ids),
+            "dimension": int(matrix.shape[1]) if matrix.size else 0,
+            "bytes": int(matrix.nbytes),
+            "queries": self.queries
+        }
@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from config import ollama_config, logger
+from load_balancer import OllamaLoadBalancer, get_load_balancer, normalize_model_name
+from ollama_client import OllamaClient, get_ollama_client
+
+def configured_models() -> Dict[str, bool]:
+    """Modelos usados pelos agentes e embeddings -> se é modelo só de embedding"""
+    models = {ollama_config.model_name: False}
+    if ollama_config.embedding_model != ollama_config.model_name:
+        models[ollama_config.embedding_model] = True
+    return models
+
+class ModelWarmer:
+    """
+    Mantém os modelos carregados nos backends Ollama.
+    Na startup carrega cada modelo em cada backend saudável (com keep_alive) e depois
+    verifica periodicamente o /api/ps, recarregando o que o Ollama tiver descarregado.
+    A instância fica pronta quando cada modelo está carregado em pelo menos um backend.
+    """
+
+    def __init__(self, client: OllamaClient, balancer: OllamaLoadBalancer, models: Dict[str, bool],
+                 interval: float = 60.0, enabled: bool = True):
+        self.client = client
+        self.balancer = balancer
+        self.models = models
+        self.interval = interval
+        self.enabled = enabled
+
+        # (backend, modelo) -> carregado na última verificação
+        self._warm: Dict[tuple, bool] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_check: Optional[float] = None
+        self.warmups = 0
+        self.errors = 0
+
+    @property
+    def ready(self) -> bool:
+        if not self.enabled:
+            return True
+        with self._lock:
+            return all(
+                any(self._warm.get((backend.url, model)) for backend in self.balancer.backends)
+                for model in self.models
+            )
+
+    def check(self):
+        """Verifica o que está carregado em cada backend e carrega o que faltar"""
+        for backend in self.balancer.backends:
+            if not backend.healthy:
+                with self._lock:
+                    for model in self.models:
+                        self._warm[(backend.url, model)] = False
+                continue
+
+            try:
+                loaded = {normalize_model_name(name) for name in self.client.loaded_models(backend.url)}
+            except Exception:
+                # backend sem /api/ps (versão antiga): tenta carregar mesmo assim
+                loaded = set()
+
+            for model, embedding in self.models.items():
+                if normalize_model_name(model) in loaded:
+                    with self._lock:
+                        self._warm[(backend.url, model)] = True
+                    continue
+                self._load(backend.url, model, embedding)
+
+        self.last_check = time.time()
+
+    def _load(self, url: str, model: str, embedding: bool):
+        start = time.perf_counter()
+        try:
+            self.client.load_model(model, url, embedding=embedding)
+            warm = True
+            self.warmups += 1
+            logger.info(f"🔥 Modelo {model} carregado em {url} ({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            warm = False
+            self.errors += 1
+            logger.warning(f"⚠️ Falha ao carregar {model} em {url}: {e}")
+        with self._lock:
+            self._warm[(url, model)] = warm
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Erro no warm-up dos modelos: {e}")
+            # enquanto não está pronto, tenta de novo mais cedo
+            self._stop.wait(self.interval if self.ready else min(self.interval, 5.0))
+
+    def start(self):
+        """Inicia o warm-up em background (a API sobe logo; /health indica quando está pronta)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            warm = {f"{url}|{model}": loaded for (url, model), loaded in self._warm.items()}
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "keep_alive": self.client.keep_alive,
+            "models": list(self.models),
+            "warm": warm,
+            "warmups": self.warmups,
+            "errors": self.errors,
+            "last_check": self.last_check
+        }
+
+_model_warmer: Optional[ModelWarmer] = None
+_warmer_lock = threading.Lock()
+
+def get_model_warmer() -> ModelWarmer:
+    """Retorna o gerenciador de warm-up dos modelos do processo"""
+    global _model_warmer
+    with _warmer_lock:
+        if _model_warmer is None:
+            _model_warmer = ModelWarmer(
+                get_ollama_client(),
+                get_load_balancer(),
+                configured_models(),
+                interval=ollama_config.warmup_interval,
+                enabled=ollama_config.warmup_enabled
+            )
+    return _model_warmer
@@ -0,0 +1,120 @@
+import os
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable
+
+from dotenv import load_dotenv
+from prometheus_client import start_http_server
+
+from models import ContentBrief, ContentPackage
+from events import agent_event
+from job_queue import JobQueue
+from task_store import TaskStore, get_task_store
+from load_balancer import get_load_balancer
+from llm_cache import get_completion_cache
+from embedding_cache import embedding_cache_stats
+from metrics import stats_collector
+from ollama_client import get_ollama_client
+from warmup import get_model_warmer
+from startup import startup_report, timed_import
+from config import execution_config, ollama_config, logger, setup_logging
+
+# agents (crewai/langchain) só é importado quando o crew é criado
+if TYPE_CHECKING:
+    from agents import ContentCreationCrew
+
+# carrega variáveis de ambiente
+load_dotenv()
+
+def run_content_task(get_crew: Callable[[], "ContentCreationCrew"], store: TaskStore, task_id: str, brief: ContentBrief):
+    """
+    Processa a criação de conteúdo de uma task e grava o resultado no store
+    O crew é obtido na hora (criado no primeiro job); falha na criação vira erro da task
+    """
+    store.set_status(task_id, "processing")
+    
+    try:
+        crew = get_crew()
+        if crew is None:
+            raise RuntimeError("Agentes não inicializados")
+        
+        # executa o crew de agentes, publicando o progresso de cada agente
+        result = crew.process_brief(
+            brief,
+            task_id=task_id,
+            on_event=lambda state, agent, details: store.publish_event(
+                task_id, agent_event(state, agent, details)
+            )
+        )
+        
+        # salva resultado (status vem do pacote)
+        store.save_result(task_id, result)
+        
+    except Exception as e:
+        # salva pacote de erro
+        error_package = ContentPackage(
+            brief=brief,
+            task_id=task_id,
+            created_at=datetime.now().isoformat(),
+            status=f"error: {str(e)}"
+        )
+        store.save_result(task_id, error_package)
+
+def main():
+    """
+    Processo worker dedicado: consome briefs da fila compartilhada (TASK_STORE_BACKEND=redis)
+    e executa os agentes, permitindo escalar workers de LLM separadamente das réplicas da API
+    """
+    setup_logging()
+    ollama_url = ollama_config.base_url
+    model_name = os.getenv("OLLAMA_MODEL", "mistral")
+    workers = int(os.getenv("WORKER_CONCURRENCY", str(max(1, execution_config.job_queue_workers))))
+    
+    store = get_task_store()
+    if store.backend == "memory":
+        logger.warning("⚠️ Worker com store em memória não enxerga a fila da API; use TASK_STORE_BACKEND=redis")
+    
+    # o worker sempre precisa dos agentes, então cria já na startup
+    agents_module = timed_import("agents", "agents")
+    with startup_report.measure("init", "agents"):
+        crew = agents_module.ContentCreationCrew(agents_module.ContentCreationAgents(ollama_url, model_name))
+    
+    # memória de conteúdo: cria já na startup para rodar a migração de embeddings
+    # e a manutenção (retenção/compactação) aqui e não nas réplicas da API
+    memory_module = timed_import("memory", "memory")
+    try:
+        memory = memory_module.get_memory_manager()
+    except Exception as e:
+        memory = None
+        logger.error(f"❌ Memória indisponível, migração/manutenção desativadas: {e}")
+    
+    # health check periódico dos backends Ollama (OLLAMA_BASE_URLS)
+    get_load_balancer().start()
+    get_model_warmer().start()
+    
+    queue = JobQueue(
+        lambda task_id, brief: run_content_task(lambda: crew, store, task_id, brief),
+        store,
+        workers=workers
+    )
+    
+    # as gerações dos agentes acontecem aqui: métricas por agente expostas para o Prometheus
+    if execution_config.worker_metrics_port:
+        stats_collector.add_source("queue", queue.stats)
+        stats_collector.add_source("tasks", store.status_counts)
+        stats_collector.add_source("ollama", lambda: get_ollama_client().stats())
+        stats_collector.add_source("cache:llm", lambda: get_completion_cache().stats() if get_completion_cache() else None)
+        stats_collector.add_source("cache:embedding", embedding_cache_stats)
+        stats_collector.add_source("cache:rag_context", lambda: (memory_module.memory_stats() or {}).get("context_cache"))
+        start_http_server(execution_config.worker_metrics_port)
+        logger.info(f"📈 Métricas do worker em :{execution_config.worker_metrics_port}/metrics")
+    
+    logger.info(f"🚀 Worker iniciado ({workers} thread(s), store: {store.backend}) - Ollama: {ollama_url}")
+    logger.info(f"⏱️ Startup: {startup_report.summary()}")
+    try:
+        queue.run_forever()
+    finally:
+        if memory is not None:
+            memory.stop_background_jobs(timeout=5)
+
+if __name__ == "__main__":
+    main()